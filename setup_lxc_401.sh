@@ -100,8 +100,8 @@ echo "🐍 Instalando Librerías (Geo, Data, APIs, Redis Queue)..."
 pct exec $CTID -- bash -c "pip3 install --break-system-packages \
   fastapi uvicorn[standard] sqlalchemy psycopg2-binary \
   python-multipart python-jose[cryptography] passlib[bcrypt] \
-  python-dotenv pillow duckdb google-genai requests \
-  pypdf pdf2image pytesseract pandas openpyxl \
+  python-dotenv pillow duckdb google-genai requests httpx \
+  pypdf pdf2image pytesseract pandas pyarrow openpyxl \
   geopandas shapely osmnx networkx geopy folium rq"
 
 echo "✅ MOTOR ETL COMPLETO."
@@ -0,0 +1,329 @@
+"""
+Benchmark de throughput del pipeline ETL_DOCS.
+
+Genera un corpus sintético (PDFs con capa de texto, escaneados solo-imagen y mixtos
+de distintos tamaños) y lo procesa con DocumentProcessor usando un backend de
+embeddings falso (sin Gemini ni Postgres). Reporta en JSON páginas/seg, RSS pico
+y tiempo por etapa (extract, ocr, chunk, embed, write).
+
+process_document solo hace OCR si NINGUNA página tiene texto, así que un mixto nunca
+llegaría al OCR por ese camino. Los mixtos se miden con process_page_range sobre el
+documento completo: es el camino (rangos del fan-out) que pasa por OCR solo las
+páginas sin texto. Cada documento reporta `path` y `ocr_pages`.
+
+Uso:
+    python3 -m src.ETL_DOCS.benchmark --pages 1,10,50 --docs 2 --out /tmp/docs_bench.json
+    python3 -m src.ETL_DOCS.benchmark --skip-ocr        # Solo PDFs con texto (rápido)
+    python3 -m src.ETL_DOCS.benchmark --kinds scanned --ocr-profile fast
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import resource
+import tempfile
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from uuid import UUID
+
+# El backend falso nunca llama a Gemini, pero vector_store crea el cliente al importarse
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-fake-key")
+
+from PIL import Image, ImageDraw
+import pypdf
+
+from src.ETL_DOCS.processor import DocumentProcessor
+from src.shared.schemas import CanonicalDocument
+
+DEFAULT_WORKDIR = "/app/data/staging/temp_work/docs_benchmark"
+EMBEDDING_DIMENSION = 3072
+WORDS = ("propiedad contrato cliente venta alquiler precio metros terreno escritura notaría "
+         "hipoteca cuota plazo garantía inmueble agencia comisión firma anexo cláusula").split()
+
+# --- CORPUS SINTÉTICO ---
+
+def _page_text(rng: random.Random, lines: int = 40) -> List[str]:
+    return [" ".join(rng.choice(WORDS) for _ in range(10)) for _ in range(lines)]
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_text_pdf(path: Path, pages: List[List[str]]):
+    """PDF mínimo con capa de texto real (Helvetica, WinAnsi), escrito a mano sin dependencias."""
+    objects = []
+    n_pages = len(pages)
+    page_ids = [4 + 2 * i for i in range(n_pages)]
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {n_pages} >>")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    for i, lines in enumerate(pages):
+        ops = ["BT", "/F1 10 Tf", "14 TL", "50 800 Td"]
+        ops += [f"({_pdf_escape(line)}) '" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_ids[i] + 1} 0 R >>")
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{num} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_at = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+
+def write_scanned_pdf(path: Path, pages: List[List[str]], dpi: int = 150):
+    """PDF solo-imagen (simula escaneo): texto rasterizado sin capa de texto."""
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    images = []
+    for lines in pages:
+        img = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(img)
+        for j, line in enumerate(lines):
+            draw.text((60, 60 + j * 28), line, fill="black")
+        images.append(img)
+    images[0].save(path, "PDF", resolution=dpi, save_all=True, append_images=images[1:])
+
+def write_mixed_pdf(path: Path, pages: List[List[str]], workdir: Path):
+    """PDF mixto: alterna páginas con texto (impares) y escaneadas (pares); con 1 página queda solo texto."""
+    text_tmp, scan_tmp = workdir / f".{path.stem}_t.pdf", workdir / f".{path.stem}_s.pdf"
+    write_text_pdf(text_tmp, pages[0::2])
+    write_scanned_pdf(scan_tmp, pages[1::2] or pages[:1])
+    text_reader, scan_reader = pypdf.PdfReader(text_tmp), pypdf.PdfReader(scan_tmp)
+    writer = pypdf.PdfWriter()
+    for i in range(len(pages)):
+        source = text_reader if i % 2 == 0 else scan_reader
+        writer.add_page(source.pages[min(i // 2, len(source.pages) - 1)])
+    with open(path, "wb") as f:
+        writer.write(f)
+    text_tmp.unlink()
+    scan_tmp.unlink()
+
+def generate_corpus(workdir: Path, page_counts: List[int], docs_per_size: int, kinds: List[str], seed: int = 42) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    workdir.mkdir(parents=True, exist_ok=True)
+    corpus = []
+    for kind in kinds:
+        for n_pages in page_counts:
+            for k in range(docs_per_size):
+                pages = [_page_text(rng) for _ in range(n_pages)]
+                path = workdir / f"{kind}_{n_pages}p_{k}.pdf"
+                if kind == "text":
+                    write_text_pdf(path, pages)
+                elif kind == "scanned":
+                    write_scanned_pdf(path, pages)
+                else:
+                    write_mixed_pdf(path, pages, workdir)
+                corpus.append({"path": path, "kind": kind, "pages": n_pages})
+    return corpus
+
+# --- BACKEND FALSO ---
+
+class FakeVectorStore:
+    """
+    Sustituto en memoria de VectorStore para el benchmark.
+    Embeddings deterministas derivados del hash (latencia simulada opcional)
+    y mide por separado el tiempo de embedding y de escritura.
+    """
+
+    def __init__(self, embed_latency_ms: float = 0.0):
+        self.embed_latency = embed_latency_ms / 1000.0
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.timings = {"embed": 0.0, "write": 0.0}
+
+    def is_alive(self) -> bool:
+        return True
+
+    def calculate_hash(self, content: str) -> str:
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get_embedding(self, text: str) -> List[float]:
+        if self.embed_latency:
+            time.sleep(self.embed_latency)
+        seed = hashlib.sha256(text.encode('utf-8')).digest()
+        return [seed[i % len(seed)] / 255.0 for i in range(EMBEDDING_DIMENSION)]
+
+    def delete_document_chunks(self, client_id: UUID, content_id: str):
+        for key in [k for k in self.rows if k == content_id or k.startswith(f"{content_id}_part_")]:
+            del self.rows[key]
+
+    def upsert_document(self, doc: CanonicalDocument) -> bool:
+        t0 = time.perf_counter()
+        vector = self.get_embedding(doc.body_content)
+        t1 = time.perf_counter()
+        self.rows[doc.content_id] = {
+            "title": doc.title,
+            "hash": doc.hash,
+            "metadata": doc.metadata.model_dump(mode='json'),
+            "embedding": vector,
+        }
+        self.timings["embed"] += t1 - t0
+        self.timings["write"] += time.perf_counter() - t1
+        return True
+
+    def update_sync_status(self, client_id: UUID, content_id: str, status: str, error_message: str = None):
+        pass
+
+    def get_sync_status(self, client_id: UUID, content_id: str) -> Optional[str]:
+        return "SYNCED"
+
+# --- MEDICIÓN ---
+
+class StageTimer:
+    """Callback de progreso de DocumentProcessor que acumula tiempo por etapa."""
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self._stage = None
+        self._since = None
+
+    def __call__(self, stage: Optional[str] = None, **counters):
+        if not stage or stage == self._stage:
+            return
+        now = time.perf_counter()
+        if self._stage:
+            self.totals[self._stage] = self.totals.get(self._stage, 0.0) + now - self._since
+        self._stage, self._since = stage, now
+
+def _peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss en KB (Linux). Los hijos incluyen pdftoppm/tesseract del OCR.
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+def run_benchmark(corpus: List[Dict[str, Any]], embed_latency_ms: float = 0.0, ocr_profile: Optional[str] = None) -> Dict[str, Any]:
+    store = FakeVectorStore(embed_latency_ms=embed_latency_ms)
+    processor = DocumentProcessor(vector_store=store, embed_mode="inline")
+    client_id = uuid.uuid4()
+    stages = {"extract": 0.0, "ocr": 0.0, "chunk": 0.0, "embed": 0.0, "write": 0.0}
+    documents = []
+    wall_start = time.perf_counter()
+
+    for item in corpus:
+        timer = StageTimer()
+        store.timings = {"embed": 0.0, "write": 0.0}
+        t0 = time.perf_counter()
+        if item["kind"] == "mixed":
+            path = "process_page_range"
+            result = processor.process_page_range(
+                file_path=str(item["path"]),
+                client_id=client_id,
+                content_id=f"bench_{item['path'].stem}",
+                original_filename=item["path"].name,
+                first_page=1,
+                last_page=item["pages"],
+                progress=timer,
+                ocr_profile=ocr_profile
+            )
+        else:
+            path = "process_document"
+            result = processor.process_document(
+                file_path=str(item["path"]),
+                client_id=client_id,
+                content_id=f"bench_{item['path'].stem}",
+                original_filename=item["path"].name,
+                progress=timer,
+                ocr_profile=ocr_profile
+            )
+        elapsed = time.perf_counter() - t0
+        timer("end")
+
+        # El bucle 'embed' del procesador incluye armado de fragmentos + embedding + escritura
+        doc_stages = {
+            "extract": timer.totals.get("extract", 0.0),
+            "ocr": timer.totals.get("ocr", 0.0),
+            "chunk": max(timer.totals.get("embed", 0.0) - store.timings["embed"] - store.timings["write"], 0.0),
+            "embed": store.timings["embed"],
+            "write": store.timings["write"] + timer.totals.get("cleanup", 0.0) + timer.totals.get("finalize", 0.0),
+        }
+        for stage, value in doc_stages.items():
+            stages[stage] += value
+
+        documents.append({
+            "file": item["path"].name,
+            "kind": item["kind"],
+            "pages": item["pages"],
+            "path": path,
+            "ocr_pages": result.get("ocr_pages", item["pages"] if result.get("ocr_profile") else 0),
+            "status": str(getattr(result["status"], "value", result["status"])),
+            "chunks": result.get("chunks_processed", 0),
+            "seconds": round(elapsed, 4),
+            "pages_per_sec": round(item["pages"] / elapsed, 2) if elapsed else None,
+            "stages": {k: round(v, 4) for k, v in doc_stages.items()},
+            "error": result.get("error"),
+        })
+
+    wall = time.perf_counter() - wall_start
+    total_pages = sum(item["pages"] for item in corpus)
+    by_kind = {}
+    for doc in documents:
+        agg = by_kind.setdefault(doc["kind"], {"documents": 0, "pages": 0, "ocr_pages": 0, "seconds": 0.0})
+        agg["documents"] += 1
+        agg["pages"] += doc["pages"]
+        agg["ocr_pages"] += doc["ocr_pages"] or 0
+        agg["seconds"] += doc["seconds"]
+    for agg in by_kind.values():
+        agg["pages_per_sec"] = round(agg["pages"] / agg["seconds"], 2) if agg["seconds"] else None
+        agg["seconds"] = round(agg["seconds"], 4)
+
+    return {
+        "summary": {
+            "documents": len(documents),
+            "pages": total_pages,
+            "failed": sum(1 for d in documents if d["status"] != "SYNCED"),
+            "wall_seconds": round(wall, 4),
+            "pages_per_sec": round(total_pages / wall, 2) if wall else None,
+            "peak_rss_mb": _peak_rss_mb(),
+            "stages_seconds": {k: round(v, 4) for k, v in stages.items()},
+            "embed_latency_ms": embed_latency_ms,
+            "ocr_profile": ocr_profile,
+        },
+        "by_kind": by_kind,
+        "documents": documents,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de throughput de ETL_DOCS con corpus sintético.")
+    parser.add_argument("--pages", default="1,10,50", help="Tamaños de documento en páginas (coma)")
+    parser.add_argument("--docs", type=int, default=1, help="Documentos por tipo y tamaño")
+    parser.add_argument("--kinds", default="text,scanned,mixed", help="Tipos: text, scanned, mixed")
+    parser.add_argument("--skip-ocr", action="store_true", help="Excluir PDFs escaneados y mixtos")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="Latencia simulada por embedding")
+    parser.add_argument("--ocr-profile", default=None, help="Perfil OCR: fast, default, accurate")
+    parser.add_argument("--workdir", default=None, help=f"Directorio del corpus (default: {DEFAULT_WORKDIR} o temporal)")
+    parser.add_argument("--out", default=None, help="Archivo JSON de salida (default: stdout)")
+    args = parser.parse_args()
+
+    kinds = ["text"] if args.skip_ocr else [k.strip() for k in args.kinds.split(",") if k.strip()]
+    page_counts = [int(p) for p in args.pages.split(",") if p.strip()]
+    if args.workdir:
+        workdir = Path(args.workdir)
+    elif Path(DEFAULT_WORKDIR).parent.exists():
+        workdir = Path(DEFAULT_WORKDIR)
+    else:
+        workdir = Path(tempfile.mkdtemp(prefix="docs_benchmark_"))
+
+    t0 = time.perf_counter()
+    corpus = generate_corpus(workdir, page_counts, args.docs, kinds)
+    report = run_benchmark(corpus, embed_latency_ms=args.embed_latency_ms, ocr_profile=args.ocr_profile)
+    report["summary"]["corpus_seconds"] = round(time.perf_counter() - t0 - report["summary"]["wall_seconds"], 4)
+    report["summary"]["workdir"] = str(workdir)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        Path(args.out).write_text(output)
+        print(f"Reporte guardado en {args.out}", file=sys.stderr)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
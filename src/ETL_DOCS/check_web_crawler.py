@@ -0,0 +1,153 @@
+"""
+Check del crawler WEB_SCRAPE contra un sitio local (http.server en un hilo).
+
+El sitio tiene 4 páginas enlazadas desde "/" y un robots.txt que bloquea /privado.
+Cada respuesta lleva ETag y el servidor contesta 304 a If-None-Match, como un sitio real.
+
+1. Primer crawl: 3 páginas cambiadas (vectorizadas) y 1 bloqueada por robots.txt.
+2. Re-crawl con el estado guardado: las 3 páginas responden 304 (not_modified), sin descargas ni embeddings.
+
+Usa un VectorStore en memoria (sin Gemini ni Postgres).
+
+Uso:
+    python3 -m src.ETL_DOCS.check_web_crawler
+"""
+import os
+import sys
+import hashlib
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any
+from uuid import UUID
+
+# El store en memoria nunca llama a Gemini, pero vector_store crea el cliente al importarse
+os.environ.setdefault("GOOGLE_API_KEY", "check-fake-key")
+
+from src.ETL_DOCS.web_crawler import WebCrawler
+from src.shared.schemas import CanonicalDocument
+
+PARAGRAPH = "Departamentos en venta y alquiler con asesoría legal, tasación y firma ante notaría incluidas."
+PAGES = {
+    "/": '<a href="/ventas">Ventas</a> <a href="/alquileres">Alquileres</a> <a href="/privado">Privado</a>',
+    "/ventas": '<a href="/">Inicio</a>',
+    "/alquileres": '<a href="/">Inicio</a>',
+    "/privado": '<a href="/">Inicio</a>',
+}
+ROBOTS_TXT = "User-agent: *\nDisallow: /privado\n"
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """Sirve PAGES con ETag fijo por contenido y 304 para If-None-Match."""
+
+    requests_by_path: Dict[str, int] = {}
+
+    def do_GET(self):
+        SiteHandler.requests_by_path[self.path] = SiteHandler.requests_by_path.get(self.path, 0) + 1
+        if self.path == "/robots.txt":
+            self._send(200, ROBOTS_TXT.encode("utf-8"), "text/plain")
+            return
+        if self.path not in PAGES:
+            self._send(404, b"", "text/plain")
+            return
+        body = (f"<html><head><title>Inmobiliaria {self.path}</title></head><body>"
+                f"<nav>{PAGES[self.path]}</nav><main><h1>{self.path}</h1><p>{PARAGRAPH}</p></main>"
+                f"</body></html>").encode("utf-8")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._send(200, body, "text/html; charset=utf-8", etag=etag)
+
+    def _send(self, status: int, body: bytes, content_type: str, etag: str = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MemoryVectorStore:
+    """Sustituto en memoria de VectorStore con lo que usa el crawler (vectores y ai_web_pages)."""
+
+    def __init__(self):
+        self.vectors: Dict[str, str] = {} # content_id -> hash
+        self.web_pages: Dict[str, Dict[str, Any]] = {}
+        self.embedded = 0
+
+    def calculate_hash(self, content: str) -> str:
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.embedded += len(texts)
+        return [[0.0] for _ in texts]
+
+    def get_vector_hashes(self, client_id: UUID, content_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {cid: {"id": cid, "hash": self.vectors[cid]} for cid in content_ids if cid in self.vectors}
+
+    def upsert_documents_batch(self, docs: List[CanonicalDocument], embeddings: List[List[float]], existing_ids=None):
+        for doc in docs:
+            self.vectors[doc.content_id] = doc.hash
+
+    def delete_vectors(self, client_id: UUID, content_ids: List[str]):
+        for cid in content_ids:
+            self.vectors.pop(cid, None)
+
+    def get_web_pages(self, client_id: UUID) -> Dict[str, Dict[str, Any]]:
+        return {url: dict(row) for url, row in self.web_pages.items()}
+
+    def save_web_pages(self, client_id: UUID, pages: List[Dict[str, Any]]):
+        for page in pages:
+            self.web_pages[page["url"]] = {
+                key: page.get(key) for key in
+                ("url", "content_id", "etag", "last_modified", "content_hash", "chunks", "links", "status_code")
+            }
+
+
+def expect(label: str, actual, expected) -> int:
+    if actual == expected:
+        print(f"   ✅ {label}: {actual}")
+        return 0
+    print(f"   ❌ {label}: {actual} (esperado {expected})")
+    return 1
+
+
+def check_crawler() -> int:
+    """Crawl + re-crawl del sitio local. Retorna la cantidad de errores."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    store = MemoryVectorStore()
+    client_id = uuid.uuid4()
+    errors = 0
+    try:
+        print("🔍 Primer crawl")
+        stats = WebCrawler(client_id, [base_url], vector_store=store).run()
+        errors += expect("Páginas cambiadas", stats["changed"], 3)
+        errors += expect("Bloqueadas por robots.txt", stats["robots_blocked"], 1)
+        errors += expect("/privado nunca descargada", SiteHandler.requests_by_path.get("/privado", 0), 0)
+        errors += expect("Páginas con ETag guardado", sum(1 for p in store.web_pages.values() if p["etag"]), 3)
+        embedded = store.embedded
+
+        print("🔍 Re-crawl sin cambios")
+        stats = WebCrawler(client_id, [base_url], vector_store=store).run()
+        errors += expect("Respuestas 304 (not_modified)", stats["not_modified"], 3)
+        errors += expect("Descargas completas", stats["fetched"], 0)
+        errors += expect("Páginas cambiadas", stats["changed"], 0)
+        errors += expect("Bloqueadas por robots.txt", stats["robots_blocked"], 1)
+        errors += expect("Embeddings nuevos", store.embedded - embedded, 0)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return errors
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check_crawler() else 0)
@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import socket
+import logging
+import argparse
+from typing import Dict, Any, List
+
+from dotenv import load_dotenv
+
+# Configurar entorno antes de importar módulos que leen os.getenv
+load_dotenv("/app/src/.env")
+sys.path.append("/app/src")
+
+from src.shared.schemas import CanonicalDocument, CanonicalMetadata
+from src.shared.vector_store import VectorStore
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - EMBED - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN ---
+BATCH_SIZE = int(os.getenv("DOCS_EMBED_BATCH_SIZE", "100"))              # Máximo por llamada batch de Gemini
+CLAIM_TIMEOUT_SECONDS = int(os.getenv("DOCS_EMBED_CLAIM_TIMEOUT", "300")) # Reclamos de workers caídos se recuperan
+IDLE_SLEEP_SECONDS = float(os.getenv("DOCS_EMBED_IDLE_SLEEP", "2"))
+MAX_ATTEMPTS = int(os.getenv("DOCS_EMBED_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE_SECONDS = float(os.getenv("DOCS_EMBED_BACKOFF_BASE", "5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("DOCS_EMBED_BACKOFF_MAX", "300"))
+
+
+class EmbeddingWorker:
+    """
+    Consume ai_pending_embeddings (DOCS_EMBED_MODE=decoupled).
+    Por lote: reclama N fragmentos, UNA llamada batch de embeddings, escribe en ai_vectors,
+    borra los pendientes y cierra (SYNCED/FAILED) los documentos que quedaron sin fragmentos.
+    Ante error de la API (cuota, 429, 5xx) devuelve el lote con backoff exponencial.
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE):
+        self.batch_size = batch_size
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.vector_store = VectorStore()
+        self._consecutive_errors = 0
+
+    @staticmethod
+    def _to_document(row: Dict[str, Any]) -> CanonicalDocument:
+        return CanonicalDocument(
+            content_id=row["content_id"],
+            source=row["source"],
+            title=row["title"],
+            body_content=row["body_content"],
+            metadata=CanonicalMetadata(**row["metadata"]),
+            hash=row["hash"],
+        )
+
+    def _backoff(self, attempts: int) -> float:
+        return min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+
+    def process_batch(self) -> int:
+        """Procesa un lote. Retorna la cantidad de fragmentos reclamados (0 = cola vacía)."""
+        rows = self.vector_store.claim_pending_chunks(self.worker_id, self.batch_size, CLAIM_TIMEOUT_SECONDS)
+        if not rows:
+            return 0
+
+        ids = [r["id"] for r in rows]
+        try:
+            embeddings = self.vector_store.get_embeddings([r["body_content"] for r in rows])
+        except Exception as e:
+            attempts = max(r["attempts"] for r in rows)
+            backoff = self._backoff(attempts)
+            self.vector_store.release_pending_chunks(ids, str(e)[:500], backoff, MAX_ATTEMPTS)
+            self._consecutive_errors += 1
+            logger.warning(f"Lote de {len(rows)} devuelto (intento {attempts}, reintento en {backoff:.0f}s): {e}")
+            # Si la API está limitando, este worker también espera antes de reclamar otro lote
+            time.sleep(min(self._backoff(self._consecutive_errors), BACKOFF_MAX_SECONDS))
+            self._finalize(rows)
+            return len(rows)
+        self._consecutive_errors = 0
+
+        done, failed = [], []
+        for row, embedding in zip(rows, embeddings):
+            try:
+                if not self.vector_store.upsert_document(self._to_document(row), embedding=embedding):
+                    logger.warning(f"Fragmento {row['content_id']} sin escribir: el mismo texto ya existe en ai_vectors")
+                done.append(row["id"])
+            except Exception as e:
+                logger.error(f"Error escribiendo fragmento {row['content_id']}: {e}")
+                failed.append(row["id"])
+
+        self.vector_store.complete_pending_chunks(done)
+        if failed:
+            self.vector_store.release_pending_chunks(failed, "Error escribiendo en ai_vectors", BACKOFF_BASE_SECONDS, MAX_ATTEMPTS)
+        self._finalize(rows)
+        logger.info(f"Lote embebido: {len(done)} fragmentos ({len(failed)} con error).")
+        return len(rows)
+
+    def _finalize(self, rows: List[Dict[str, Any]]):
+        documents = {(r["client_id"], r["document_content_id"]) for r in rows}
+        for doc in self.vector_store.finalize_embedded_documents(list(documents)):
+            logger.info(f"Documento {doc['content_id']} -> {doc['status']}")
+
+    def run_forever(self):
+        logger.info(f"Embedding worker {self.worker_id} iniciado (lotes de {self.batch_size}).")
+        while True:
+            try:
+                if self.process_batch() == 0:
+                    time.sleep(IDLE_SLEEP_SECONDS)
+            except Exception as e:
+                logger.error(f"Error en ciclo de embeddings: {e}")
+                # Conexión caída: recrear antes del próximo lote
+                if not self.vector_store.is_alive():
+                    try:
+                        self.vector_store = VectorStore()
+                    except Exception:
+                        pass
+                time.sleep(IDLE_SLEEP_SECONDS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding worker para ai_pending_embeddings (DOCS_EMBED_MODE=decoupled)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Fragmentos por llamada de embeddings")
+    parser.add_argument("--once", action="store_true", help="Procesar un solo lote y salir")
+    args = parser.parse_args()
+
+    worker = EmbeddingWorker(batch_size=args.batch_size)
+    if args.once:
+        worker.process_batch()
+    else:
+        worker.run_forever()
@@ -0,0 +1,89 @@
+import os
+import json
+import logging
+from typing import Optional, Dict, Any
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# --- PERFILES OCR ---
+# dpi:        resolución de render (pdf2image). Costo de Tesseract ~ proporcional a los píxeles.
+# grayscale:  render directo en escala de grises (menos memoria, mismo resultado en texto).
+# binarize:   umbral fijo a blanco/negro (acelera Tesseract en escaneos limpios).
+# oem / psm:  modos de Tesseract (1 = solo LSTM; psm 3 = layout automático, 6 = bloque uniforme).
+# lang:       'auto' detecta spa/eng con una muestra de la primera página.
+OCR_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Backfills masivos: baja resolución, B/N, sin análisis de layout
+    "fast": {"dpi": 150, "grayscale": True, "binarize": True, "threshold": 170, "oem": 1, "psm": 6, "lang": "auto"},
+    # Comportamiento histórico (render color 200 dpi, español)
+    "default": {"dpi": 200, "grayscale": False, "binarize": False, "threshold": None, "oem": 3, "psm": 3, "lang": "spa"},
+    # Contratos y legales: alta resolución, grises (LSTM rinde mejor sin binarizar)
+    "accurate": {"dpi": 300, "grayscale": True, "binarize": False, "threshold": None, "oem": 1, "psm": 3, "lang": "auto"},
+}
+DEFAULT_PROFILE = os.getenv("DOCS_OCR_PROFILE", "default")
+if DEFAULT_PROFILE not in OCR_PROFILES:
+    logger.error(f"DOCS_OCR_PROFILE='{DEFAULT_PROFILE}' desconocido, se usa 'default'. Opciones: {', '.join(OCR_PROFILES)}")
+    DEFAULT_PROFILE = "default"
+
+# Perfil por categoría del documento. Override: DOCS_OCR_CATEGORY_PROFILES='{"legal": "accurate"}'
+CATEGORY_PROFILES: Dict[str, str] = {
+    "legal": "accurate",
+    "contracts": "accurate",
+    "contratos": "accurate",
+}
+try:
+    _category_overrides = json.loads(os.getenv("DOCS_OCR_CATEGORY_PROFILES", "{}"))
+    if not isinstance(_category_overrides, dict):
+        raise ValueError("se esperaba un objeto JSON {categoría: perfil}")
+    for _category, _profile in _category_overrides.items():
+        if isinstance(_profile, str) and _profile in OCR_PROFILES:
+            CATEGORY_PROFILES[str(_category).lower()] = _profile
+        else:
+            # Sin perfil válido la categoría cae en DOCS_OCR_PROFILE (no falla cada job OCR)
+            logger.error(f"DOCS_OCR_CATEGORY_PROFILES: perfil '{_profile}' desconocido para '{_category}', se ignora")
+except ValueError as e: # JSONDecodeError es subclase de ValueError
+    logger.error(f"DOCS_OCR_CATEGORY_PROFILES inválido, se ignora: {e}")
+
+# Palabras frecuentes para decidir idioma sobre la muestra OCR
+_SPA_WORDS = {"de", "la", "que", "el", "en", "los", "del", "las", "por", "con", "una", "para", "es", "se", "al"}
+_ENG_WORDS = {"the", "of", "and", "to", "in", "is", "that", "for", "it", "with", "as", "on", "be", "by", "this"}
+
+
+def resolve_profile(profile: Optional[str] = None, category: Optional[str] = None) -> str:
+    """Perfil explícito (upload) > perfil de la categoría > DOCS_OCR_PROFILE."""
+    if profile:
+        if profile not in OCR_PROFILES:
+            raise ValueError(f"Perfil OCR desconocido: '{profile}'. Opciones: {', '.join(OCR_PROFILES)}")
+        return profile
+    if category and category.lower() in CATEGORY_PROFILES:
+        return CATEGORY_PROFILES[category.lower()]
+    return DEFAULT_PROFILE
+
+
+def preprocess_image(image: Image.Image, settings: Dict[str, Any]) -> Image.Image:
+    """Escala de grises / binarización según el perfil."""
+    if settings["grayscale"] and image.mode != "L":
+        image = image.convert("L")
+    if settings["binarize"]:
+        threshold = settings["threshold"]
+        image = image.convert("L").point(lambda px: 255 if px > threshold else 0, mode="1")
+    return image
+
+
+def tesseract_config(settings: Dict[str, Any]) -> str:
+    return f"--oem {settings['oem']} --psm {settings['psm']}"
+
+
+def detect_language(sample_text: str) -> str:
+    """Elige 'spa', 'eng' o 'spa+eng' contando palabras frecuentes de cada idioma."""
+    words = [w.strip(".,;:()\"'").lower() for w in sample_text.split()]
+    spa = sum(1 for w in words if w in _SPA_WORDS)
+    eng = sum(1 for w in words if w in _ENG_WORDS)
+    if spa == eng == 0:
+        return "spa"
+    if spa >= 2 * eng:
+        return "spa"
+    if eng >= 2 * spa:
+        return "eng"
+    return "spa+eng"
@@ -4,16 +4,19 @@ import os
 import io
 import hashlib
 from uuid import UUID
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, List
 
 import pypdf
 from pdf2image import convert_from_path
 import pytesseract
 from PIL import Image
 
-from src.shared.schemas import CanonicalDocument, SourceType, IngestStatus
-from src.shared.vector_store import VectorStore
+from src.shared.schemas import CanonicalDocument, CanonicalMetadata, SourceType, IngestStatus
+from src.shared.vector_store import VectorStore, EMBED_MODE
 from src.shared.file_manager import FileManager
+from src.ETL_DOCS.ocr_profiles import (
+    OCR_PROFILES, DEFAULT_PROFILE, resolve_profile, preprocess_image, tesseract_config, detect_language
+)
 
 logger = logging.getLogger(__name__)
 
@@ -27,8 +30,11 @@ class DocumentProcessor:
     4. Delegar persistencia a VectorStore.
     """
 
-    def __init__(self):
-        self.vector_store = VectorStore()
+    def __init__(self, vector_store: Optional[VectorStore] = None, embed_mode: Optional[str] = None):
+        # vector_store inyectable (ej. backend falso del benchmark)
+        self.vector_store = vector_store or VectorStore()
+        # 'inline': embedding en este job; 'decoupled': fragmentos a ai_pending_embeddings
+        self.embed_mode = embed_mode or EMBED_MODE
         
     def _extract_text_from_pdf(self, file_path: str) -> str:
         """
@@ -59,22 +65,108 @@ class DocumentProcessor:
             logger.error(f"Error parseando PDF {file_path}: {e}")
             raise ValueError(f"No se pudo leer el PDF: {e}")
 
-    def _ocr_pdf(self, file_path: str) -> str:
-        """Usa pdf2image + pytesseract para documentos escaneados"""
-        text = ""
+    def _ocr_pdf(self, file_path: str, profile: str = DEFAULT_PROFILE) -> str:
+        """Usa pdf2image + pytesseract para documentos escaneados (ver ETL_DOCS/ocr_profiles.py)"""
+        pages = self._ocr_pages(file_path, profile)
+        return "\n".join(p["text"] for p in pages).strip()
+
+    def _ocr_pages(self, file_path: str, profile: str = DEFAULT_PROFILE,
+                   first_page: Optional[int] = None, last_page: Optional[int] = None) -> List[Dict[str, Any]]:
+        """OCR página por página (opcionalmente un rango 1-based inclusivo)."""
+        settings = OCR_PROFILES[profile]
+        config = tesseract_config(settings)
+        lang = settings["lang"]
+        pages = []
         try:
-            # Convertir PDF a imágenes (una por página)
-            images = convert_from_path(file_path)
+            # Convertir PDF a imágenes (una por página) a la resolución del perfil
+            images = convert_from_path(file_path, dpi=settings["dpi"], grayscale=settings["grayscale"],
+                                       first_page=first_page, last_page=last_page)
             for i, image in enumerate(images):
-                # Tesseract OCR
-                page_text = pytesseract.image_to_string(image, lang='spa') # Prioridad Español
-                text += page_text + "\n"
-                logger.debug(f"OCR Página {i+1} completado")
-            return text.strip()
+                image = preprocess_image(image, settings)
+                if lang == "auto":
+                    # La primera página se lee con ambos idiomas y define el del resto
+                    page_text = pytesseract.image_to_string(image, lang='spa+eng', config=config)
+                    lang = detect_language(page_text)
+                    logger.info(f"OCR [{profile}]: idioma detectado '{lang}' para {file_path}")
+                else:
+                    page_text = pytesseract.image_to_string(image, lang=lang, config=config)
+                pages.append({"text": page_text.strip(), "page_number": (first_page or 1) + i})
+                logger.debug(f"OCR Página {(first_page or 1) + i} completado")
+            return pages
         except Exception as e:
             logger.error(f"Fallo crítico en OCR: {e}")
             raise
 
+    def _store_chunks(self, pages_text: List[Dict[str, Any]], client_id: UUID, content_id: str,
+                      original_filename: str, source: SourceType, access_level: str, category: str,
+                      progress: Callable[..., None]) -> int:
+        """
+        Construye un CanonicalDocument por página y lo persiste (embedding + upsert).
+        En modo 'decoupled' solo los encola en ai_pending_embeddings (un INSERT).
+        Retorna total de caracteres. Falla si ningún fragmento se pudo escribir porque el
+        mismo texto ya está en ai_vectors (hash único) bajo otro documento.
+        """
+        total_chars = 0
+        pending, skipped = [], []
+        for chunks_embedded, item in enumerate(pages_text, start=1):
+            chunk_id = f"{content_id}_part_{item['page_number']}"
+            logger.info(f"Procesando fragmento: {chunk_id}")
+            chunk_hash = self.vector_store.calculate_hash(item['text'])
+            
+            # Construir metadata con información del modelo de embeddings
+            meta = CanonicalMetadata(
+                client_id=client_id,
+                category=category,
+                access_level=access_level,
+                url=None,
+                source_timestamp=None,
+                # Metadata extra para tracking de versiones
+                embedding_model=os.getenv("EMBEDDING_MODEL", "models/gemini-embedding-001"),
+                embedding_dimension=3072
+            )
+            
+            doc = CanonicalDocument(
+                content_id=chunk_id,
+                source=source,
+                title=f"{original_filename} (Pág. {item['page_number']})",
+                body_content=item['text'],
+                hash=chunk_hash,
+                metadata=meta
+            )
+            
+            total_chars += len(item['text'])
+            if self.embed_mode == "decoupled":
+                pending.append(doc)
+                continue
+            if not self.vector_store.upsert_document(doc):
+                skipped.append(item['page_number'])
+            progress(chunks_embedded=chunks_embedded)
+
+        if skipped and len(skipped) == len(pages_text):
+            raise ValueError(
+                "Ningún fragmento se escribió: el mismo texto ya existe en ai_vectors bajo otro documento "
+                "(archivo idéntico a uno ya procesado; use on_duplicate='link')."
+            )
+        if skipped:
+            logger.warning(f"{content_id}: {len(skipped)} fragmentos sin escribir (texto ya existente en ai_vectors), págs {skipped}")
+
+        if pending:
+            self.vector_store.enqueue_pending_chunks(client_id, content_id, pending)
+            logger.info(f"{len(pending)} fragmentos encolados para embedding desacoplado ({content_id})")
+        return total_chars
+
+    def mark_extracted(self, client_id: UUID, content_id: str) -> IngestStatus:
+        """
+        Fin de la extracción. Inline: SYNCED. Decoupled: EMBEDDING, y se intenta el cierre
+        por si los embedding workers ya vaciaron todos los fragmentos del documento.
+        """
+        if self.embed_mode != "decoupled":
+            self.vector_store.update_sync_status(client_id, content_id, "SYNCED")
+            return IngestStatus.SYNCED
+        self.vector_store.update_sync_status(client_id, content_id, "EMBEDDING")
+        finalized = self.vector_store.finalize_embedded_documents([(client_id, content_id)])
+        return IngestStatus(finalized[0]["status"]) if finalized else IngestStatus.EMBEDDING
+
     def process_document(self, 
                          file_path: str, 
                          client_id: UUID, 
@@ -82,16 +174,27 @@ class DocumentProcessor:
                          original_filename: str,
                          source: SourceType = SourceType.PDF_UPLOAD,
                          access_level: str = "private",
-                         category: str = "knowledge_base") -> Dict[str, Any]:
+                         category: str = "knowledge_base",
+                         file_hash: Optional[str] = None,
+                         progress: Optional[Callable[..., None]] = None,
+                         ocr_profile: Optional[str] = None) -> Dict[str, Any]:
         """
         Flujo principal de procesamiento con fragmentación por páginas.
+        `progress(stage, **counters)` recibe el avance (ver ETL_DOCS/progress.py).
+        `ocr_profile` (fast/default/accurate) tiene prioridad sobre el perfil de la categoría.
         """
         logger.info(f"Iniciando procesamiento ETL para: {original_filename} ({content_id})")
+        progress = progress or (lambda stage=None, **counters: None)
 
         try:
+            ocr_profile = resolve_profile(ocr_profile, category)
+            used_ocr = False
+
             # 1. Extracción de Texto por páginas
             logger.info(f"Pasando a extracción de texto para {file_path}")
             reader = pypdf.PdfReader(file_path)
+            pages_total = len(reader.pages)
+            progress("extract", pages_total=pages_total, pages_extracted=0)
             pages_text = []
             for i, page in enumerate(reader.pages):
                 text = page.extract_text()
@@ -100,13 +203,16 @@ class DocumentProcessor:
                         "text": text.strip(),
                         "page_number": i + 1
                     })
+                progress(pages_extracted=i + 1)
             
             logger.info(f"Texto extraído: {len(pages_text)} páginas con contenido.")
 
             # OCR Fallback si no hay texto extraído
             if not pages_text:
                 logger.info(f"No se detectó texto seleccionable. Iniciando OCR para {file_path}...")
-                full_ocr_text = self._ocr_pdf(file_path)
+                progress("ocr", ocr_profile=ocr_profile)
+                full_ocr_text = self._ocr_pdf(file_path, ocr_profile)
+                used_ocr = True
                 pages_text.append({"text": full_ocr_text, "page_number": 1})
 
             if not pages_text:
@@ -114,58 +220,144 @@ class DocumentProcessor:
 
             # 2. Limpieza de fragmentos previos
             logger.info(f"Limpiando fragmentos previos para {content_id}")
-            with self.vector_store.conn.cursor() as cur:
-                cur.execute("DELETE FROM ai_vectors WHERE client_id = %s AND (content_id = %s OR content_id LIKE %s)", 
-                            (str(client_id), content_id, f"{content_id}_part_%"))
+            progress("cleanup", chunks_total=len(pages_text), chunks_embedded=0)
+            self.vector_store.delete_document_chunks(client_id, content_id)
 
             # 3. Procesamiento y Carga de Fragmentos
-            total_chars = 0
-            from src.shared.schemas import CanonicalMetadata
-            
-            for item in pages_text:
-                chunk_id = f"{content_id}_part_{item['page_number']}"
-                logger.info(f"Procesando fragmento: {chunk_id}")
-                chunk_hash = self.vector_store.calculate_hash(item['text'])
-                
-                # Construir metadata con información del modelo de embeddings
-                meta = CanonicalMetadata(
-                    client_id=client_id,
-                    category=category,
-                    access_level=access_level,
-                    url=None,
-                    source_timestamp=None,
-                    # Metadata extra para tracking de versiones
-                    embedding_model=os.getenv("EMBEDDING_MODEL", "models/gemini-embedding-001"),
-                    embedding_dimension=3072
-                )
-                
-                doc = CanonicalDocument(
-                    content_id=chunk_id,
-                    source=source,
-                    title=f"{original_filename} (Pág. {item['page_number']})",
-                    body_content=item['text'],
-                    hash=chunk_hash,
-                    metadata=meta
-                )
-                
-                self.vector_store.upsert_document(doc)
-                total_chars += len(item['text'])
+            progress("embed")
+            total_chars = self._store_chunks(pages_text, client_id, content_id, original_filename,
+                                             source, access_level, category, progress)
 
             # 4. Actualizar Registro Maestro
-            logger.info(f"Actualizando estado a SYNCED para {content_id}")
-            self.vector_store.update_sync_status(client_id, content_id, "SYNCED")
+            progress("finalize")
+            final_status = self.mark_extracted(client_id, content_id)
+            logger.info(f"Estado {final_status.value} para {content_id}")
+            progress("done")
 
             logger.info(f"ETL Exitoso: {len(pages_text)} fragmentos creados para {content_id}")
             
             return {
-                "status": IngestStatus.SYNCED,
+                "status": final_status,
                 "content_id": content_id,
                 "chunks_processed": len(pages_text),
-                "total_chars": total_chars
+                "total_chars": total_chars,
+                "ocr_profile": ocr_profile if used_ocr else None,
+                "dedup": {"action": "processed", "file_hash": file_hash}
             }
 
         except Exception as e:
             logger.error(f"ETL Fallido para {content_id}: {e}")
+            progress("failed", error=str(e))
+            try:
+                self.vector_store.update_sync_status(client_id, content_id, "FAILED", str(e))
+            except:
+                pass
+            return {
+                "status": IngestStatus.FAILED,
+                "error": str(e)
+            }
+
+    def process_page_range(self,
+                           file_path: str,
+                           client_id: UUID,
+                           content_id: str,
+                           original_filename: str,
+                           first_page: int,
+                           last_page: int,
+                           source: SourceType = SourceType.PDF_UPLOAD,
+                           access_level: str = "private",
+                           category: str = "knowledge_base",
+                           progress: Optional[Callable[..., None]] = None,
+                           ocr_profile: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Procesa un rango de páginas (1-based, inclusivo) de un PDF grande (fan-out).
+        No limpia fragmentos previos ni toca el Registro Maestro: eso lo hacen
+        la tarea que reparte los rangos y la tarea de agregación.
+        Las páginas sin texto seleccionable del rango se pasan por OCR.
+        """
+        page_range = f"{first_page}-{last_page}"
+        logger.info(f"Procesando rango {page_range} de {original_filename} ({content_id})")
+        progress = progress or (lambda stage=None, **counters: None)
+
+        try:
+            ocr_profile = resolve_profile(ocr_profile, category)
+            reader = pypdf.PdfReader(file_path)
+            progress("extract", pages_total=last_page - first_page + 1, pages_extracted=0)
+            pages_text, missing = [], []
+            for page_number in range(first_page, last_page + 1):
+                text = reader.pages[page_number - 1].extract_text()
+                if text and len(text.strip()) > 10:
+                    pages_text.append({"text": text.strip(), "page_number": page_number})
+                else:
+                    missing.append(page_number)
+                progress(pages_extracted=page_number - first_page + 1)
+
+            # OCR solo del tramo sin texto (rangos contiguos para no renderizar de más)
+            if missing:
+                progress("ocr", ocr_profile=ocr_profile)
+                ocr_pages = self._ocr_pages(file_path, ocr_profile, missing[0], missing[-1])
+                pages_text += [p for p in ocr_pages if p["page_number"] in missing and p["text"]]
+                pages_text.sort(key=lambda p: p["page_number"])
+
+            progress("embed", chunks_total=len(pages_text), chunks_embedded=0)
+            total_chars = self._store_chunks(pages_text, client_id, content_id, original_filename,
+                                             source, access_level, category, progress)
+            progress("done")
+
+            return {
+                "status": IngestStatus.SYNCED,
+                "content_id": content_id,
+                "pages": page_range,
+                "chunks_processed": len(pages_text),
+                "total_chars": total_chars,
+                "ocr_pages": len(missing)
+            }
+
+        except Exception as e:
+            logger.error(f"Rango {page_range} fallido para {content_id}: {e}")
+            progress("failed", error=str(e))
+            return {
+                "status": IngestStatus.FAILED,
+                "content_id": content_id,
+                "pages": page_range,
+                "error": str(e)
+            }
+
+    def link_document(self,
+                      client_id: UUID,
+                      content_id: str,
+                      linked_content_id: str,
+                      file_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Dedup por contenido: el documento reutiliza los vectores de `linked_content_id`
+        (mismos bytes) en lugar de repetir extracción, OCR y embeddings.
+        El estado se copia del documento original; si éste sigue en proceso,
+        update_sync_status lo propagará al terminar.
+        """
+        logger.info(f"Enlazando {content_id} a vectores existentes de {linked_content_id}")
+        try:
+            source_status = self.vector_store.get_sync_status(client_id, linked_content_id)
+            if source_status is None:
+                raise ValueError(f"El documento original {linked_content_id} ya no existe.")
+
+            if source_status != "PENDING":
+                self.vector_store.update_sync_status(client_id, content_id, source_status)
+
+            return {
+                "status": IngestStatus(source_status),
+                "content_id": content_id,
+                "chunks_processed": 0,
+                "total_chars": 0,
+                "dedup": {
+                    "action": "linked",
+                    "file_hash": file_hash,
+                    "linked_content_id": linked_content_id,
+                    "source_status": source_status
+                }
+            }
+
+        except Exception as e:
+            logger.error(f"Enlace fallido para {content_id}: {e}")
             try:
                 self.vector_store.update_sync_status(client_id, content_id, "FAILED", str(e))
             except:
@@ -0,0 +1,93 @@
+import json
+import time
+import logging
+from typing import Optional
+
+from rq import get_current_job
+
+logger = logging.getLogger(__name__)
+
+# Etapas publicadas por DocumentProcessor (en orden)
+STAGES = ("queued", "extract", "ocr", "cleanup", "embed", "finalize", "done", "failed", "fanout")
+# "fanout" no es final: el job padre termina al repartir, pero los rangos publican su avance y la
+# agregación el estado final ("done"/"failed") en el canal del padre (ver report_range_finished)
+FINAL_STAGES = ("done", "failed")
+FANOUT_COUNTER_TTL = 86400
+
+
+def progress_channel(job_id: str) -> str:
+    """Canal Redis pub/sub donde se publican los avances de un job."""
+    return f"etl:job_progress:{job_id}"
+
+
+def fanout_counter_key(job_id: str) -> str:
+    """Rangos terminados de un fan-out (contador por job padre)."""
+    return f"etl:job_fanout_done:{job_id}"
+
+
+def report_range_finished(connection, parent_job_id: str, pages: str, status: str):
+    """Un rango de fan-out terminó: avance ('fanout', no final) en el canal del job padre."""
+    try:
+        key = fanout_counter_key(parent_job_id)
+        pipe = connection.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, FANOUT_COUNTER_TTL)
+        ranges_done = pipe.execute()[0]
+        connection.publish(progress_channel(parent_job_id), json.dumps({
+            "stage": "fanout", "range": pages, "range_status": status,
+            "ranges_done": ranges_done, "updated_at": time.time()
+        }))
+    except Exception as e:
+        logger.warning(f"No se pudo publicar el rango {pages} del job {parent_job_id}: {e}")
+
+
+def report_fanout_finished(parent_job, **state):
+    """
+    Cierre del fan-out (job de agregación): el estado final del documento queda en
+    job.meta['progress'] del padre y se publica en su canal (los visores SSE terminan ahí).
+    """
+    try:
+        progress = dict(parent_job.meta.get("progress") or {})
+        progress.update(state, updated_at=time.time())
+        parent_job.meta["progress"] = progress
+        parent_job.save_meta()
+        parent_job.connection.publish(progress_channel(parent_job.id), json.dumps(progress))
+    except Exception as e:
+        logger.warning(f"No se pudo publicar el cierre del fan-out {parent_job.id}: {e}")
+
+
+class JobProgressReporter:
+    """
+    Publica el avance de un job de documentos en dos lugares:
+    1. job.meta['progress'] (snapshot consultable vía /documents/jobs/{job_id}).
+    2. Canal Redis pub/sub (stream en vivo vía SSE).
+
+    Fuera de un worker RQ (ejecución directa, scripts) es un no-op.
+    Los errores de publicación nunca interrumpen el ETL.
+    """
+
+    def __init__(self, job=None, min_interval: float = 0.5):
+        self.job = job or get_current_job()
+        self.state = {"stage": "queued"}
+        # Los contadores por página/fragmento se agrupan; los cambios de etapa siempre se publican
+        self.min_interval = min_interval
+        self._last_publish = 0.0
+
+    def __call__(self, stage: Optional[str] = None, **counters):
+        stage_changed = bool(stage) and stage != self.state["stage"]
+        if stage:
+            self.state["stage"] = stage
+        self.state.update(counters)
+        self.state["updated_at"] = time.time()
+
+        if not self.job:
+            return
+        if not stage_changed and self.state["updated_at"] - self._last_publish < self.min_interval:
+            return
+        self._last_publish = self.state["updated_at"]
+        try:
+            self.job.meta["progress"] = dict(self.state)
+            self.job.save_meta()
+            self.job.connection.publish(progress_channel(self.job.id), json.dumps(self.state))
+        except Exception as e:
+            logger.warning(f"No se pudo publicar progreso del job {self.job.id}: {e}")
@@ -0,0 +1,79 @@
+import io
+import os
+import logging
+from typing import Dict, Any, List, Tuple
+
+import pypdf
+
+logger = logging.getLogger(__name__)
+
+# --- COLAS DE DOCUMENTOS ---
+# Los documentos chicos (o con capa de texto) no esperan detrás de un OCR de 500 páginas.
+FAST_QUEUE = os.getenv("DOCS_FAST_QUEUE", "etl_docs_fast")
+HEAVY_QUEUE = os.getenv("DOCS_HEAVY_QUEUE", "etl_docs_heavy")
+
+# Umbrales de costo (páginas)
+HEAVY_MIN_PAGES = int(os.getenv("DOCS_HEAVY_MIN_PAGES", "150"))       # Con texto: pesado si supera esto
+HEAVY_MIN_OCR_PAGES = int(os.getenv("DOCS_HEAVY_MIN_OCR_PAGES", "10")) # Sin texto (OCR): pesado si supera esto
+TEXT_SAMPLE_PAGES = 3 # Páginas muestreadas para detectar capa de texto
+
+# Timeouts por cola (segundos)
+QUEUE_TIMEOUTS = {
+    FAST_QUEUE: int(os.getenv("DOCS_FAST_TIMEOUT", "600")),
+    HEAVY_QUEUE: int(os.getenv("DOCS_HEAVY_TIMEOUT", "3600")),
+}
+
+
+def estimate_document_cost(file_bytes: bytes) -> Dict[str, Any]:
+    """
+    Estimación barata del costo de procesar un PDF (sin extraer todo el texto).
+    Lee el número de páginas y muestrea las primeras para detectar capa de texto.
+    """
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(file_bytes))
+        return {"pages": len(reader.pages), "has_text_layer": has_text_layer(reader)}
+    except Exception as e:
+        # PDF ilegible para pypdf: el worker decidirá; se trata como pesado (probable OCR)
+        logger.warning(f"No se pudo estimar costo del PDF: {e}")
+        return {"pages": None, "has_text_layer": False}
+
+
+def has_text_layer(reader: pypdf.PdfReader, first_page: int = 1) -> bool:
+    """Muestrea TEXT_SAMPLE_PAGES páginas desde `first_page` (1-based) buscando capa de texto."""
+    for page in reader.pages[first_page - 1:first_page - 1 + TEXT_SAMPLE_PAGES]:
+        text = page.extract_text()
+        if text and len(text.strip()) > 10:
+            return True
+    return False
+
+
+def select_queue(estimate: Dict[str, Any]) -> str:
+    """Elige la cola de documentos según el costo estimado."""
+    pages = estimate.get("pages")
+    if pages is None:
+        return HEAVY_QUEUE
+    if estimate.get("has_text_layer"):
+        return HEAVY_QUEUE if pages > HEAVY_MIN_PAGES else FAST_QUEUE
+    return HEAVY_QUEUE if pages > HEAVY_MIN_OCR_PAGES else FAST_QUEUE
+
+
+# --- FAN-OUT DE PDFs GRANDES ---
+# Sobre FANOUT_MIN_PAGES el documento se reparte en sub-jobs por rango de páginas y un job
+# de agregación cierra el estado. Cada rango pasa por select_queue: los que necesitan OCR
+# (más de HEAVY_MIN_OCR_PAGES páginas) van a la cola pesada, como un documento entero.
+FANOUT_MIN_PAGES = int(os.getenv("DOCS_FANOUT_MIN_PAGES", "80"))
+FANOUT_PAGES_PER_JOB = int(os.getenv("DOCS_FANOUT_PAGES_PER_JOB", "20"))
+FANOUT_RANGE_TIMEOUT = int(os.getenv("DOCS_FANOUT_RANGE_TIMEOUT", "900"))
+
+
+def plan_page_ranges(total_pages: int, pages_per_job: int = FANOUT_PAGES_PER_JOB) -> List[Tuple[int, int]]:
+    """Rangos 1-based inclusivos; lista vacía si el documento no justifica fan-out."""
+    if total_pages < FANOUT_MIN_PAGES:
+        return []
+    return [(start, min(start + pages_per_job - 1, total_pages)) for start in range(1, total_pages + 1, pages_per_job)]
+
+
+def select_range_queue(reader: pypdf.PdfReader, first_page: int, last_page: int) -> str:
+    """Cola de un sub-job de fan-out: misma decisión que un documento de last-first+1 páginas."""
+    return select_queue({"pages": last_page - first_page + 1,
+                         "has_text_layer": has_text_layer(reader, first_page)})
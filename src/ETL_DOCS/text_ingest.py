@@ -0,0 +1,112 @@
+import os
+import logging
+from uuid import UUID
+from typing import List, Dict, Any
+
+import psycopg2
+
+from src.shared.schemas import (
+    CanonicalDocument, CanonicalMetadata, SourceType, TextIngestItem
+)
+from src.shared.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# Textos por llamada batch de embeddings (y por transacción de escritura)
+TEXT_EMBED_BATCH_SIZE = int(os.getenv("DOCS_TEXT_EMBED_BATCH_SIZE", "100"))
+
+
+def _build_document(vector_store: VectorStore, client_id: UUID, item: TextIngestItem) -> CanonicalDocument:
+    metadata = dict(item.metadata)
+    metadata["client_id"] = client_id # El cliente lo fija el request, nunca el item
+    return CanonicalDocument(
+        content_id=item.content_id,
+        source=SourceType.TEXT_INPUT,
+        title=item.title,
+        body_content=item.body_content,
+        metadata=CanonicalMetadata(**metadata),
+        hash=vector_store.calculate_hash(item.body_content),
+    )
+
+
+def upsert_documents_bulk(vector_store: VectorStore, client_id: UUID, docs: List[CanonicalDocument]) -> Dict[str, Dict[str, Any]]:
+    """
+    Escritura masiva de CanonicalDocuments ya armados (texto, páginas web).
+
+    1. Trae los hashes actuales de todos los documentos en UNA consulta.
+    2. Los sin cambios se marcan 'unchanged' (sin embedding ni escritura).
+    3. El resto se embebe por lotes (una llamada batch cada TEXT_EMBED_BATCH_SIZE textos)
+       y se escribe por lotes (una transacción por lote).
+
+    Retorna {content_id: {"status": created | updated | unchanged | failed, "error"?}}.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    existing = vector_store.get_vector_hashes(client_id, [d.content_id for d in docs])
+
+    pending = []
+    for doc in docs:
+        current = existing.get(doc.content_id)
+        if current and current["hash"] == doc.hash:
+            results[doc.content_id] = {"status": "unchanged"}
+        else:
+            pending.append(doc)
+
+    existing_ids = {cid: row["id"] for cid, row in existing.items()}
+
+    def written(doc):
+        return {"status": "updated" if doc.content_id in existing_ids else "created"}
+
+    for start in range(0, len(pending), TEXT_EMBED_BATCH_SIZE):
+        batch = pending[start:start + TEXT_EMBED_BATCH_SIZE]
+        try:
+            embeddings = vector_store.get_embeddings([doc.body_content for doc in batch])
+        except Exception as e:
+            for doc in batch:
+                results[doc.content_id] = {"status": "failed", "error": f"Error de embedding: {e}"}
+            continue
+
+        try:
+            vector_store.upsert_documents_batch(batch, embeddings, existing_ids)
+            for doc in batch:
+                results[doc.content_id] = written(doc)
+        except psycopg2.Error as e:
+            # Un item conflictivo (ej. mismo texto bajo otro content_id) no tumba el lote: uno por uno
+            logger.warning(f"Escritura por lote falló ({e}); reintentando {len(batch)} items individualmente.")
+            for doc, embedding in zip(batch, embeddings):
+                try:
+                    if vector_store.upsert_document(doc, embedding=embedding):
+                        results[doc.content_id] = written(doc)
+                    else:
+                        results[doc.content_id] = {"status": "failed", "error": "El mismo texto ya existe bajo otro content_id"}
+                except Exception as item_error:
+                    results[doc.content_id] = {"status": "failed", "error": str(item_error)}
+    return results
+
+
+def ingest_text_items(vector_store: VectorStore, client_id: UUID, items: List[TextIngestItem]) -> List[Dict[str, Any]]:
+    """
+    Ingesta masiva de textos (SourceType.TEXT_INPUT) directo a ai_vectors (ver upsert_documents_bulk).
+    Retorna un estado por item, en el orden recibido: created | updated | unchanged | failed.
+    """
+    results: List[Dict[str, Any]] = [{"content_id": item.content_id} for item in items]
+    docs, positions, seen = [], [], set()
+    for i, item in enumerate(items):
+        if item.content_id in seen:
+            results[i].update(status="failed", error="content_id repetido en el request")
+            continue
+        seen.add(item.content_id)
+        try:
+            docs.append(_build_document(vector_store, client_id, item))
+            positions.append(i)
+        except Exception as e:
+            results[i].update(status="failed", error=f"Metadata inválida: {e}")
+
+    written = upsert_documents_bulk(vector_store, client_id, docs)
+    for doc, i in zip(docs, positions):
+        results[i].update(written[doc.content_id])
+
+    counts: Dict[str, int] = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    logger.info(f"Ingesta de texto para {client_id}: {counts}")
+    return results
@@ -0,0 +1,437 @@
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urldefrag, urlparse
+from urllib.robotparser import RobotFileParser
+from uuid import UUID
+from typing import Optional, List, Dict, Any
+
+import httpx
+
+from src.shared.schemas import CanonicalDocument, CanonicalMetadata, SourceType
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN ---
+CRAWL_CONCURRENCY_PER_HOST = int(os.getenv("DOCS_CRAWL_CONCURRENCY_PER_HOST", "4"))
+CRAWL_MAX_PAGES = int(os.getenv("DOCS_CRAWL_MAX_PAGES", "500"))
+CRAWL_MAX_DEPTH = int(os.getenv("DOCS_CRAWL_MAX_DEPTH", "5"))
+CRAWL_TIMEOUT = float(os.getenv("DOCS_CRAWL_TIMEOUT", "20"))
+CRAWL_USER_AGENT = os.getenv("DOCS_CRAWL_USER_AGENT", "AgenticETLBot/1.0")
+CRAWL_CHUNK_CHARS = int(os.getenv("DOCS_CRAWL_CHUNK_CHARS", "4000"))  # Tamaño de fragmento para embeddings
+CRAWL_WRITE_BATCH = int(os.getenv("DOCS_CRAWL_WRITE_BATCH", "50"))    # Páginas cambiadas por escritura
+MIN_TEXT_CHARS = 50 # Páginas con menos texto (índices vacíos, redirecciones JS) no se vectorizan
+
+# Contenido que nunca es texto principal
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form", "iframe"}
+MAIN_TAGS = {"main", "article"}
+BLOCK_TAGS = {"p", "div", "section", "li", "br", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "blockquote", "pre", "dd", "dt"}
+VOID_TAGS = {"br", "img", "hr", "meta", "link", "input", "source", "wbr", "area", "base", "col", "embed", "param", "track"}
+
+
+class MainTextParser(HTMLParser):
+    """
+    Extrae título, texto principal y enlaces con html.parser (sin dependencias).
+    Si la página tiene <main>/<article> se usa solo ese texto; si no, el <body> sin
+    navegación, cabecera, pie, scripts ni formularios.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.links: List[str] = []
+        self.noindex = False
+        self._in_title = False
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._all_blocks: List[str] = []
+        self._main_blocks: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "a" and attrs.get("href"):
+            self.links.append(attrs["href"])
+        elif tag == "meta" and (attrs.get("name") or "").lower() == "robots":
+            self.noindex = "noindex" in (attrs.get("content") or "").lower()
+        elif tag == "title":
+            self._in_title = True
+        if tag in VOID_TAGS:
+            if tag == "br":
+                self._break()
+            return
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in MAIN_TAGS:
+            self._main_depth += 1
+        if tag in BLOCK_TAGS:
+            self._break()
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        if tag in VOID_TAGS:
+            return
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in MAIN_TAGS and self._main_depth:
+            self._main_depth -= 1
+            self._main_blocks.append("")
+        if tag in BLOCK_TAGS:
+            self._break()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip_depth:
+            return
+        self._append(self._all_blocks, data)
+        if self._main_depth:
+            self._append(self._main_blocks, data)
+
+    @staticmethod
+    def _append(blocks: List[str], data: str):
+        if not blocks:
+            blocks.append("")
+        blocks[-1] += data
+
+    def _break(self):
+        self._all_blocks.append("")
+        if self._main_depth:
+            self._main_blocks.append("")
+
+    def main_text(self) -> str:
+        blocks = self._main_blocks if any(b.strip() for b in self._main_blocks) else self._all_blocks
+        lines = [" ".join(b.split()) for b in blocks]
+        return "\n".join(line for line in lines if line)
+
+
+def split_text(text: str, max_chars: int = CRAWL_CHUNK_CHARS) -> List[str]:
+    """Fragmentos de hasta max_chars cortando por líneas (párrafos)."""
+    chunks, current = [], ""
+    for line in text.split("\n"):
+        while len(line) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and len(current) + len(line) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def page_content_id(url: str) -> str:
+    """content_id estable por URL (base de los fragmentos {id}_part_{n})."""
+    return f"web_{hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]}"
+
+
+def normalize_url(url: str) -> str:
+    url, _ = urldefrag(url)
+    parsed = urlparse(url)
+    path = parsed.path or "/"
+    return parsed._replace(scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower(), path=path).geturl()
+
+
+class WebCrawler:
+    """
+    Crawler WEB_SCRAPE para la base de conocimiento de un cliente.
+
+    - Concurrencia asíncrona acotada por host (CRAWL_CONCURRENCY_PER_HOST) y Crawl-delay de robots.txt.
+    - Respeta robots.txt y <meta name="robots" content="noindex">.
+    - Re-crawls con GET condicional (If-None-Match / If-Modified-Since) usando el estado de ai_web_pages:
+      un sitio sin cambios cuesta casi solo respuestas 304; los enlaces guardados permiten seguir recorriendo.
+    - Solo las páginas con texto nuevo pasan a upsert masivo (hash por fragmento, embeddings por lote).
+    """
+
+    def __init__(self, client_id: UUID, start_urls: List[str], vector_store=None,
+                 max_pages: int = CRAWL_MAX_PAGES, max_depth: int = CRAWL_MAX_DEPTH,
+                 concurrency_per_host: int = CRAWL_CONCURRENCY_PER_HOST,
+                 access_level: str = "shared", category: str = "web"):
+        if vector_store is None:
+            from src.shared.vector_store import VectorStore
+            vector_store = VectorStore()
+        self.vector_store = vector_store
+        self.client_id = client_id
+        self.start_urls = [normalize_url(u) for u in start_urls]
+        self.allowed_hosts = {urlparse(u).netloc for u in self.start_urls}
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.concurrency_per_host = concurrency_per_host
+        self.access_level = access_level
+        self.category = category
+
+        self.state: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"fetched": 0, "not_modified": 0, "changed": 0, "unchanged": 0, "skipped": 0,
+                      "errors": 0, "robots_blocked": 0, "chunks_written": 0, "chunks_failed": 0}
+        self._robots: Dict[str, RobotFileParser] = {}
+        self._robots_locks: Dict[str, asyncio.Lock] = {}
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._host_next_at: Dict[str, float] = {}
+        self._pending_pages: List[Dict[str, Any]] = []
+        self._write_lock = asyncio.Lock()
+
+    # --- robots.txt y cortesía por host ---
+
+    async def _robots_for(self, client: httpx.AsyncClient, url: str) -> RobotFileParser:
+        parsed = urlparse(url)
+        host = parsed.netloc
+        lock = self._robots_locks.setdefault(host, asyncio.Lock()) # Un solo robots.txt por host
+        async with lock:
+            if host in self._robots:
+                return self._robots[host]
+            robots_url = f"{parsed.scheme}://{host}/robots.txt"
+            parser = RobotFileParser(robots_url)
+            try:
+                response = await client.get(robots_url)
+                if response.status_code in (401, 403):
+                    parser.disallow_all = True
+                elif response.status_code < 400:
+                    parser.parse(response.text.splitlines())
+                else:
+                    parser.allow_all = True
+            except httpx.HTTPError as e:
+                logger.warning(f"robots.txt inaccesible en {host} ({e}); se asume permitido")
+                parser.allow_all = True
+            self._robots[host] = parser
+            return parser
+
+    async def _wait_politeness(self, host: str):
+        """Respeta Crawl-delay: serializa el inicio de requests del host con ese intervalo."""
+        robots = self._robots.get(host)
+        delay = robots.crawl_delay(CRAWL_USER_AGENT) if robots else None
+        if not delay:
+            return
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self._host_next_at.get(host, 0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._host_next_at[host] = time.monotonic() + float(delay)
+
+    # --- Fetch ---
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str) -> Optional[List[str]]:
+        """Descarga una página (condicional si hay estado previo). Retorna sus enlaces, o None."""
+        host = urlparse(url).netloc
+        robots = await self._robots_for(client, url)
+        if not robots.can_fetch(CRAWL_USER_AGENT, url):
+            self.stats["robots_blocked"] += 1
+            return None
+
+        previous = self.state.get(url)
+        headers = {}
+        if previous and previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous and previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+        slot = self._host_slots.setdefault(host, asyncio.Semaphore(self.concurrency_per_host))
+        async with slot:
+            await self._wait_politeness(host)
+            try:
+                response = await client.get(url, headers=headers)
+            except httpx.HTTPError as e:
+                logger.warning(f"Error descargando {url}: {e}")
+                self.stats["errors"] += 1
+                return None
+
+        if response.status_code == 304 and previous:
+            self.stats["not_modified"] += 1
+            self._record(url, previous, previous.get("etag"), previous.get("last_modified"), 304)
+            return list(previous.get("links") or [])
+
+        self.stats["fetched"] += 1
+        if response.status_code >= 400:
+            self.stats["errors"] += 1
+            page = {"url": url, "content_id": page_content_id(url), "status_code": response.status_code,
+                    "chunks": previous.get("chunks", 0) if previous else 0}
+            if response.status_code in (404, 410):
+                # Página eliminada del sitio: sus vectores se borran en la próxima escritura
+                page.update(chunks=0, previous_chunks=page["chunks"], gone=True)
+            self._pending_pages.append(page)
+            return None
+        if "html" not in response.headers.get("content-type", "html"):
+            self.stats["skipped"] += 1
+            return None
+
+        parser = MainTextParser()
+        parser.feed(response.text)
+        base = str(response.url)
+        links = []
+        for href in parser.links:
+            link = normalize_url(urljoin(base, href))
+            if urlparse(link).scheme in ("http", "https") and urlparse(link).netloc in self.allowed_hosts:
+                links.append(link)
+        links = list(dict.fromkeys(links))
+
+        text = parser.main_text()
+        title = " ".join(parser.title.split()) or url
+        etag, last_modified = response.headers.get("etag"), response.headers.get("last-modified")
+        if parser.noindex or len(text) < MIN_TEXT_CHARS:
+            self.stats["skipped"] += 1
+            self._record(url, previous, etag, last_modified, response.status_code, links=links)
+            return links
+
+        content_hash = self.vector_store.calculate_hash(text)
+        if previous and previous.get("content_hash") == content_hash:
+            # Servidor sin validadores (o validadores que cambian sin cambio real de contenido)
+            self.stats["unchanged"] += 1
+            self._record(url, previous, etag, last_modified, response.status_code, links=links)
+            return links
+
+        self.stats["changed"] += 1
+        self._pending_pages.append({
+            "url": url, "content_id": page_content_id(url), "etag": etag, "last_modified": last_modified,
+            "content_hash": content_hash, "links": links, "status_code": response.status_code,
+            "title": title, "text": text, "previous_chunks": previous.get("chunks", 0) if previous else 0,
+            "changed": True,
+        })
+        if sum(1 for p in self._pending_pages if "text" in p) >= CRAWL_WRITE_BATCH:
+            await self._flush()
+        return links
+
+    def _record(self, url: str, previous: Optional[Dict[str, Any]], etag, last_modified, status_code, links=None):
+        """Estado de una página sin contenido nuevo (solo validadores / enlaces)."""
+        previous = previous or {}
+        self._pending_pages.append({
+            "url": url, "content_id": previous.get("content_id") or page_content_id(url),
+            "etag": etag, "last_modified": last_modified, "content_hash": previous.get("content_hash"),
+            "chunks": previous.get("chunks", 0), "links": links if links is not None else previous.get("links", []),
+            "status_code": status_code,
+        })
+
+    # --- Escritura ---
+
+    def _build_documents(self, page: Dict[str, Any]) -> List[CanonicalDocument]:
+        metadata = CanonicalMetadata(
+            client_id=self.client_id, category=self.category, access_level=self.access_level, url=page["url"]
+        )
+        docs = []
+        for i, chunk in enumerate(split_text(page["text"])):
+            docs.append(CanonicalDocument(
+                content_id=f"{page['content_id']}_part_{i}",
+                source=SourceType.WEB_SCRAPE,
+                title=page["title"],
+                body_content=chunk,
+                metadata=metadata,
+                hash=self.vector_store.calculate_hash(chunk),
+            ))
+        return docs
+
+    def _write(self, pages: List[Dict[str, Any]]):
+        """Upsert masivo de las páginas cambiadas + estado de todas (síncrono: corre en un hilo)."""
+        from src.ETL_DOCS.text_ingest import upsert_documents_bulk
+
+        docs, stale = [], []
+        for page in pages:
+            if page.get("gone"):
+                stale.extend(f"{page['content_id']}_part_{i}" for i in range(page["previous_chunks"]))
+            if "text" not in page:
+                continue
+            page_docs = self._build_documents(page)
+            docs.extend(page_docs)
+            page["chunks"] = len(page_docs)
+            # La página se acortó: borrar los fragmentos que ya no existen
+            stale.extend(f"{page['content_id']}_part_{i}" for i in range(len(page_docs), page["previous_chunks"]))
+
+        if docs:
+            results = upsert_documents_bulk(self.vector_store, self.client_id, docs)
+            failed = {cid for cid, r in results.items() if r["status"] == "failed"}
+            self.stats["chunks_written"] += sum(1 for r in results.values() if r["status"] in ("created", "updated"))
+            self.stats["chunks_failed"] += len(failed)
+            for page in pages:
+                if "text" in page and any(cid.startswith(f"{page['content_id']}_part_") for cid in failed):
+                    # Sin validadores: el próximo crawl vuelve a descargar y reintentar la página
+                    page.update(etag=None, last_modified=None, content_hash=None)
+        self.vector_store.delete_vectors(self.client_id, stale)
+        self.vector_store.save_web_pages(self.client_id, pages)
+
+    async def _flush(self):
+        async with self._write_lock:
+            pages, self._pending_pages = self._pending_pages, []
+            if pages:
+                await asyncio.to_thread(self._write, pages)
+
+    # --- Recorrido ---
+
+    async def crawl(self) -> Dict[str, Any]:
+        self.state = await asyncio.to_thread(self.vector_store.get_web_pages, self.client_id)
+        started = time.monotonic()
+
+        queue: asyncio.Queue = asyncio.Queue()
+        seen = set()
+        for url in self.start_urls:
+            seen.add(url)
+            queue.put_nowait((url, 0))
+
+        limits = httpx.Limits(max_connections=self.concurrency_per_host * max(len(self.allowed_hosts), 1),
+                              max_keepalive_connections=self.concurrency_per_host * max(len(self.allowed_hosts), 1))
+        async with httpx.AsyncClient(
+            headers={"User-Agent": CRAWL_USER_AGENT}, timeout=CRAWL_TIMEOUT,
+            follow_redirects=True, limits=limits
+        ) as client:
+
+            async def worker():
+                while True:
+                    url, depth = await queue.get()
+                    try:
+                        links = await self._fetch(client, url)
+                        if links and depth < self.max_depth:
+                            for link in links:
+                                if link not in seen and len(seen) < self.max_pages:
+                                    seen.add(link)
+                                    queue.put_nowait((link, depth + 1))
+                    except Exception as e:
+                        logger.error(f"Error procesando {url}: {e}")
+                        self.stats["errors"] += 1
+                    finally:
+                        queue.task_done()
+
+            workers = [asyncio.create_task(worker())
+                       for _ in range(self.concurrency_per_host * max(len(self.allowed_hosts), 1))]
+            await queue.join()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        await self._flush()
+        self.stats["pages_seen"] = len(seen)
+        self.stats["seconds"] = round(time.monotonic() - started, 2)
+        logger.info(f"Crawl de {', '.join(sorted(self.allowed_hosts))} para {self.client_id}: {self.stats}")
+        return self.stats
+
+    def run(self) -> Dict[str, Any]:
+        return asyncio.run(self.crawl())
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv("/app/src/.env")
+    sys.path.append("/app/src")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - CRAWLER - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Crawler WEB_SCRAPE para la base de conocimiento")
+    parser.add_argument("client_id", type=UUID)
+    parser.add_argument("urls", nargs="+", help="URLs de inicio (el crawl no sale de sus hosts)")
+    parser.add_argument("--max-pages", type=int, default=CRAWL_MAX_PAGES)
+    parser.add_argument("--max-depth", type=int, default=CRAWL_MAX_DEPTH)
+    parser.add_argument("--concurrency", type=int, default=CRAWL_CONCURRENCY_PER_HOST, help="Requests simultáneos por host")
+    parser.add_argument("--access-level", default="shared")
+    parser.add_argument("--category", default="web")
+    args = parser.parse_args()
+
+    crawler = WebCrawler(args.client_id, args.urls, max_pages=args.max_pages, max_depth=args.max_depth,
+                         concurrency_per_host=args.concurrency, access_level=args.access_level, category=args.category)
+    print(crawler.run())
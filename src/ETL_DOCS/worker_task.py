@@ -1,35 +1,266 @@
 
+import os
 import logging
 from uuid import UUID
+from typing import Optional, List
+
+import pypdf
+from rq import Queue, get_current_job
+from rq.job import Job, Dependency
+
 from src.ETL_DOCS.processor import DocumentProcessor
+from src.shared.file_manager import FileManager
+from src.shared.schemas import IngestStatus
+from src.ETL_DOCS.progress import JobProgressReporter, report_range_finished, report_fanout_finished
+from src.ETL_DOCS.routing import FAST_QUEUE, FANOUT_RANGE_TIMEOUT, plan_page_ranges, select_range_queue
 
 # Configuración de log dedicada al Worker
 logger = logging.getLogger("worker")
 
-def process_document_task(file_path: str, client_id: UUID, content_id: str, original_filename: str, access_level: str = "private", category: str = "knowledge_base"):
+# Procesador reutilizado entre tareas del mismo proceso (conexión DB + cliente Gemini).
+# Con el Worker clásico (fork por job) cada tarea corre en un hijo nuevo y esto equivale
+# a un procesador fresco; en modo warm (worker_service --warm) se conserva entre jobs.
+_processor: Optional[DocumentProcessor] = None
+
+def get_processor() -> DocumentProcessor:
+    global _processor
+    if _processor is None or not _processor.vector_store.is_alive():
+        if _processor is not None:
+            logger.warning("[WORKER] Conexión DB caída. Recreando DocumentProcessor.")
+        _processor = DocumentProcessor()
+    return _processor
+
+def process_document_task(file_path: str, client_id: UUID, content_id: str, original_filename: str, access_level: str = "private", category: str = "knowledge_base", file_hash: str = None, ocr_profile: str = None, pages_total: Optional[int] = None):
     """
     Tarea ejecutable por RQ Worker.
     Es un wrapper simple alrededor del Processor, pero esencial para que RQ pueda
     serializar la llamada (pickle).
+    `pages_total` viene de la estimación del upload (None si no es un PDF legible): con él
+    se decide el fan-out sin abrir el PDF; solo un documento que se reparte lo lee para
+    enrutar sus rangos.
     """
     logger.info(f"👷 [WORKER] Iniciando tarea para: {content_id} (Access Level: {access_level}, Category: {category})")
     try:
-        # Instanciar procesador fresco para cada tarea (Thread-safe)
-        processor = DocumentProcessor()
+        # Procesador del proceso (fresco por tarea con fork, reutilizado en modo warm)
+        processor = get_processor()
+
+        # Originales ya archivados (gzip en COLD) se descomprimen a temp_work
+        local_path = FileManager.ensure_local(file_path)
+        try:
+            # PDFs grandes: repartir por rangos de páginas entre todos los workers
+            job = get_current_job()
+            ranges = plan_page_ranges(pages_total) if job and pages_total else []
+            if ranges:
+                # Cola por rango según su costo (con OCR, la pesada)
+                reader = pypdf.PdfReader(local_path)
+                ranges = [(first, last, select_range_queue(reader, first, last)) for first, last in ranges]
+                return _fan_out_document(job, processor, ranges, file_path, client_id, content_id, original_filename,
+                                         access_level, category, file_hash, ocr_profile)
+
+            result = processor.process_document(
+                file_path=local_path,
+                client_id=client_id,
+                content_id=content_id,
+                original_filename=original_filename,
+                access_level=access_level,
+                category=category,
+                file_hash=file_hash,
+                progress=JobProgressReporter(), # job.meta + pub/sub para SSE
+                ocr_profile=ocr_profile
+            )
+        finally:
+            if local_path != file_path and os.path.exists(local_path):
+                os.remove(local_path)
         
-        result = processor.process_document(
-            file_path=file_path,
+        logger.info(f"✅ [WORKER] Tarea completada: {result}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"❌ [WORKER] Tarea fallida para {content_id}: {e}")
+        # Re-lanzar para que RQ marque el job como Failed
+        raise e
+
+def _fan_out_document(job, processor: DocumentProcessor, ranges: List[tuple], file_path: str, client_id: UUID,
+                      content_id: str, original_filename: str, access_level: str, category: str,
+                      file_hash: Optional[str], ocr_profile: Optional[str]):
+    """
+    Encola un sub-job por rango de páginas (ranges: (primera, última, cola)) y un job de
+    agregación que depende de todos (allow_failure: se ejecuta aunque algún rango falle)
+    y cierra el Registro Maestro.
+    """
+    progress = JobProgressReporter(job)
+    # Limpieza única de fragmentos previos (los rangos solo insertan)
+    processor.vector_store.delete_document_chunks(client_id, content_id)
+    processor.vector_store.update_sync_status(client_id, content_id, "PROCESSING")
+
+    range_job_ids = [f"job_{content_id}_p{first}-{last}" for first, last, _ in ranges]
+    by_queue = {}
+    for (first, last, queue_name), job_id in zip(ranges, range_job_ids):
+        by_queue.setdefault(queue_name, []).append(Queue.prepare_data(
+            process_page_range_task,
+            args=(file_path, client_id, content_id, original_filename, first, last, access_level, category, ocr_profile),
+            timeout=FANOUT_RANGE_TIMEOUT,
+            result_ttl=86400,
+            job_id=job_id,
+            meta={"parent_job_id": job.id}
+        ))
+    range_jobs = []
+    for queue_name, jobs_data in by_queue.items():
+        range_jobs.extend(Queue(queue_name, connection=job.connection).enqueue_many(jobs_data))
+
+    # La agregación es barata: cola rápida
+    queue = Queue(FAST_QUEUE, connection=job.connection)
+    aggregate_job = queue.enqueue(
+        aggregate_document_task,
+        args=(client_id, content_id, range_job_ids, file_hash),
+        depends_on=Dependency(jobs=range_jobs, allow_failure=True),
+        job_timeout=120,
+        result_ttl=86400,
+        job_id=f"job_{content_id}_aggregate",
+        meta={"parent_job_id": job.id}
+    )
+
+    progress("fanout", ranges=len(ranges), aggregate_job_id=aggregate_job.id)
+    queues = ", ".join(f"{name}: {len(data)}" for name, data in by_queue.items())
+    logger.info(f"🔀 [WORKER] {content_id} repartido en {len(ranges)} rangos ({queues}). Agregación: {aggregate_job.id}")
+    return {
+        "status": IngestStatus.PROCESSING,
+        "content_id": content_id,
+        "fanout": {
+            "ranges": [f"{first}-{last}" for first, last, _ in ranges],
+            "range_job_ids": range_job_ids,
+            "aggregate_job_id": aggregate_job.id
+        },
+        "dedup": {"action": "processed", "file_hash": file_hash}
+    }
+
+def process_page_range_task(file_path: str, client_id: UUID, content_id: str, original_filename: str,
+                            first_page: int, last_page: int, access_level: str = "private",
+                            category: str = "knowledge_base", ocr_profile: str = None):
+    """Sub-job de fan-out: procesa un rango de páginas de un PDF grande."""
+    logger.info(f"👷 [WORKER] Rango {first_page}-{last_page} de {content_id}")
+    processor = get_processor()
+    job = get_current_job()
+    local_path = FileManager.ensure_local(file_path)
+    result = {"status": IngestStatus.FAILED}
+    try:
+        result = processor.process_page_range(
+            file_path=local_path,
             client_id=client_id,
             content_id=content_id,
             original_filename=original_filename,
+            first_page=first_page,
+            last_page=last_page,
             access_level=access_level,
-            category=category
+            category=category,
+            progress=JobProgressReporter(),
+            ocr_profile=ocr_profile
         )
-        
-        logger.info(f"✅ [WORKER] Tarea completada: {result}")
         return result
-        
+    finally:
+        if local_path != file_path and os.path.exists(local_path):
+            os.remove(local_path)
+        # Avance del documento en el canal del job padre (visores SSE del upload)
+        if job and job.meta.get("parent_job_id"):
+            status = getattr(result.get("status"), "value", result.get("status"))
+            report_range_finished(job.connection, job.meta["parent_job_id"], f"{first_page}-{last_page}", status)
+
+def aggregate_document_task(client_id: UUID, content_id: str, range_job_ids: List[str], file_hash: str = None):
+    """
+    Cierre del fan-out: SYNCED si todos los rangos terminaron bien; si no, FAILED
+    con el error de cada rango en error_message.
+    """
+    job = get_current_job()
+    range_jobs = Job.fetch_many(range_job_ids, connection=job.connection)
+    ranges, errors = [], []
+    chunks, chars = 0, 0
+    for job_id, range_job in zip(range_job_ids, range_jobs):
+        pages = job_id.rsplit("_p", 1)[-1]
+        result = range_job.result if range_job else None
+        if not range_job:
+            error = "job expirado"
+        elif isinstance(result, dict) and result.get("status") in (IngestStatus.SYNCED, IngestStatus.EMBEDDING):
+            error = None
+            chunks += result.get("chunks_processed", 0)
+            chars += result.get("total_chars", 0)
+        elif isinstance(result, dict):
+            error = result.get("error", "error desconocido")
+        else:
+            # Timeout o crash del worker: no hay resultado, solo traceback
+            error = (range_job.exc_info or "sin resultado").strip().splitlines()[-1]
+        ranges.append({"pages": pages, "status": "FAILED" if error else "SYNCED", "error": error})
+        if error:
+            errors.append(f"págs {pages}: {error}")
+
+    processor = get_processor()
+    if errors:
+        final_status = IngestStatus.FAILED
+        processor.vector_store.update_sync_status(client_id, content_id, "FAILED", "; ".join(errors))
+        logger.error(f"❌ [WORKER] Fan-out de {content_id} con {len(errors)} rangos fallidos")
+    else:
+        final_status = processor.mark_extracted(client_id, content_id)
+        logger.info(f"✅ [WORKER] Fan-out de {content_id} completado: {chunks} fragmentos ({final_status.value})")
+
+    # Estado final en el job padre: cierra los streams SSE y el snapshot de /jobs/{id}
+    parent_id = job.meta.get("parent_job_id")
+    parent = Job.fetch_many([parent_id], connection=job.connection)[0] if parent_id else None # None si expiró
+    if parent:
+        report_fanout_finished(
+            parent,
+            stage="failed" if errors else "done",
+            status=final_status.value,
+            chunks_processed=chunks,
+            ranges_failed=len(errors),
+            **({"error": "; ".join(errors)} if errors else {})
+        )
+
+    return {
+        "status": final_status,
+        "content_id": content_id,
+        "chunks_processed": chunks,
+        "total_chars": chars,
+        "ranges": ranges,
+        "dedup": {"action": "processed", "file_hash": file_hash}
+    }
+
+def link_document_task(client_id: UUID, content_id: str, linked_content_id: str, file_hash: str):
+    """
+    Tarea de dedup por contenido: el archivo subido es idéntico (mismo SHA-256) a un
+    documento ya registrado del cliente. No se re-procesa (sin OCR ni embeddings);
+    el registro nuevo reutiliza los vectores de `linked_content_id`.
+    """
+    logger.info(f"👷 [WORKER] Enlazando {content_id} -> vectores de {linked_content_id} (hash: {file_hash[:12]})")
+    try:
+        processor = get_processor()
+        result = processor.link_document(
+            client_id=client_id,
+            content_id=content_id,
+            linked_content_id=linked_content_id,
+            file_hash=file_hash
+        )
+
+        logger.info(f"✅ [WORKER] Enlace completado: {result}")
+        return result
+
     except Exception as e:
-        logger.error(f"❌ [WORKER] Tarea fallida para {content_id}: {e}")
-        # Re-lanzar para que RQ marque el job como Failed
+        logger.error(f"❌ [WORKER] Enlace fallido para {content_id}: {e}")
         raise e
+
+
+def crawl_site_task(client_id: UUID, start_urls: List[str], max_pages: Optional[int] = None, max_depth: Optional[int] = None,
+                    access_level: str = "shared", category: str = "web"):
+    """Crawl WEB_SCRAPE de un sitio del cliente (ver web_crawler.py). Re-crawls: GET condicional."""
+    from src.ETL_DOCS.web_crawler import WebCrawler, CRAWL_MAX_PAGES, CRAWL_MAX_DEPTH
+
+    logger.info(f"👷 [WORKER] Crawl de {start_urls} para {client_id}")
+    crawler = WebCrawler(
+        client_id, start_urls,
+        vector_store=get_processor().vector_store,
+        max_pages=max_pages or CRAWL_MAX_PAGES,
+        max_depth=max_depth if max_depth is not None else CRAWL_MAX_DEPTH,
+        access_level=access_level,
+        category=category
+    )
+    stats = crawler.run()
+    logger.info(f"✅ [WORKER] Crawl completado: {stats}")
+    return stats
@@ -1,5 +1,4 @@
 import os
-import json
 import psycopg2
 import time
 import random
@@ -7,6 +6,8 @@ from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 import logging
 from src.ETL_IMAGES.providers import get_image_provider
+from src.shared.http_session import format_session_stats
+from src.shared.json_stream import JsonArrayStream
 
 # Configuración de Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -77,10 +78,12 @@ class ImageLoader:
         """Procesa TODAS las imágenes de las primeras 'max_properties' propiedades."""
         logger.info(f"📂 Iniciando procesamiento de muestra para: {os.path.basename(filepath)}")
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # Lectura en streaming: solo una propiedad (con su raw_data_snapshot) en memoria a la vez
+        with JsonArrayStream(filepath) as properties:
+            self._process_properties(filepath, properties, properties.header.get("metadata", {}), max_properties)
 
-        client_id_str = str(data.get("metadata", {}).get("client_id", ""))
+    def _process_properties(self, filepath, properties, metadata, max_properties):
+        client_id_str = str(metadata.get("client_id", ""))
         provider_type = self.provider_mappings.get(client_id_str)
         
         if not provider_type:
@@ -94,7 +97,6 @@ class ImageLoader:
 
         properties_processed_count = 0
         total_images_downloaded = 0
-        properties = data.get("properties", [])
 
         for prop in properties:
             if properties_processed_count >= max_properties:
@@ -148,6 +150,7 @@ class ImageLoader:
                     time.sleep(sleep_time)
 
         logger.info(f"✅ Finalizado: {total_images_downloaded} imágenes procesadas de {properties_processed_count} propiedades para {os.path.basename(filepath)}")
+        logger.info(f"🔌 Conexiones HTTP: {format_session_stats()}")
 
 if __name__ == "__main__":
     import argparse
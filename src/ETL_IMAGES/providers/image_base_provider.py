@@ -6,6 +6,8 @@ from typing import List, Dict, Any
 from PIL import Image
 import logging
 
+from src.shared.http_session import get_session
+
 # Configuración de logs básica para el módulo
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -16,7 +18,9 @@ class ImageBaseProvider(ABC):
     Sigue la simetría de ETL_PROPERTIES.
     """
 
-    def __init__(self):
+    def __init__(self, session: requests.Session = None):
+        # None: session compartida por host de cada imagen (CDN del sitio)
+        self.session = session
         self.staging_root = "/app/data/staging/ETL_IMAGES/tmp"
         self.storage_root = "/app/data/storage/images"
         
@@ -41,7 +45,8 @@ class ImageBaseProvider(ABC):
         Descarga la imagen a staging, calcula su hash y retorna metadatos.
         """
         try:
-            response = requests.get(url, timeout=15, stream=True)
+            session = self.session or get_session(url)
+            response = session.get(url, timeout=15, stream=True)
             response.raise_for_status()
             
             content = response.content
@@ -0,0 +1,105 @@
+import sys
+import time
+import random
+import argparse
+
+import cleaning
+from cleaning import (
+    clean_price, clean_area, clean_smallint, clean_numeric_small,
+    clean_price_column, clean_area_column, clean_smallint_column, clean_numeric_small_column,
+)
+
+# Casos golden: formatos reales de los sitios + bordes de las funciones por fila
+GOLDEN_VALUES = [
+    None, "", 0, 0.0, False, True, [], {}, "0", "0.0", ".", "..", "abc", " ",
+    "$150,000", "₡ 95.000.000", "150.000,50", "1.234.567", "1,5", "1.5.", ".5", "5.",
+    "USD 250000", "250000 USD", "1e+20", 1e20, 1e-7, 3.0, 125000, 125000.75, "  980 000  ",
+    "9999999999999.99", "10000000000000", "9" * 400, "0" * 30 + "7", "12" + "0" * 20,
+    "3 habitaciones", "2.5 baños", "Estudio", "1/2", "-5", "+3", "3-4", "٣", "3٣", "²",
+    "1000000", "1000000.01", "1,000,001", 99, 99.9, 100, 101, "100.00001", 30000, 30001,
+    "m² 1.250", "1.250 m2", "0,00", "Consultar", "N/A", "∞", "१२३",
+]
+GOLDEN_CURRENCIES = [None, "", "USD", "usd", " crc ", "CRC", "colones", "EUR", "₡", 1, "uſd", "crcx"]
+
+
+def _random_value(rng):
+    kind = rng.random()
+    if kind < 0.15:
+        return rng.choice(GOLDEN_VALUES)
+    if kind < 0.3:
+        return rng.choice([rng.randint(0, 5_000_000), rng.uniform(0, 3_000_000), rng.randint(0, 10)])
+    chars = "0123456789.,$₡ mUSDCRC²k-"
+    return "".join(rng.choice(chars) for _ in range(rng.randint(0, 16)))
+
+
+def _same(a, b):
+    """Igualdad estricta: mismo valor y mismo tipo (str(0) != str(0.0) en price_raw)."""
+    return type(a) is type(b) and a == b
+
+
+def check_golden(n_random=200_000, seed=7):
+    """Compara las versiones columnares contra las funciones por fila. Retorna cantidad de diferencias."""
+    rng = random.Random(seed)
+    values = GOLDEN_VALUES + [_random_value(rng) for _ in range(n_random)]
+    currencies = [rng.choice(GOLDEN_CURRENCIES) for _ in values]
+    expected_prices = [clean_price(v, c) for v, c in zip(values, currencies)]
+
+    mismatches = 0
+    prices, currs = clean_price_column(values, currencies)
+    checks = [
+        ("clean_price", list(zip(prices, currs)), expected_prices),
+        ("clean_area", clean_area_column(values), [clean_area(v) for v in values]),
+        ("clean_smallint", clean_smallint_column(values, 100), [clean_smallint(v, 100) for v in values]),
+        ("clean_numeric_small", clean_numeric_small_column(values, 99), [clean_numeric_small(v, 99) for v in values]),
+    ]
+    for name, got, expected in checks:
+        bad = [(values[i], got[i], expected[i]) for i in range(len(values))
+               if not (_same(got[i], expected[i]) if not isinstance(expected[i], tuple)
+                       else all(_same(x, y) for x, y in zip(got[i], expected[i])))]
+        mismatches += len(bad)
+        status = "✅" if not bad else f"❌ {len(bad)} diferencias"
+        print(f"   - {name}: {len(values)} valores {status}")
+        for value, g, e in bad[:5]:
+            print(f"       {value!r}: columnar={g!r} por_fila={e!r}")
+    return mismatches
+
+
+def benchmark(rows=1_000_000, seed=11):
+    rng = random.Random(seed)
+    sample_prices = ["$150,000", "₡ 95.000.000", "250000", 125000, "1.234.567", "", None, "Consultar"]
+    sample_areas = ["120", "1.250 m2", "85,5", 300, None, ""]
+    sample_rooms = ["3", "2 habitaciones", 4, "", None, "Estudio"]
+    sample_baths = ["2.5", "1,5", 2, None, ""]
+    prices = [rng.choice(sample_prices) for _ in range(rows)]
+    currencies = [rng.choice(["USD", "CRC", None]) for _ in range(rows)]
+    areas = [rng.choice(sample_areas) for _ in range(rows)]
+    beds = [rng.choice(sample_rooms) for _ in range(rows)]
+    baths = [rng.choice(sample_baths) for _ in range(rows)]
+
+    started = time.perf_counter()
+    for p, c, a, b, ba in zip(prices, currencies, areas, beds, baths):
+        clean_price(p, c); clean_area(a); clean_smallint(b, 100); clean_numeric_small(ba, 99)
+    per_row = time.perf_counter() - started
+
+    started = time.perf_counter()
+    clean_price_column(prices, currencies); clean_area_column(areas)
+    clean_smallint_column(beds, 100); clean_numeric_small_column(baths, 99)
+    columnar = time.perf_counter() - started
+
+    print(f"   - Por fila: {per_row:.2f}s | Columnar: {columnar:.2f}s | {per_row / columnar:.1f}x ({rows:,} filas)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Golden + benchmark de la limpieza columnar del loader")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Filas del benchmark")
+    parser.add_argument("--skip-benchmark", action="store_true")
+    args = parser.parse_args()
+
+    if not cleaning.COLUMNAR_AVAILABLE:
+        print("⚠️ pyarrow no está instalado: las funciones columnares usan la versión por fila.")
+    print("🔍 Golden: columnar vs por fila")
+    failures = check_golden()
+    if not args.skip_benchmark:
+        print("⏱️ Benchmark")
+        benchmark(args.rows)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,122 @@
+import os
+import sys
+import uuid
+import argparse
+
+import psycopg2
+from dotenv import load_dotenv
+
+# Raíz del repo en el path: el feed vive en src.shared
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.shared.property_changes import fetch_changes_since, next_cursor, START_CURSOR
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "scripts")
+MIGRATIONS = ("create_property_changes_table.sql", "add_property_changes_txid.sql")
+
+
+def connect(dsn=None):
+    if dsn:
+        return psycopg2.connect(dsn)
+    load_dotenv("/app/src/.env")
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASS")
+    )
+
+
+def create_scratch_table(conn, schema):
+    """lead_property_changes con las migraciones reales, en un schema descartable."""
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}")
+        for name in MIGRATIONS:
+            with open(os.path.join(SCRIPTS_DIR, name), encoding="utf-8") as f:
+                cur.execute(f.read().replace("public.", f"{schema}."))
+    conn.commit()
+
+
+def write_change(conn, table, external_prop_id):
+    """Un cambio en la transacción abierta de `conn` (sin commit). Retorna su id."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            INSERT INTO {table} (client_id, property_id, external_prop_id, change_type)
+            VALUES (%s, %s, %s, 'updated') RETURNING id
+        """, (str(uuid.uuid4()), str(uuid.uuid4()), external_prop_id))
+        return cur.fetchone()[0]
+
+
+def check_interleaved_writers(dsn=None):
+    """
+    Dos cargas en paralelo: la de id menor confirma DESPUÉS que la de id mayor.
+    Un cursor por id salta el cambio que confirma tarde; el cursor (txid, id) no.
+    Retorna la cantidad de errores.
+    """
+    schema = f"etl_check_{uuid.uuid4().hex[:8]}"
+    table = f"{schema}.lead_property_changes"
+    admin, writer_a, writer_b, reader = connect(dsn), connect(dsn), connect(dsn), connect(dsn)
+    reader.autocommit = True
+    delivered, naive_seen = [], []
+    cursor, naive_last = START_CURSOR, 0
+
+    def read():
+        nonlocal cursor, naive_last
+        with reader.cursor() as cur:
+            rows = fetch_changes_since(cur, cursor, table=table)
+            cur.execute(f"SELECT id FROM {table} WHERE id > %s ORDER BY id", (naive_last,))
+            naive = [r[0] for r in cur.fetchall()]
+        cursor = next_cursor(rows, cursor)
+        delivered.extend(r["change_id"] for r in rows)
+        if naive:
+            naive_last = naive[-1]
+            naive_seen.extend(naive)
+        return [r["change_id"] for r in rows]
+
+    try:
+        create_scratch_table(admin, schema)
+        written = []
+        # Ronda 1: A toma id y xid primero, B confirma antes
+        written.append(write_change(writer_a, table, "a1"))
+        written.append(write_change(writer_b, table, "b1"))
+        writer_b.commit()
+        print(f"   - B confirmó con A en vuelo -> feed: {read()}")
+        written.append(write_change(writer_a, table, "a2"))
+        writer_a.commit()
+        print(f"   - A confirmó -> feed: {read()}")
+        # Ronda 2: el de xid menor confirma primero
+        written.append(write_change(writer_a, table, "a3"))
+        written.append(write_change(writer_b, table, "b2"))
+        writer_a.commit()
+        print(f"   - A confirmó con B en vuelo -> feed: {read()}")
+        writer_b.commit()
+        print(f"   - B confirmó -> feed: {read()}")
+        print(f"   - Feed vacío al final: {read() == []}")
+
+        errors = 0
+        if sorted(delivered) != sorted(written) or len(set(delivered)) != len(delivered):
+            errors += 1
+            print(f"   ❌ Feed (txid, id): escritos {sorted(written)}, entregados {delivered}")
+        else:
+            print(f"   ✅ Feed (txid, id): {len(written)} cambios, cada uno una vez")
+        lost = sorted(set(written) - set(naive_seen))
+        print(f"   ℹ️ Cursor por id (referencia): {len(lost)} cambios perdidos {lost}")
+        return errors
+    finally:
+        for conn in (writer_a, writer_b, reader):
+            conn.close()
+        admin.rollback()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        admin.commit()
+        admin.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check del cursor del feed lead_property_changes con escrituras intercaladas")
+    parser.add_argument("--dsn", default=None, help="DSN de Postgres (default: DB_* de /app/src/.env)")
+    args = parser.parse_args()
+
+    print("🔍 Feed de cambios: dos transacciones de escritura intercaladas")
+    sys.exit(1 if check_interleaved_writers(args.dsn) else 0)
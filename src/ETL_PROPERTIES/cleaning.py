@@ -0,0 +1,201 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Kernels de strings de Arrow (RE2) para limpiar columnas enteras; sin pyarrow se usa la versión por fila
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    COLUMNAR_AVAILABLE = True
+except ImportError:
+    COLUMNAR_AVAILABLE = False
+
+PRICE_MAX = 9999999999999.99 # Limite Numeric(15,2)
+CRC_THRESHOLD = 1000000      # Heurística de moneda: montos mayores son colones
+AREA_MAX = 9999999.99
+
+# --- FUNCIONES DE LIMPIEZA (Lógica de Negocio en Python, una fila) ---
+# Referencia de comportamiento (golden): las versiones columnares deben dar exactamente lo mismo.
+
+def clean_price(val, currency_raw):
+    if not val: return 0, currency_raw
+    s = str(val).strip().replace(',', '.')
+    s_clean = re.sub(r'[^0-9.]', '', s)
+    if s_clean.count('.') > 1:
+        parts = s_clean.split('.')
+        s_clean = f"{''.join(parts[:-1])}.{parts[-1]}"
+    try:
+        num = float(s_clean)
+        # Limite Numeric(15,2)
+        if num > 9999999999999.99: return 0, 'USD'
+        
+        # Validar y limpiar moneda inicial
+        final_currency = str(currency_raw).strip().upper()[:3] if currency_raw else 'USD'
+        if final_currency not in ['USD', 'CRC']:
+            final_currency = 'USD'
+
+        # Heurística de moneda
+        if num > 1000000:
+            final_currency = 'CRC'
+            
+        return num, final_currency
+    except:
+        return 0, 'USD'
+
+def clean_area(val):
+    if not val: return None
+    s = str(val).strip().replace(',', '.')
+    s_clean = re.sub(r'[^0-9.]', '', s)
+    try:
+        num = float(s_clean)
+        if num <= 0 or num > 9999999.99: return None 
+        return num
+    except:
+        return None
+
+def clean_smallint(val, max_limit=30000):
+    if not val: return None
+    match = re.search(r'(\d+)', str(val))
+    if not match: return None
+    try:
+        num = int(match.group(1))
+        return num if num <= max_limit else None
+    except:
+        return None
+
+def clean_numeric_small(val, max_limit=99.9):
+    if not val: return None
+    s = str(val).strip().replace(',', '.')
+    s_clean = re.sub(r'[^0-9.]', '', s)
+    try:
+        num = float(s_clean)
+        return num if num <= max_limit else None
+    except:
+        return None
+
+def normalize_currency(currency_raw):
+    """Moneda validada de clean_price (USD o CRC), antes de la heurística por monto."""
+    final_currency = str(currency_raw).strip().upper()[:3] if currency_raw else 'USD'
+    if final_currency not in ['USD', 'CRC']:
+        final_currency = 'USD'
+    return final_currency
+
+# --- LIMPIEZA COLUMNAR (pyarrow.compute) ---
+# Mismo resultado que las funciones de arriba, valor por valor (ver benchmark_cleaning.py),
+# pero cada paso corre una vez sobre la columna completa.
+
+def _as_strings(values: Sequence[Any]) -> "pa.Array":
+    """str(v) de cada valor (los JSON traen números, strings y booleanos mezclados)."""
+    return pa.array([v if type(v) is str else str(v) for v in values], type=pa.string())
+
+def _truthy(values: Sequence[Any]) -> "pa.Array":
+    """`not val` de las funciones por fila (None, "", 0, False, [], {} son vacíos)."""
+    return pa.array([bool(v) for v in values], type=pa.bool_())
+
+def _numeric_strings(values: Sequence[Any]) -> "pa.Array":
+    """str(v).replace(',', '.') sin nada fuera de [0-9.] (el strip no cambia el resultado)."""
+    arr = pc.replace_substring(_as_strings(values), ",", ".")
+    return pc.replace_substring_regex(arr, "[^0-9.]+", "")
+
+def _to_float(arr: "pa.Array") -> "pa.Array":
+    """float() de cada string; null donde float() fallaría (vacío, '.', más de un punto)."""
+    valid = pc.match_substring_regex(arr, r"^([0-9]+\.?[0-9]*|\.[0-9]+)$")
+    return pc.if_else(valid, pc.cast(pc.if_else(valid, arr, "0"), pa.float64()), None)
+
+def _columnar(columnar_fn, row_fn):
+    """Versión columnar si pyarrow está disponible y acepta los datos; si no, fila por fila."""
+    if COLUMNAR_AVAILABLE:
+        try:
+            return columnar_fn()
+        except (pa.ArrowException, UnicodeError):
+            pass # Ej. surrogates sueltos que no son UTF-8 válido
+    return row_fn()
+
+def clean_price_column(values: Sequence[Any], currencies: Sequence[Any]) -> Tuple[List[Any], List[Any]]:
+    """Columna de clean_price: (precios, monedas)."""
+    def rows():
+        cleaned = [clean_price(v, c) for v, c in zip(values, currencies)]
+        return [p for p, _ in cleaned], [c for _, c in cleaned]
+    return _columnar(lambda: _clean_price_arrow(values, currencies), rows)
+
+def clean_area_column(values: Sequence[Any]) -> List[Optional[float]]:
+    """Columna de clean_area."""
+    return _columnar(lambda: _clean_area_arrow(values), lambda: [clean_area(v) for v in values])
+
+def clean_smallint_column(values: Sequence[Any], max_limit=30000) -> List[Optional[int]]:
+    """Columna de clean_smallint."""
+    return _columnar(lambda: _clean_smallint_arrow(values, max_limit),
+                     lambda: [clean_smallint(v, max_limit) for v in values])
+
+def clean_numeric_small_column(values: Sequence[Any], max_limit=99.9) -> List[Optional[float]]:
+    """Columna de clean_numeric_small."""
+    return _columnar(lambda: _clean_numeric_small_arrow(values, max_limit),
+                     lambda: [clean_numeric_small(v, max_limit) for v in values])
+
+def _clean_price_arrow(values, currencies):
+    arr = _numeric_strings(values)
+    # Más de un punto: solo queda el último (separadores de miles); se recalculan solo esas filas
+    multi_dot = pc.greater(pc.count_substring(arr, "."), 1)
+    if pc.any(multi_dot).as_py():
+        sub = pc.filter(arr, multi_dot)
+        int_part = pc.replace_substring(pc.replace_substring_regex(sub, r"\.[^.]*$", ""), ".", "")
+        frac_part = pc.replace_substring_regex(sub, r"^.*\.", "")
+        arr = pc.replace_with_mask(arr, multi_dot, pc.binary_join_element_wise(int_part, frac_part, "."))
+
+    nums = _to_float(arr)
+    truthy = _truthy(values)
+    valid = pc.and_(truthy, pc.fill_null(pc.less_equal(nums, PRICE_MAX), False))
+    prices = pc.if_else(valid, nums, None).to_pylist()
+    # Moneda por fila: 'EMPTY' = valor vacío (se devuelve la moneda tal cual), 'USD' = inválido,
+    # 'CRC' = heurística por monto, None = moneda declarada normalizada
+    kind = pc.if_else(
+        pc.invert(truthy), "EMPTY",
+        pc.if_else(pc.invert(valid), "USD", pc.if_else(pc.greater(nums, CRC_THRESHOLD), "CRC", None))
+    ).to_pylist()
+
+    normalized: Dict[Any, str] = {}
+    for currency_raw in currencies:
+        try:
+            if currency_raw not in normalized:
+                normalized[currency_raw] = normalize_currency(currency_raw)
+        except TypeError: # No hasheable: se resuelve en la fila
+            pass
+
+    def currency_of(k, currency_raw):
+        if k is not None:
+            return currency_raw if k == "EMPTY" else k
+        try:
+            return normalized[currency_raw]
+        except TypeError:
+            return normalize_currency(currency_raw)
+
+    out_prices = [0 if p is None else p for p in prices] # 0 entero, como la versión por fila
+    out_currencies = [currency_of(k, c) for k, c in zip(kind, currencies)]
+    return out_prices, out_currencies
+
+def _clean_area_arrow(values):
+    nums = _to_float(_numeric_strings(values))
+    ok = pc.and_(_truthy(values), pc.and_(pc.greater(nums, 0), pc.less_equal(nums, AREA_MAX)))
+    return pc.if_else(ok, nums, None).to_pylist()
+
+def _clean_numeric_small_arrow(values, max_limit):
+    nums = _to_float(_numeric_strings(values))
+    ok = pc.and_(_truthy(values), pc.less_equal(nums, max_limit))
+    return pc.if_else(ok, nums, None).to_pylist()
+
+def _clean_smallint_arrow(values, max_limit):
+    arr = _as_strings(values)
+    digits = pc.struct_field(pc.extract_regex(arr, r"(?P<d>[0-9]+)"), [0])
+    # Sin ceros a la izquierda: más de 18 dígitos no entra en int64 y supera cualquier límite
+    digits = pc.utf8_ltrim(digits, "0")
+    digits = pc.if_else(pc.equal(digits, ""), "0", digits)
+    fits = pc.less_equal(pc.utf8_length(digits), 18)
+    nums = pc.cast(pc.if_else(fits, digits, "0"), pa.int64())
+    ok = pc.and_(_truthy(values), pc.and_(fits, pc.less_equal(nums, max_limit)))
+    result = pc.if_else(ok, nums, None).to_pylist()
+
+    # \d de Python también acepta dígitos Unicode (ej. árabe-índicos): esas filas van por la versión por fila
+    non_ascii = pc.invert(pc.string_is_ascii(arr))
+    if pc.any(non_ascii).as_py():
+        for i in pc.indices_nonzero(non_ascii).to_pylist():
+            result[i] = clean_smallint(values[i], max_limit)
+    return result
@@ -1,73 +1,51 @@
 import os
+import io
+import sys
 import json
 import uuid
+import time
 import hashlib
 import psycopg2
-import re
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dotenv import load_dotenv
 import logging
 
+# Raíz del repo en el path: el lector en streaming vive en src.shared
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.shared.json_stream import JsonArrayStream
+from src.shared.property_changes import publish_property_changes
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# --- FUNCIONES DE LIMPIEZA (Lógica de Negocio en Python) ---
+# Filas limpias acumuladas por cada COPY a la tabla de stage del lote (memoria acotada)
+STAGE_BATCH_SIZE = int(os.getenv("PROPERTIES_STAGE_BATCH_SIZE", "500"))
+# Corridas por cliente que se conservan en stage_properties (auditoría); 0 = no archivar y vaciarla
+STAGE_KEEP_RUNS = int(os.getenv("PROPERTIES_STAGE_KEEP_RUNS", "2"))
+# Guarda de extracción parcial: sin soft delete si el lote trae menos que esta fracción del inventario activo
+SOFT_DELETE_MIN_SHARE = float(os.getenv("PROPERTIES_SOFT_DELETE_MIN_SHARE", "0.5"))
+# Procesos de carga en paralelo (cada uno con su conexión); 1 = secuencial
+LOADER_WORKERS = int(os.getenv("PROPERTIES_LOADER_WORKERS", "1"))
+# Días que se conservan en lead_property_changes (feed de cambios para ETL_IMAGES / ETL_POIS)
+CHANGE_RETENTION_DAYS = int(os.getenv("PROPERTIES_CHANGE_RETENTION_DAYS", "30"))
+# Namespace del advisory lock por cliente (pg_advisory_xact_lock(namespace, hashtext(client_id)))
+CLIENT_LOCK_NAMESPACE = 4801
 
-def clean_price(val, currency_raw):
-    if not val: return 0, currency_raw
-    s = str(val).strip().replace(',', '.')
-    s_clean = re.sub(r'[^0-9.]', '', s)
-    if s_clean.count('.') > 1:
-        parts = s_clean.split('.')
-        s_clean = f"{''.join(parts[:-1])}.{parts[-1]}"
-    try:
-        num = float(s_clean)
-        # Limite Numeric(15,2)
-        if num > 9999999999999.99: return 0, 'USD'
-        
-        # Validar y limpiar moneda inicial
-        final_currency = str(currency_raw).strip().upper()[:3] if currency_raw else 'USD'
-        if final_currency not in ['USD', 'CRC']:
-            final_currency = 'USD'
-
-        # Heurística de moneda
-        if num > 1000000:
-            final_currency = 'CRC'
-            
-        return num, final_currency
-    except:
-        return 0, 'USD'
-
-def clean_area(val):
-    if not val: return None
-    s = str(val).strip().replace(',', '.')
-    s_clean = re.sub(r'[^0-9.]', '', s)
-    try:
-        num = float(s_clean)
-        if num <= 0 or num > 9999999.99: return None 
-        return num
-    except:
-        return None
+STAGE_COLUMNS = (
+    "batch_id", "client_id", "external_prop_id",
+    "url", "title", "price_raw", "currency_raw",
+    "description_raw", "location_json", "features_json",
+    "images_json", "raw_snapshot", "content_hash",
+)
 
-def clean_smallint(val, max_limit=30000):
-    if not val: return None
-    match = re.search(r'(\d+)', str(val))
-    if not match: return None
-    try:
-        num = int(match.group(1))
-        return num if num <= max_limit else None
-    except:
-        return None
-
-def clean_numeric_small(val, max_limit=99.9):
-    if not val: return None
-    s = str(val).strip().replace(',', '.')
-    s_clean = re.sub(r'[^0-9.]', '', s)
-    try:
-        num = float(s_clean)
-        return num if num <= max_limit else None
-    except:
-        return None
+# --- FUNCIONES DE LIMPIEZA ---
+# Por fila (referencia) y columnares (pyarrow, por lote) en cleaning.py
+from cleaning import (
+    clean_price, clean_area, clean_smallint, clean_numeric_small,
+    clean_price_column, clean_area_column, clean_smallint_column, clean_numeric_small_column,
+)
 
 # --- MAIN LOADER ---
 
@@ -87,32 +65,29 @@ def calculate_content_hash(item):
     hash_content = f"{item.get('title')}|{item.get('price')}|{item.get('currency')}|{item.get('sqm')}|{item.get('location', {}).get('lat')}|{item.get('location', {}).get('lng')}|{features_str}"
     return hashlib.sha256(hash_content.encode('utf-8')).hexdigest()
 
-def process_file(filepath, conn):
-    batch_id = str(uuid.uuid4())
-    logger.info(f"🚀 Procesando archivo: {os.path.basename(filepath)}")
-    
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        
-    client_id = data.get("metadata", {}).get("client_id")
-    if not client_id: return
+def is_published(p):
+    """Filtro Status (WordPress o similar): buscamos en raiz o en raw_data."""
+    status = p.get("status") or p.get("raw_data_snapshot", {}).get("status", "active")
+    return str(status).lower() in ['publish', 'active', 'published']
 
-    properties = data.get("properties", [])
-    cleaned_rows = []
-    
-    for p in properties:
-        # Filtro Status (WordPress o similar)
-        # Buscamos en raiz o en raw_data
-        status = p.get("status") or p.get("raw_data_snapshot", {}).get("status", "active")
-        if str(status).lower() not in ['publish', 'active', 'published']:
-            continue
-            
-        clean_p, clean_curr = clean_price(p.get("price"), p.get("currency"))
-        clean_sqm = clean_area(p.get("sqm") or p.get("features", {}).get("sqm"))
-        clean_beds = clean_smallint(p.get("features", {}).get("bedrooms"), 100)
-        clean_baths = clean_numeric_small(p.get("features", {}).get("bathrooms"), 99)
-        
-        feats = p.get("features", {})
+def clean_property_rows(props, batch_id, client_id, known_hashes=None):
+    """
+    Filas de stage_properties para un lote de propiedades publicadas.
+    Precio, área, dormitorios y baños se limpian por columna (una pasada por campo para todo el lote).
+
+    Con `known_hashes` ({external_prop_id: content_hash} de lead_properties activas), las propiedades
+    sin cambios no generan fila completa: se retornan aparte sus ids (solo cuentan para el soft delete).
+    Retorna (filas, ids_sin_cambios).
+    """
+    features = [p.get("features", {}) for p in props]
+    prices, currencies = clean_price_column([p.get("price") for p in props], [p.get("currency") for p in props])
+    sqms = clean_area_column([p.get("sqm") or f.get("sqm") for p, f in zip(props, features)])
+    beds = clean_smallint_column([f.get("bedrooms") for f in features], 100)
+    baths = clean_numeric_small_column([f.get("bathrooms") for f in features], 99)
+
+    rows, unchanged = [], []
+    for p, feats, clean_p, clean_curr, clean_sqm, clean_beds, clean_baths in zip(
+            props, features, prices, currencies, sqms, beds, baths):
         feats['sqm_clean'] = clean_sqm
         feats['bedrooms_clean'] = clean_beds
         feats['bathrooms_clean'] = clean_baths
@@ -122,11 +97,15 @@ def process_file(filepath, conn):
              raw_desc = str(p["raw_data_snapshot"]["content"].get("rendered", ""))
         
         content_hash = calculate_content_hash(p)
+        external_id = str(p.get("external_id"))
+        if known_hashes is not None and known_hashes.get(external_id) == content_hash:
+            unchanged.append((external_id,))
+            continue
         
-        cleaned_rows.append((
+        rows.append((
             batch_id,
             client_id,
-            str(p.get("external_id")),
+            external_id,
             p.get("url"),
             (p.get("title") or "Sin Título")[:250],
             str(clean_p),
@@ -138,24 +117,155 @@ def process_file(filepath, conn):
             json.dumps(p.get("raw_data_snapshot", {})),
             content_hash
         ))
+    return rows, unchanged
+
+def _copy_value(val):
+    """Valor en formato text de COPY (NULL = \\N; escapes de backslash, tab y saltos de línea)."""
+    if val is None:
+        return "\\N"
+    return str(val).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+def copy_rows(cur, table, rows, columns=STAGE_COLUMNS):
+    """Escribe las filas con COPY FROM STDIN (un round-trip por lote, sin armar SQL)."""
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_value(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+
+def prune_stage_properties(conn, keep_runs=STAGE_KEEP_RUNS):
+    """
+    Retención de stage_properties: conserva las últimas `keep_runs` corridas por cliente
+    (según stage_batches) y borra el resto, incluidos lotes viejos sin registro.
+    keep_runs = 0 vacía la tabla con TRUNCATE.
+    """
+    cur = conn.cursor()
+    try:
+        if keep_runs <= 0:
+            cur.execute("TRUNCATE public.stage_properties")
+            logger.info("🧹 stage_properties vaciada (PROPERTIES_STAGE_KEEP_RUNS=0).")
+        else:
+            cur.execute("""
+                DELETE FROM public.stage_properties sp
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM (
+                        SELECT batch_id,
+                               row_number() OVER (PARTITION BY client_id ORDER BY created_at DESC) AS run_rank
+                        FROM public.stage_batches
+                    ) keep
+                    WHERE keep.run_rank <= %(keep_runs)s
+                      AND keep.batch_id = sp.batch_id
+                );
+            """, {'keep_runs': keep_runs})
+            logger.info(f"🧹 stage_properties: {cur.rowcount} filas de corridas viejas borradas (se conservan {keep_runs} por cliente).")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"❌ Error en la retención de stage_properties: {e}")
+    finally:
+        cur.close()
+
+def prune_property_changes(conn, retention_days=CHANGE_RETENTION_DAYS):
+    """Borra del feed lead_property_changes los cambios con más de `retention_days` días."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "DELETE FROM public.lead_property_changes WHERE changed_at < NOW() - make_interval(days => %s)",
+            (retention_days,)
+        )
+        logger.info(f"🧹 lead_property_changes: {cur.rowcount} cambios de más de {retention_days} días borrados.")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"❌ Error en la retención de lead_property_changes: {e}")
+    finally:
+        cur.close()
+
+def fetch_active_hashes(cur, client_id):
+    """{external_prop_id: content_hash} de las propiedades activas del cliente (una consulta)."""
+    cur.execute(
+        "SELECT external_prop_id, content_hash FROM public.lead_properties WHERE client_id = %s AND status != 'deleted'",
+        (client_id,)
+    )
+    return dict(cur.fetchall())
+
+def process_file(filepath, conn, force_soft_delete=False, hash_filter=True):
+    """
+    Carga un JSON de sitio. Retorna las métricas de la corrida (para el resumen de main).
+    Con hash_filter, solo las propiedades nuevas o cambiadas viajan completas al stage; sin él
+    todas se stagean y se re-mergean (también las de hash igual).
+    """
+    batch_id = str(uuid.uuid4())
+    logger.info(f"🚀 Procesando archivo: {os.path.basename(filepath)}")
+    started = time.monotonic()
+    stats = {"file": os.path.basename(filepath), "status": "error", "staged": 0, "unchanged": 0,
+             "merged": 0, "deleted": 0, "soft_delete_skipped": False, "seconds": 0.0}
+    changes = [] # Feed de cambios del lote (RETURNING), se publica después del commit
     
     cur = conn.cursor()
     try:
-        # 1. Insert Stage
-        insert_query = """
-            INSERT INTO public.stage_properties (
-                batch_id, client_id, external_prop_id, 
-                url, title, price_raw, currency_raw, 
-                description_raw, location_json, features_json, 
-                images_json, raw_snapshot, content_hash
-            ) VALUES %s
-        """
-        from psycopg2.extras import execute_values
-        execute_values(cur, insert_query, cleaned_rows)
+        # 1. Stage del lote: tablas temporales propias (sin WAL, se descartan al commit).
+        #    stage_batch = filas completas (nuevas/cambiadas); stage_unchanged = solo ids sin cambios.
+        cur.execute("""
+            CREATE TEMP TABLE stage_batch (LIKE public.stage_properties INCLUDING DEFAULTS)
+            ON COMMIT DROP
+        """)
+        cur.execute("CREATE TEMP TABLE stage_unchanged (external_prop_id TEXT) ON COMMIT DROP")
+
+        # Las propiedades se leen en streaming y se copian de a STAGE_BATCH_SIZE
+        # (nunca está el archivo entero en memoria; todo en la misma transacción)
+        staged, unchanged = 0, 0
+        with JsonArrayStream(filepath) as stream:
+            client_id = stream.header.get("metadata", {}).get("client_id")
+            if not client_id:
+                logger.warning(f"⚠️ {os.path.basename(filepath)} sin metadata.client_id (debe ir antes de 'properties'). Saltando...")
+                conn.rollback() # Descarta las tablas de stage
+                stats["status"] = "skipped"
+                return stats
+
+            # Una carga por cliente a la vez (otro archivo del mismo cliente, otro proceso o corrida):
+            # el mapa de hashes sigue válido hasta el merge. El lock se libera al commit/rollback.
+            cur.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", (CLIENT_LOCK_NAMESPACE, str(client_id)))
+
+            # Inventario activo antes del merge (el merge reactiva propiedades dadas de baja)
+            active_hashes = fetch_active_hashes(cur, client_id)
+            active_rows = len(active_hashes)
+            known_hashes = active_hashes if hash_filter else None
+
+            def flush(pending):
+                rows, same = clean_property_rows(pending, batch_id, client_id, known_hashes)
+                if rows:
+                    copy_rows(cur, "stage_batch", rows)
+                if same:
+                    copy_rows(cur, "stage_unchanged", same, columns=("external_prop_id",))
+                return len(rows), len(same)
+
+            pending = []
+            for p in stream:
+                if not is_published(p):
+                    continue
+                pending.append(p)
+                if len(pending) >= STAGE_BATCH_SIZE:
+                    rows, same = flush(pending)
+                    staged, unchanged = staged + rows, unchanged + same
+                    pending = []
+            if pending:
+                rows, same = flush(pending)
+                staged, unchanged = staged + rows, unchanged + same
+        # Índices para el anti-join del soft delete; autovacuum no analiza tablas temporales
+        cur.execute("CREATE INDEX ON stage_batch (external_prop_id)")
+        cur.execute("CREATE INDEX ON stage_unchanged (external_prop_id)")
+        cur.execute("ANALYZE stage_batch")
+        cur.execute("ANALYZE stage_unchanged")
+        logger.info(f"📥 {os.path.basename(filepath)}: {staged} propiedades en stage, {unchanged} sin cambios.")
         
         # 2. Merge Final a lead_properties
-        # Mapeo exacto basado en el esquema real de la tabla
+        # Mapeo exacto basado en el esquema real de la tabla. Las filas insertadas/actualizadas
+        # vuelven por RETURNING (xmax = 0 -> insert) y quedan en lead_property_changes.
         merge_sql = """
+        WITH merged AS (
         INSERT INTO public.lead_properties (
             client_id, external_prop_id, title, public_url, 
             price, currency_id, area_sqm, bedrooms, bathrooms,
@@ -183,8 +293,7 @@ def process_file(filepath, conn):
                 WHEN POSITION('apartamento' IN LOWER(s.title)) > 0 THEN 2
                 ELSE 1
             END
-        FROM public.stage_properties s
-        WHERE s.batch_id = %(batch_id)s
+        FROM stage_batch s
         ON CONFLICT (client_id, external_prop_id) DO UPDATE SET
             updated_at = NOW(),
             title = EXCLUDED.title,
@@ -201,38 +310,196 @@ def process_file(filepath, conn):
             content_hash = EXCLUDED.content_hash,
             status = 'active',
             property_type_id = EXCLUDED.property_type_id
-        WHERE lead_properties.content_hash IS DISTINCT FROM EXCLUDED.content_hash 
-           OR lead_properties.status = 'deleted';
-        """
-        cur.execute(merge_sql, {'batch_id': batch_id})
-        logger.info(f"✅ {os.path.basename(filepath)}: {cur.rowcount} sincronizados.")
-
-        # 3. Soft Delete
-        delete_sql = """
-        UPDATE public.lead_properties
-        SET status = 'deleted', updated_at = NOW()
-        WHERE client_id = %(client_id)s
-          AND status != 'deleted'
-          AND external_prop_id NOT IN (
-              SELECT external_prop_id FROM public.stage_properties WHERE batch_id = %(batch_id)s
-          );
+        WHERE %(remerge)s
+           OR lead_properties.content_hash IS DISTINCT FROM EXCLUDED.content_hash 
+           OR lead_properties.status = 'deleted'
+        RETURNING id, client_id, external_prop_id, (xmax = 0) AS inserted
+        )
+        INSERT INTO public.lead_property_changes (client_id, property_id, external_prop_id, change_type, batch_id)
+        SELECT client_id, id, external_prop_id,
+               CASE WHEN inserted THEN 'inserted' ELSE 'updated' END,
+               %(batch_id)s
+        FROM merged
+        RETURNING id, txid::text::bigint, property_id, external_prop_id, change_type;
         """
-        cur.execute(delete_sql, {'client_id': client_id, 'batch_id': batch_id})
+        # Sin filtro de hash (--restage-all) se re-mergea todo: aplica un mapeo nuevo aunque el hash no cambie
+        cur.execute(merge_sql, {'batch_id': batch_id, 'remerge': not hash_filter})
+        changes.extend(cur.fetchall())
+        merged = len(changes)
+        logger.info(f"✅ {os.path.basename(filepath)}: {merged} sincronizados.")
 
+        # 3. Soft Delete (anti-join). Un archivo truncado (--limit, scrape cortado) no representa
+        #    el sitio: si trae menos de SOFT_DELETE_MIN_SHARE del inventario activo, no se borra nada.
+        deleted = 0
+        seen = staged + unchanged
+        soft_delete_skipped = (
+            not force_soft_delete and active_rows > 0 and seen < active_rows * SOFT_DELETE_MIN_SHARE
+        )
+        if soft_delete_skipped:
+            logger.warning(
+                f"⚠️ {os.path.basename(filepath)}: soft delete OMITIDO, el lote trae {seen} propiedades "
+                f"y hay {active_rows} activas (mínimo {SOFT_DELETE_MIN_SHARE:.0%}). "
+                f"¿Extracción parcial? Forzar con --force-soft-delete."
+            )
+        else:
+            delete_sql = """
+            WITH deleted AS (
+            UPDATE public.lead_properties lp
+            SET status = 'deleted', updated_at = NOW()
+            WHERE lp.client_id = %(client_id)s
+              AND lp.status != 'deleted'
+              AND NOT EXISTS (
+                  SELECT 1 FROM stage_batch s WHERE s.external_prop_id = lp.external_prop_id
+              )
+              AND NOT EXISTS (
+                  SELECT 1 FROM stage_unchanged u WHERE u.external_prop_id = lp.external_prop_id
+              )
+            RETURNING lp.id, lp.client_id, lp.external_prop_id
+            )
+            INSERT INTO public.lead_property_changes (client_id, property_id, external_prop_id, change_type, batch_id)
+            SELECT client_id, id, external_prop_id, 'deleted', %(batch_id)s
+            FROM deleted
+            RETURNING id, txid::text::bigint, property_id, external_prop_id, change_type;
+            """
+            cur.execute(delete_sql, {'client_id': client_id, 'batch_id': batch_id})
+            deleted_rows = cur.fetchall()
+            changes.extend(deleted_rows)
+            deleted = len(deleted_rows)
+            logger.info(f"🗑️ {os.path.basename(filepath)}: {deleted} dadas de baja.")
+
+        # 4. Registro de la corrida y archivo del lote en stage_properties (si se conservan corridas)
+        if STAGE_KEEP_RUNS > 0:
+            cur.execute("INSERT INTO public.stage_properties SELECT * FROM stage_batch")
+        cur.execute("""
+            INSERT INTO public.stage_batches (
+                batch_id, client_id, source_file, staged_rows, merged_rows, deleted_rows,
+                active_rows, soft_delete_skipped, unchanged_rows
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (batch_id, client_id, os.path.basename(filepath), staged, merged, deleted,
+              active_rows, soft_delete_skipped, unchanged))
         
         conn.commit()
+        stats.update(status="ok", staged=staged, unchanged=unchanged, merged=merged, deleted=deleted,
+                     soft_delete_skipped=soft_delete_skipped)
+
+        # 5. Aviso en vivo (Redis Stream) de lo ya confirmado; si falla, los consumidores
+        #    se ponen al día desde lead_property_changes por id
+        publish_property_changes([
+            {"change_id": change_id, "txid": txid, "client_id": client_id, "property_id": property_id,
+             "external_prop_id": external_prop_id, "change_type": change_type, "batch_id": batch_id}
+            for change_id, txid, property_id, external_prop_id, change_type in changes
+        ])
     except Exception as e:
         conn.rollback()
         logger.error(f"❌ Error en {os.path.basename(filepath)}: {e}")
     finally:
         cur.close()
+        stats["seconds"] = time.monotonic() - started
+    return stats
+
+# --- CARGA MULTI-SITIO ---
+
+def file_client_id(filepath):
+    """client_id de la metadata del JSON (solo lee el encabezado)."""
+    try:
+        with JsonArrayStream(filepath) as stream:
+            return stream.header.get("metadata", {}).get("client_id")
+    except Exception:
+        return None
+
+def group_files_by_client(filepaths):
+    """
+    Un grupo por cliente (sus archivos van en orden, en el mismo proceso), los más pesados primero
+    para repartir mejor entre procesos.
+    """
+    groups = {}
+    for path in filepaths:
+        groups.setdefault(file_client_id(path) or path, []).append(path)
+    return sorted(groups.values(), key=lambda paths: sum(os.path.getsize(p) for p in paths), reverse=True)
+
+_worker_conn = None
+
+def _load_files(filepaths, force_soft_delete=False, hash_filter=True):
+    """Tarea de un proceso del pool: carga los archivos de un cliente con la conexión del proceso."""
+    global _worker_conn
+    if _worker_conn is None or _worker_conn.closed:
+        _worker_conn = get_db_connection()
+    return [process_file(path, _worker_conn, force_soft_delete=force_soft_delete, hash_filter=hash_filter)
+            for path in filepaths]
+
+def load_files(filepaths, workers=LOADER_WORKERS, force_soft_delete=False, hash_filter=True):
+    """Carga los archivos (en paralelo por cliente si workers > 1). Retorna las métricas por archivo."""
+    if workers <= 1 or len(filepaths) <= 1:
+        conn = get_db_connection()
+        try:
+            return [process_file(path, conn, force_soft_delete=force_soft_delete, hash_filter=hash_filter)
+                    for path in filepaths]
+        finally:
+            conn.close()
+
+    groups = group_files_by_client(filepaths)
+    workers = min(workers, len(groups))
+    logger.info(f"⚙️ Cargando {len(filepaths)} archivos de {len(groups)} clientes en {workers} procesos...")
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_load_files, group, force_soft_delete, hash_filter): group for group in groups}
+        for future in as_completed(futures):
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                # Proceso caído (ej. sin conexión a la BD): sus archivos quedan como error
+                for path in futures[future]:
+                    logger.error(f"❌ Error en {os.path.basename(path)}: {e}")
+                    results.append({"file": os.path.basename(path), "status": "error", "staged": 0, "unchanged": 0,
+                                    "merged": 0, "deleted": 0, "soft_delete_skipped": False, "seconds": 0.0})
+    order = {os.path.basename(path): i for i, path in enumerate(filepaths)}
+    return sorted(results, key=lambda r: order.get(r["file"], 0))
+
+def print_summary(results, elapsed):
+    """Tabla de filas y tiempos por archivo."""
+    headers = ("Archivo", "Estado", "Stage", "Sin cambios", "Sincron.", "Bajas", "Tiempo")
+    rows = [(
+        r["file"],
+        r["status"] + (" (sin bajas)" if r["soft_delete_skipped"] else ""),
+        str(r["staged"]), str(r["unchanged"]), str(r["merged"]), str(r["deleted"]), f"{r['seconds']:.1f}s",
+    ) for r in results]
+    widths = [max(len(h), *(len(row[i]) for row in rows)) if rows else len(h) for i, h in enumerate(headers)]
+    line = "  ".join(h.ljust(w) for h, w in zip(headers, widths))
+    print(f"\n📊 Resumen de carga")
+    print(line)
+    print("-" * len(line))
+    for row in rows:
+        print("  ".join(c.ljust(w) if i < 2 else c.rjust(w) for i, (c, w) in enumerate(zip(row, widths))))
+    total = lambda k: sum(r[k] for r in results)
+    print("-" * len(line))
+    print(f"{len(results)} archivos | {total('staged')} en stage | {total('unchanged')} sin cambios | "
+          f"{total('merged')} sincronizadas | "
+          f"{total('deleted')} bajas | {sum(r['status'] == 'error' for r in results)} con error | {elapsed:.1f}s en total")
 
 def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Loader de propiedades (JSON -> lead_properties)")
+    parser.add_argument("--prune-only", action="store_true", help="Solo aplicar la retención de stage_properties y del feed de cambios")
+    parser.add_argument("--force-soft-delete", action="store_true",
+                        help="Dar de baja lo ausente aunque el lote sea chico (bajas masivas reales)")
+    parser.add_argument("--workers", type=int, default=LOADER_WORKERS,
+                        help="Procesos de carga en paralelo, uno por cliente a la vez (default PROPERTIES_LOADER_WORKERS)")
+    parser.add_argument("--restage-all", action="store_true",
+                        help="Stage y merge completos sin comparar hashes (ej. tras cambiar el mapeo del merge)")
+    args = parser.parse_args()
+
+    if not args.prune_only:
+        output_dir = "/app/src/ETL_PROPERTIES/output"
+        files = sorted([f for f in os.listdir(output_dir) if f.endswith('.json')])
+        started = time.monotonic()
+        results = load_files([os.path.join(output_dir, f) for f in files], workers=args.workers,
+                             force_soft_delete=args.force_soft_delete, hash_filter=not args.restage_all)
+        print_summary(results, time.monotonic() - started)
+
     conn = get_db_connection()
-    output_dir = "/app/src/ETL_PROPERTIES/output"
-    files = sorted([f for f in os.listdir(output_dir) if f.endswith('.json')])
-    for f in files:
-        process_file(os.path.join(output_dir, f), conn)
+    prune_stage_properties(conn)
+    prune_property_changes(conn)
     conn.close()
 
 if __name__ == "__main__":
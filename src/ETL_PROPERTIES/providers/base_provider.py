@@ -1,7 +1,55 @@
+import os
 import json
+import time
+import random
+import threading
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+
+import requests
+
+from src.shared.http_session import get_session
+
+# --- EXTRACCIÓN CONCURRENTE DE DETALLES ---
+# Requests de detalle simultáneos por sitio y presupuesto de cortesía (requests/seg por sitio).
+DETAIL_CONCURRENCY = int(os.getenv("PROPERTIES_DETAIL_CONCURRENCY", "4"))
+DETAIL_REQUESTS_PER_SECOND = float(os.getenv("PROPERTIES_DETAIL_RPS", "3"))
+# Detalles por request vía WP REST include= (la API acepta hasta 100 por página)
+DETAIL_BATCH_SIZE = max(1, min(int(os.getenv("PROPERTIES_DETAIL_BATCH_SIZE", "100")), 100))
+# Respuestas que indican que el sitio no acepta include=/_fields (se desactivan los lotes en la corrida)
+BATCH_UNSUPPORTED_STATUS = (400, 404)
+
+# --- DESCUBRIMIENTO INCREMENTAL (DELTA) ---
+# modified_after de WP compara contra la hora local del sitio: el filtro del servidor se abre
+# DELTA_QUERY_MARGIN_HOURS hacia atrás y el corte exacto se hace con modified_gmt.
+DELTA_QUERY_MARGIN_HOURS = float(os.getenv("PROPERTIES_DELTA_QUERY_MARGIN_HOURS", "14"))
+DELTA_STOP_TOLERANCE_SECONDS = 60
+
+
+class PolitenessBudget:
+    """
+    Limita el ritmo de requests a un sitio: como máximo `requests_per_second` inicios
+    de request por segundo (con jitter), sin importar cuántos hilos estén extrayendo.
+    """
+
+    def __init__(self, requests_per_second: float, jitter: float = 0.3):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        if slot > now:
+            time.sleep(slot - now)
+
 
 class BaseRealEstateProvider(ABC):
     """
@@ -9,21 +57,101 @@ class BaseRealEstateProvider(ABC):
     Define el contrato que cada tema (Houzez, RealHomes, etc.) debe cumplir.
     """
 
-    def __init__(self, site_name: str, base_url: str):
+    # Detalle por lotes (WP REST include=). Los providers que lo soportan definen los
+    # _fields / _embed que usa parse_property_item; None = solo detalle por slug.
+    detail_fields: Optional[str] = None
+    detail_embed: Optional[str] = None
+
+    def __init__(self, site_name: str, base_url: str, session: requests.Session = None):
         self.site_name = site_name
         self.base_url = base_url.rstrip("/")
-        self.extracted_data = []
+        # Session keep-alive compartida por host (inyectable); segura entre los hilos de extracción
+        self.session = session or get_session(self.base_url)
+        # Propiedades por external_id (orden de inserción = orden del JSON de salida)
+        self.properties: Dict[str, Dict[str, Any]] = {}
+        self._journal = None
+        self.detail_concurrency = DETAIL_CONCURRENCY
+        self.requests_per_second = DETAIL_REQUESTS_PER_SECOND
+        self.batch_details_enabled = self.detail_fields is not None
+        # False si get_links cortó por un error: la lista de enlaces no sirve para detectar bajas
+        self.discovery_complete = True
+        # Detalles que fallaron en la última corrida: {external_id: modified_gmt del listado}
+        self.failed_extractions: Dict[str, Optional[str]] = {}
 
     @abstractmethod
-    def get_links(self) -> List[Dict[str, Any]]:
-        """Descubre todas las URLs de propiedades (usualmente via API o Sitemap)."""
+    def get_links(self, modified_after: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Descubre las URLs de propiedades (usualmente via API o Sitemap).
+        Con `modified_after` (UTC) solo las modificadas desde entonces (descubrimiento delta).
+        """
         pass
 
+    def delta_params(self, modified_after: datetime) -> Dict[str, Any]:
+        """Parámetros WP REST del modo delta: más recientes primero, filtradas por el servidor."""
+        query_from = modified_after - timedelta(hours=DELTA_QUERY_MARGIN_HOURS)
+        return {"orderby": "modified", "order": "desc", "modified_after": query_from.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    @staticmethod
+    def parse_modified_gmt(modified_gmt: Any) -> Optional[datetime]:
+        """modified_gmt de WP (UTC, sin zona) como datetime; None si falta o no se entiende."""
+        if not modified_gmt:
+            return None
+        try:
+            return datetime.fromisoformat(str(modified_gmt).replace("Z", ""))
+        except ValueError:
+            return None
+
+    @classmethod
+    def is_older_than(cls, item: Dict[str, Any], modified_after: datetime) -> bool:
+        """True si el item no cambió desde modified_after (con orderby=modified, se deja de paginar)."""
+        modified = cls.parse_modified_gmt(item.get("modified_gmt"))
+        if modified is None:
+            return False
+        return modified < modified_after - timedelta(seconds=DELTA_STOP_TOLERANCE_SECONDS)
+
+    def oldest_failed_modified(self) -> Optional[datetime]:
+        """
+        modified_gmt (UTC) más antiguo entre los detalles que fallaron en la corrida: el próximo
+        delta debe arrancar ahí para volver a pedirlos. None si no falló ninguno; datetime.min si
+        alguno no trae fecha (no se puede avanzar la marca).
+        """
+        if not self.failed_extractions:
+            return None
+        dates = [self.parse_modified_gmt(m) for m in self.failed_extractions.values()]
+        if any(d is None for d in dates):
+            return datetime.min
+        return min(dates)
+
     @abstractmethod
     def extract_property_details(self, url: str, **kwargs) -> Dict[str, Any]:
         """Extrae la ficha técnica de una URL específica."""
         pass
 
+    @abstractmethod
+    def parse_property_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Convierte un post de la WP REST API (detalle por lotes) en la ficha normalizada."""
+        pass
+
+    def fetch_details_batch(self, wp_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Trae hasta 100 posts en UNA request (include=) con solo los campos que se usan.
+        Retorna {wp_id: item}; los ids ausentes (no publicados, borrados) no aparecen.
+        """
+        params = {
+            "include": ",".join(wp_ids),
+            "per_page": len(wp_ids),
+            "orderby": "include",
+            "_fields": self.detail_fields,
+        }
+        if self.detail_embed:
+            params["_embed"] = self.detail_embed
+        response = self.session.get(self.api_url, headers=getattr(self, "headers", None), params=params, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, list):
+            raise ValueError(f"Respuesta inesperada de include=: {type(data).__name__}")
+        return {str(item.get("id")): item for item in data if isinstance(item, dict)}
+
     def normalize_data(self, raw_item: Dict[str, Any]) -> Dict[str, Any]:
         """
         Asegura que el dato final tenga el formato 'Canonical' para la tabla Stage.
@@ -58,12 +186,52 @@ class BaseRealEstateProvider(ABC):
             "raw_data_snapshot": raw_item.get("raw") # Por seguridad
         }
 
+    @property
+    def extracted_data(self) -> List[Dict[str, Any]]:
+        """Vista en lista de `properties` (mismo contenido y orden que el JSON de salida)."""
+        return list(self.properties.values())
+
+    def put_property(self, details: Dict[str, Any]):
+        """Inserta o reemplaza una propiedad (O(1)); una actualización pasa al final, como en el JSON."""
+        ext_id = str(details.get("external_id"))
+        self.properties.pop(ext_id, None)
+        self.properties[ext_id] = details
+
+    @staticmethod
+    def journal_path(filename: str) -> str:
+        """Journal de checkpoints del JSON de salida (output/Sitio.json -> output/Sitio.journal.jsonl)."""
+        root, _ = os.path.splitext(filename)
+        return f"{root}.journal.jsonl"
+
+    def open_journal(self, filename: str):
+        """Abre (append) el journal: cada propiedad extraída se escribe como una línea JSON."""
+        self.close_journal()
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        self._journal = open(self.journal_path(filename), "a", encoding="utf-8")
+        if self._journal.tell() > 0:
+            self._journal.write("\n") # Cierra una posible línea cortada por un crash anterior
+
+    def append_to_journal(self, details: Dict[str, Any]):
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps(details, ensure_ascii=False) + "\n")
+        self._journal.flush() # Un crash pierde como mucho la propiedad en curso
+
+    def close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
     def save_to_json(self, filename: str, client_id: str = None):
-        """Guarda los resultados normalizados en un archivo JSON."""
+        """
+        Compacta: escribe el JSON final (atómico, vía archivo temporal) con el estado en
+        memoria y borra el journal, cuyas propiedades ya quedaron incluidas.
+        """
+        self.close_journal()
         metadata = {
             "site": self.site_name,
             "url": self.base_url,
-            "total_count": len(self.extracted_data),
+            "total_count": len(self.properties),
             "timestamp": datetime.utcnow().isoformat()
         }
         if client_id:
@@ -73,25 +241,52 @@ class BaseRealEstateProvider(ABC):
             "metadata": metadata,
             "properties": self.extracted_data
         }
-        with open(filename, "w", encoding="utf-8") as f:
+        tmp_path = f"{filename}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(output, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, filename)
+        if os.path.exists(self.journal_path(filename)):
+            os.remove(self.journal_path(filename))
         print(f"📁 Datos guardados en {filename}")
 
-    def load_existing_data(self, filename: str):
-        """Carga datos previos de un JSON para permitir reanudación."""
-        try:
-            with open(filename, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.extracted_data = data.get("properties", [])
-                print(f"📥 Se cargaron {len(self.extracted_data)} registros previos de {filename}")
-        except FileNotFoundError:
-            # print(f"ℹ️ No se encontró archivo previo en {filename}. Iniciando desde cero.")
-            self.extracted_data = []
-        except Exception as e:
-            print(f"⚠️ Error cargando datos previos: {e}")
-            self.extracted_data = []
-
-    def run_full_extraction(self, limit: int = None, output_path: str = None, client_id: str = None, known_data: dict = None):
+    def load_existing_data(self, filename: str, include_snapshot: bool = True):
+        """
+        Carga datos previos para permitir reanudación: el último JSON compactado y, encima,
+        el journal de una corrida interrumpida (la última línea de un id gana).
+        Con include_snapshot=False solo se reanuda el journal (modo --force).
+        """
+        self.properties = {}
+        if include_snapshot:
+            try:
+                with open(filename, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                for prop in data.get("properties", []):
+                    self.put_property(prop)
+                print(f"📥 Se cargaron {len(self.properties)} registros previos de {filename}")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠️ Error cargando datos previos: {e}")
+                self.properties = {}
+
+        journal = self.journal_path(filename)
+        if not os.path.exists(journal):
+            return
+        replayed, torn = 0, 0
+        with open(journal, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    self.put_property(json.loads(line))
+                    replayed += 1
+                except ValueError:
+                    torn += 1 # Línea cortada por el crash
+        print(f"♻️ Reanudando corrida interrumpida: {replayed} propiedades del journal {journal}"
+              + (f" ({torn} líneas incompletas descartadas)" if torn else ""))
+
+    def run_full_extraction(self, limit: int = None, output_path: str = None, client_id: str = None, known_data: dict = None,
+                            concurrency: int = None, requests_per_second: float = None, modified_after: datetime = None):
         """
         Ejecuta la extracción inteligente de todos los enlaces descubiertos.
         
@@ -100,23 +295,35 @@ class BaseRealEstateProvider(ABC):
             output_path: Ruta para guardado incremental.
             client_id: ID del cliente.
             known_data: Diccionario {external_id: last_updated_at} para sincronización inteligente.
+            concurrency: Detalles extraídos en paralelo (default PROPERTIES_DETAIL_CONCURRENCY).
+            requests_per_second: Presupuesto de cortesía del sitio (default PROPERTIES_DETAIL_RPS).
+            modified_after: Descubrimiento delta (UTC, ej. last_run_at). None = barrido completo,
+                que además quita del JSON las propiedades que ya no están en el sitio.
         """
-        import random
-        import time
-        from datetime import datetime
-
-        links = self.get_links()
+        links = self.get_links(modified_after=modified_after)
         if limit: links = links[:limit]
 
+        # Barrido completo y sin cortes: lo que no apareció fue dado de baja en el sitio
+        if modified_after is None and not limit and self.discovery_complete and links:
+            live_ids = {str(l.get("wp_id") or l.get("external_id", "")) for l in links}
+            gone = [ext_id for ext_id in self.properties if ext_id not in live_ids]
+            for ext_id in gone:
+                del self.properties[ext_id]
+            if gone:
+                print(f"🗑️ {len(gone)} propiedades ya no existen en el sitio (quitadas del JSON).")
+
         if known_data is None: known_data = {}
+        self.failed_extractions = {}
 
         # Mapeo de lo que ya tenemos en el JSON local para no repetir en la misma sesión
-        local_data = {str(p.get("external_id")): p.get("ingested_at") for p in self.extracted_data}
+        local_data = {ext_id: p.get("ingested_at") for ext_id, p in self.properties.items()}
         
         newly_extracted = 0
         skipped_count = 0
         updated_count = 0
 
+        # 1. Decidir qué enlaces extraer (sin red)
+        to_extract = []
         for i, link_data in enumerate(links):
             ext_id = str(link_data.get("wp_id") or link_data.get("external_id", ""))
             
@@ -158,27 +365,90 @@ class BaseRealEstateProvider(ABC):
 
             if not should_extract:
                 continue
+            to_extract.append((i, ext_id, reason, link_data))
 
+        # 2. Extracción concurrente: tope de hilos por sitio + presupuesto de requests/seg
+        workers = max(1, concurrency or self.detail_concurrency)
+        budget = PolitenessBudget(requests_per_second or self.requests_per_second)
+
+        def extract(task):
+            i, ext_id, reason, link_data = task
+            budget.wait()
             print(f"[{i+1}/{len(links)}] {reason}: {link_data.get('slug') or ext_id}")
             # Evitar pasar 'url' dos veces (una por posición y otra por kwargs)
             extra_params = {k: v for k, v in link_data.items() if k != 'url'}
-            details = self.extract_property_details(link_data["url"], **extra_params)
-            
-            if details:
-                # Si es una actualización, reemplazamos la anterior en extracted_data
-                if ext_id in local_data:
-                    self.extracted_data = [p for p in self.extracted_data if str(p.get("external_id")) != ext_id]
-                
-                self.extracted_data.append(details)
+            try:
+                return self.extract_property_details(link_data["url"], **extra_params)
+            except Exception as e:
+                print(f"❌ Error extrayendo {link_data.get('slug') or ext_id}: {e}")
+                return {}
+
+        def extract_group(group):
+            """Un lote de hasta DETAIL_BATCH_SIZE ids en una request; fallback por slug si falla."""
+            if not use_batches or not self.batch_details_enabled:
+                return [extract(task) for task in group]
+            budget.wait()
+            wp_ids = [str(task[3]["wp_id"]) for task in group]
+            print(f"[{group[0][0]+1}..{group[-1][0]+1}/{len(links)}] Lote de {len(group)} detalles (include=)")
+            try:
+                items = self.fetch_details_batch(wp_ids)
+            except Exception as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status in BATCH_UNSUPPORTED_STATUS:
+                    # Sitio que rechaza include=/_fields: el resto de la corrida va por slug
+                    print(f"⚠️ {self.site_name} no soporta detalle por lotes ({e}). Usando detalle por slug...")
+                    self.batch_details_enabled = False
+                else:
+                    # Timeout, 5xx tras los reintentos de la sesión...: solo este lote va por slug
+                    print(f"⚠️ Lote de {len(group)} detalles falló ({e}). Reintentando este lote por slug...")
+                return [extract(task) for task in group]
+
+            group_results = []
+            for task, wp_id in zip(group, wp_ids):
+                item = items.get(wp_id)
+                if item is None:
+                    group_results.append(extract(task)) # Ausente en el lote: camino por slug
+                    continue
+                try:
+                    group_results.append(self.parse_property_item(item))
+                except Exception as e:
+                    print(f"❌ Error en detalle de {wp_id} (lote): {e}")
+                    group_results.append({})
+            return group_results
+
+        use_batches = self.batch_details_enabled and all(task[3].get("wp_id") for task in to_extract)
+        batch_size = DETAIL_BATCH_SIZE if use_batches else 1
+        groups = [to_extract[i:i + batch_size] for i in range(0, len(to_extract), batch_size)]
+
+        if to_extract:
+            rate = requests_per_second or self.requests_per_second
+            mode = f"lotes de {batch_size}" if use_batches else "por slug"
+            print(f"⚙️ Extrayendo {len(to_extract)} propiedades ({mode}, {workers} en paralelo, máx {rate} req/s)...")
+        started = time.monotonic()
+        if output_path and to_extract:
+            self.open_journal(output_path)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"extract-{self.site_name}") as executor:
+            # map conserva el orden de los enlaces: el merge es idéntico al secuencial
+            results = (details for group_results in executor.map(extract_group, groups) for details in group_results)
+
+            # 3. Merge en orden
+            for (_, ext_id, _, link_data), details in zip(to_extract, results):
+                if not details:
+                    # Timeout, 429, 5xx...: queda pendiente para el próximo delta (ver oldest_failed_modified)
+                    self.failed_extractions[ext_id] = link_data.get("modified_gmt")
+                    continue
+                # Nueva o actualización (reemplaza la anterior): O(1) por external_id
+                self.put_property(details)
                 local_data[ext_id] = details.get("ingested_at")
                 newly_extracted += 1
-                
-                # if output_path:
-                #    self.save_to_json(output_path, client_id=client_id)
-            
-            # Delay entre extracción
-            time.sleep(random.uniform(0.5, 1.5)) # Reducimos delay, ahora somos mas inteligentes
+                # Checkpoint: una línea en el journal (save_to_json lo compacta al final)
+                self.append_to_journal(details)
+        self.close_journal()
         
         print(f"✅ Proceso finalizado.")
         print(f"   - {skipped_count} Propiedades sin cambios (saltadas).")
         print(f"   - {newly_extracted} Propiedades procesadas (nuevas o actualizadas).")
+        if self.failed_extractions:
+            print(f"   - {len(self.failed_extractions)} Propiedades con error (se reintentan en la próxima corrida).")
+        if to_extract:
+            print(f"   - {len(to_extract)} detalles en {time.monotonic() - started:.1f}s.")
@@ -1,7 +1,8 @@
 import random
 import requests
 import time
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Optional
 from .base_provider import BaseRealEstateProvider
 
 class HouzezProvider(BaseRealEstateProvider):
@@ -10,18 +11,24 @@ class HouzezProvider(BaseRealEstateProvider):
     Usa la WP REST API con metadatos prefijados con 'fave_'.
     """
 
-    def __init__(self, site_name: str, base_url: str, api_endpoint: str = "/wp-json/wp/v2/properties"):
-        super().__init__(site_name, base_url)
+    # Campos de parse_property_item (+ raw_data_snapshot: status/content para el loader, imagen destacada)
+    detail_fields = "id,link,slug,title,status,content,modified_gmt,property_meta,yoast_head_json,featured_image_url,_links,_embedded"
+    detail_embed = "wp:term"
+
+    def __init__(self, site_name: str, base_url: str, api_endpoint: str = "/wp-json/wp/v2/properties", session: requests.Session = None):
+        super().__init__(site_name, base_url, session=session)
         self.api_url = f"{self.base_url}{api_endpoint}"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
 
-    def get_links(self) -> List[Dict[str, Any]]:
+    def get_links(self, modified_after: Optional[datetime] = None) -> List[Dict[str, Any]]:
         links = []
         page = 1
         use_modified_gmt = True
-        print(f"📡 Buscando propiedades en {self.site_name} (Houzez)...")
+        self.discovery_complete = True
+        mode = f"delta desde {modified_after:%Y-%m-%d %H:%M} UTC" if modified_after else "barrido completo"
+        print(f"📡 Buscando propiedades en {self.site_name} (Houzez, {mode})...")
         
         while True:
             try:
@@ -30,9 +37,16 @@ class HouzezProvider(BaseRealEstateProvider):
                     fields += ",modified_gmt"
 
                 params = {"per_page": 20, "page": page, "_fields": fields}
-                response = requests.get(self.api_url, headers=self.headers, params=params, timeout=10)
+                if modified_after:
+                    params.update(self.delta_params(modified_after))
+                response = self.session.get(self.api_url, headers=self.headers, params=params, timeout=10)
                 
                 if response.status_code == 400:
+                    # Delta no soportado (orderby=modified / modified_after): barrido completo
+                    if modified_after and page == 1:
+                        print(f"⚠️ {self.site_name} no soporta descubrimiento delta. Reintentando con barrido completo...")
+                        modified_after = None
+                        continue
                     # Si falla por modified_gmt en la primera página, reintentamos sin el campo
                     if use_modified_gmt and page == 1:
                         print(f"⚠️ {self.site_name} no soporta 'modified_gmt' en API. Reintentando sin filtrado de fecha...")
@@ -45,7 +59,12 @@ class HouzezProvider(BaseRealEstateProvider):
                 batch = response.json()
                 if not batch: break
                 
+                reached_old = False
                 for item in batch:
+                    # Orden por modificación: el primer item sin cambios marca el fin del delta
+                    if modified_after and self.is_older_than(item, modified_after):
+                        reached_old = True
+                        break
                     links.append({
                         "wp_id": item["id"], 
                         "url": item["link"], 
@@ -56,12 +75,16 @@ class HouzezProvider(BaseRealEstateProvider):
                 total_pages = int(response.headers.get("X-WP-TotalPages", 1))
                 print(f"   - Pagina {page}/{total_pages} leída...")
                 
+                if reached_old:
+                    print(f"   - Delta completo: el resto no cambió desde la última corrida.")
+                    break
                 if page >= total_pages: break
                 page += 1
                 # Sleep aleatorio por cada página de links
                 time.sleep(random.uniform(1.0, 3.0)) 
             except Exception as e:
                 print(f"❌ Error obteniendo links en página {page}: {e}")
+                self.discovery_complete = False
                 break
         
         print(f"✅ Se encontraron {len(links)} propiedades.")
@@ -74,76 +97,78 @@ class HouzezProvider(BaseRealEstateProvider):
         try:
             # Usar _embed=true para capturar taxonomías (amenidades) si existen
             params = {"slug": slug, "_embed": "true"}
-            response = requests.get(self.api_url, headers=self.headers, params=params, timeout=15)
+            response = self.session.get(self.api_url, headers=self.headers, params=params, timeout=15)
             response.raise_for_status()
             
             data_list = response.json()
             if not isinstance(data_list, list) or not data_list: return {}
-            
-            item = data_list[0]
-            meta = item.get("property_meta", {})
-            if not isinstance(meta, dict): meta = {}
+            return self.parse_property_item(data_list[0])
+
+        except Exception as e:
+            print(f"❌ Error en detalle de {slug} (Houzez): {e}")
+            return {}
 
-            # Función helper para obtener valores de Houzez (vienen en listas)
-            def get_first(key):
-                val = meta.get(key)
-                return val[0] if isinstance(val, list) and val else val
+    def parse_property_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Ficha normalizada desde un post de la API (detalle por slug o por lote include=)."""
+        meta = item.get("property_meta", {})
+        if not isinstance(meta, dict): meta = {}
 
-            # Procesar coordenadas
-            lat, lng = None, None
-            coords_raw = get_first("fave_property_location")
-            if coords_raw and "," in str(coords_raw):
-                parts = str(coords_raw).split(",")
-                if len(parts) >= 2:
-                    lat, lng = parts[0].strip(), parts[1].strip()
+        # Función helper para obtener valores de Houzez (vienen en listas)
+        def get_first(key):
+            val = meta.get(key)
+            return val[0] if isinstance(val, list) and val else val
 
-            # Capturar amenidades desde _embedded (WP Taxonomies)
-            amenities = []
-            if "_embedded" in item and "wp:term" in item["_embedded"]:
-                for term_list in item["_embedded"]["wp:term"]:
-                    for term in term_list:
-                        # En Houzez la taxonomía suele llamarse 'property_feature'
-                        if term.get("taxonomy") == "property_feature":
-                            amenities.append(term.get("name"))
+        # Procesar coordenadas
+        lat, lng = None, None
+        coords_raw = get_first("fave_property_location")
+        if coords_raw and "," in str(coords_raw):
+            parts = str(coords_raw).split(",")
+            if len(parts) >= 2:
+                lat, lng = parts[0].strip(), parts[1].strip()
 
-            # Construir diccionario de features detallado
-            features = {
-                "garage": get_first("fave_property_garage"),
-                "parking_external": get_first("fave_property_garage_size"),
-                "lot_size_sqm": get_first("fave_property_land"),
-                "property_id_internal": get_first("fave_property_id"),
-                "address": get_first("fave_property_map_address"),
-                "amenities": amenities,
-                # Campos base redundantes para el normalizador
-                "bedrooms": get_first("fave_property_bedrooms"),
-                "bathrooms": get_first("fave_property_bathrooms"),
-            }
+        # Capturar amenidades desde _embedded (WP Taxonomies)
+        amenities = []
+        if "_embedded" in item and "wp:term" in item["_embedded"]:
+            for term_list in item["_embedded"]["wp:term"]:
+                for term in term_list:
+                    # En Houzez la taxonomía suele llamarse 'property_feature'
+                    if term.get("taxonomy") == "property_feature":
+                        amenities.append(term.get("name"))
 
-            # Extraer imágenes de Yoast
-            images = []
-            yoast = item.get("yoast_head_json", {})
-            if yoast and "og_image" in yoast:
-                for img in yoast["og_image"]:
-                    if isinstance(img, dict) and img.get("url"):
-                        images.append(img["url"])
+        # Construir diccionario de features detallado
+        features = {
+            "garage": get_first("fave_property_garage"),
+            "parking_external": get_first("fave_property_garage_size"),
+            "lot_size_sqm": get_first("fave_property_land"),
+            "property_id_internal": get_first("fave_property_id"),
+            "address": get_first("fave_property_map_address"),
+            "amenities": amenities,
+            # Campos base redundantes para el normalizador
+            "bedrooms": get_first("fave_property_bedrooms"),
+            "bathrooms": get_first("fave_property_bathrooms"),
+        }
 
-            raw_result = {
-                "external_id": str(item.get("id")),
-                "title": item.get("title", {}).get("rendered") if isinstance(item.get("title"), dict) else "Sin título",
-                "url": item.get("link"),
-                "price": get_first("fave_property_price"),
-                "area_sqm": get_first("fave_property_size"),
-                "bedrooms": get_first("fave_property_bedrooms"),
-                "bathrooms": get_first("fave_property_bathrooms"),
-                "lat": lat,
-                "lng": lng,
-                "address": get_first("fave_property_map_address"),
-                "features": features,
-                "images": images,
-                "raw": item
-            }
-            return self.normalize_data(raw_result)
+        # Extraer imágenes de Yoast
+        images = []
+        yoast = item.get("yoast_head_json", {})
+        if yoast and "og_image" in yoast:
+            for img in yoast["og_image"]:
+                if isinstance(img, dict) and img.get("url"):
+                    images.append(img["url"])
 
-        except Exception as e:
-            print(f"❌ Error en detalle de {slug} (Houzez): {e}")
-            return {}
+        raw_result = {
+            "external_id": str(item.get("id")),
+            "title": item.get("title", {}).get("rendered") if isinstance(item.get("title"), dict) else "Sin título",
+            "url": item.get("link"),
+            "price": get_first("fave_property_price"),
+            "area_sqm": get_first("fave_property_size"),
+            "bedrooms": get_first("fave_property_bedrooms"),
+            "bathrooms": get_first("fave_property_bathrooms"),
+            "lat": lat,
+            "lng": lng,
+            "address": get_first("fave_property_map_address"),
+            "features": features,
+            "images": images,
+            "raw": item
+        }
+        return self.normalize_data(raw_result)
@@ -1,7 +1,8 @@
 import random
 import requests
 import time
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Optional
 from .base_provider import BaseRealEstateProvider
 
 class RealHomesProvider(BaseRealEstateProvider):
@@ -10,18 +11,24 @@ class RealHomesProvider(BaseRealEstateProvider):
     Usa la WP REST API para obtener listados y metadatos (property_meta).
     """
 
-    def __init__(self, site_name: str, base_url: str, api_endpoint: str = "/wp-json/wp/v2/propiedad"):
-        super().__init__(site_name, base_url)
+    # Campos de parse_property_item (+ raw_data_snapshot: status/content para el loader)
+    detail_fields = "id,link,slug,title,status,content,modified_gmt,property_meta,yoast_head_json,_links,_embedded"
+    detail_embed = "wp:term"
+
+    def __init__(self, site_name: str, base_url: str, api_endpoint: str = "/wp-json/wp/v2/propiedad", session: requests.Session = None):
+        super().__init__(site_name, base_url, session=session)
         self.api_url = f"{self.base_url}{api_endpoint}"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
         self.supports_date_filter = True
 
-    def get_links(self) -> List[Dict[str, Any]]:
+    def get_links(self, modified_after: Optional[datetime] = None) -> List[Dict[str, Any]]:
         links = []
         page = 1
-        print(f"📡 Buscando propiedades en {self.site_name}...")
+        self.discovery_complete = True
+        mode = f"delta desde {modified_after:%Y-%m-%d %H:%M} UTC" if modified_after else "barrido completo"
+        print(f"📡 Buscando propiedades en {self.site_name} ({mode})...")
         
         while True:
             try:
@@ -29,10 +36,20 @@ class RealHomesProvider(BaseRealEstateProvider):
                 fields = "id,link,slug"
                 if self.supports_date_filter:
                     fields += ",modified_gmt"
+                else:
+                    modified_after = None # Sin modified_gmt no hay forma de cortar el delta
 
                 params = {"per_page": 20, "page": page, "_fields": fields}
-                response = requests.get(self.api_url, headers=self.headers, params=params, timeout=10)
+                if modified_after:
+                    params.update(self.delta_params(modified_after))
+                response = self.session.get(self.api_url, headers=self.headers, params=params, timeout=10)
                 
+                # Delta no soportado (orderby=modified / modified_after): barrido completo
+                if response.status_code == 400 and modified_after and page == 1:
+                    print(f"⚠️ {self.site_name} no soporta descubrimiento delta. Reintentando con barrido completo...")
+                    modified_after = None
+                    continue
+
                 # Fallbck: Si falla con modified_gmt (400 o 404), intentamos sin él
                 if response.status_code in [400, 404] and self.supports_date_filter:
                     print(f"⚠️ {self.site_name} no soporta filtro de fecha ({response.status_code}). Desactivando optimización incremental...")
@@ -45,7 +62,12 @@ class RealHomesProvider(BaseRealEstateProvider):
                 batch = response.json()
                 if not batch: break
                 
+                reached_old = False
                 for item in batch:
+                    # Orden por modificación: el primer item sin cambios marca el fin del delta
+                    if modified_after and self.is_older_than(item, modified_after):
+                        reached_old = True
+                        break
                     links.append({
                         "wp_id": item["id"], 
                         "url": item["link"], 
@@ -56,11 +78,15 @@ class RealHomesProvider(BaseRealEstateProvider):
                 total_pages = int(response.headers.get("X-WP-TotalPages", 1))
                 print(f"   - Pagina {page}/{total_pages} leída...")
                 
+                if reached_old:
+                    print(f"   - Delta completo: el resto no cambió desde la última corrida.")
+                    break
                 if page >= total_pages: break
                 page += 1
                 time.sleep(1) # Pausa de seguridad
             except Exception as e:
                 print(f"❌ Error obteniendo links en página {page}: {e}")
+                self.discovery_complete = False
                 break
         
         print(f"✅ Se encontraron {len(links)} propiedades.")
@@ -75,66 +101,67 @@ class RealHomesProvider(BaseRealEstateProvider):
 
         try:
             params = {"slug": slug, "_embed": "true"}
-            response = requests.get(self.api_url, headers=self.headers, params=params, timeout=15)
+            response = self.session.get(self.api_url, headers=self.headers, params=params, timeout=15)
             response.raise_for_status()
             
             data_list = response.json()
             if not isinstance(data_list, list) or not data_list: return {}
-            
-            item = data_list[0]
-            meta = item.get("property_meta", {})
-            if not isinstance(meta, dict): meta = {}
-            loc = meta.get("REAL_HOMES_property_location", {})
-            if not isinstance(loc, dict): loc = {}
-
-            # Extraer imagen principal de Yoast
-            images = []
-            yoast = item.get("yoast_head_json", {})
-            if yoast and "og_image" in yoast:
-                for img in yoast["og_image"]:
-                    if isinstance(img, dict) and img.get("url"):
-                        images.append(img["url"])
-
-            # Extraer amenities de _embedded
-            amenities = []
-            if "_embedded" in item and "wp:term" in item["_embedded"]:
-                for term_list in item["_embedded"]["wp:term"]:
-                    for term in term_list:
-                        if term.get("taxonomy") == "property-feature":
-                            amenities.append(term.get("name"))
-
-            # Construir diccionario de features para JSONB
-            features = {
-                "garage": meta.get("REAL_HOMES_property_garage"),
-                "lot_size_sqm": meta.get("REAL_HOMES_property_lot_size"),
-                "year_built": meta.get("REAL_HOMES_property_year_built"),
-                "address": meta.get("REAL_HOMES_property_address"),
-                "is_featured": meta.get("REAL_HOMES_featured") == "1",
-                "property_id_internal": meta.get("REAL_HOMES_property_id"),
-                "size_unit": meta.get("REAL_HOMES_property_size_postfix"),
-                "amenities": amenities,
-            }
-            # Limpiar valores vacíos
-            features = {k: v for k, v in features.items() if v not in [None, "", [], {}]}
-            
-            # Mapeo crudo pero estructurado para el normalizador
-            raw_result = {
-                "external_id": str(item.get("id")),
-                "title": item.get("title", {}).get("rendered") if isinstance(item.get("title"), dict) else "Sin título",
-                "url": item.get("link"),
-                "price": meta.get("REAL_HOMES_property_price"),
-                "area_sqm": meta.get("REAL_HOMES_property_size"),
-                "bedrooms": meta.get("REAL_HOMES_property_bedrooms"),
-                "bathrooms": meta.get("REAL_HOMES_property_bathrooms"),
-                "lat": loc.get("latitude"),
-                "lng": loc.get("longitude"),
-                "features": features,
-                "images": images,
-                "raw": item
-            }
-            return self.normalize_data(raw_result)
+            return self.parse_property_item(data_list[0])
 
         except Exception as e:
             print(f"❌ Error en detalle de {slug}: {e}")
             return {}
 
+    def parse_property_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Ficha normalizada desde un post de la API (detalle por slug o por lote include=)."""
+        meta = item.get("property_meta", {})
+        if not isinstance(meta, dict): meta = {}
+        loc = meta.get("REAL_HOMES_property_location", {})
+        if not isinstance(loc, dict): loc = {}
+
+        # Extraer imagen principal de Yoast
+        images = []
+        yoast = item.get("yoast_head_json", {})
+        if yoast and "og_image" in yoast:
+            for img in yoast["og_image"]:
+                if isinstance(img, dict) and img.get("url"):
+                    images.append(img["url"])
+
+        # Extraer amenities de _embedded
+        amenities = []
+        if "_embedded" in item and "wp:term" in item["_embedded"]:
+            for term_list in item["_embedded"]["wp:term"]:
+                for term in term_list:
+                    if term.get("taxonomy") == "property-feature":
+                        amenities.append(term.get("name"))
+
+        # Construir diccionario de features para JSONB
+        features = {
+            "garage": meta.get("REAL_HOMES_property_garage"),
+            "lot_size_sqm": meta.get("REAL_HOMES_property_lot_size"),
+            "year_built": meta.get("REAL_HOMES_property_year_built"),
+            "address": meta.get("REAL_HOMES_property_address"),
+            "is_featured": meta.get("REAL_HOMES_featured") == "1",
+            "property_id_internal": meta.get("REAL_HOMES_property_id"),
+            "size_unit": meta.get("REAL_HOMES_property_size_postfix"),
+            "amenities": amenities,
+        }
+        # Limpiar valores vacíos
+        features = {k: v for k, v in features.items() if v not in [None, "", [], {}]}
+        
+        # Mapeo crudo pero estructurado para el normalizador
+        raw_result = {
+            "external_id": str(item.get("id")),
+            "title": item.get("title", {}).get("rendered") if isinstance(item.get("title"), dict) else "Sin título",
+            "url": item.get("link"),
+            "price": meta.get("REAL_HOMES_property_price"),
+            "area_sqm": meta.get("REAL_HOMES_property_size"),
+            "bedrooms": meta.get("REAL_HOMES_property_bedrooms"),
+            "bathrooms": meta.get("REAL_HOMES_property_bathrooms"),
+            "lat": loc.get("latitude"),
+            "lng": loc.get("longitude"),
+            "features": features,
+            "images": images,
+            "raw": item
+        }
+        return self.normalize_data(raw_result)
@@ -1,7 +1,8 @@
 import random
 import requests
 import time
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Optional
 from .base_provider import BaseRealEstateProvider
 
 class WPResidenceProvider(BaseRealEstateProvider):
@@ -10,30 +11,47 @@ class WPResidenceProvider(BaseRealEstateProvider):
     Usa el endpoint /wp-json/wp/v2/estate_property y busca en 'all_meta'.
     """
 
-    def __init__(self, site_name: str, base_url: str, api_endpoint: str = "/wp-json/wp/v2/estate_property"):
-        super().__init__(site_name, base_url)
+    # Campos de parse_property_item (+ raw_data_snapshot: status/content para el loader). Sin _embed.
+    detail_fields = "id,link,slug,title,status,content,modified_gmt,all_meta,yoast_head_json"
+
+    def __init__(self, site_name: str, base_url: str, api_endpoint: str = "/wp-json/wp/v2/estate_property", session: requests.Session = None):
+        super().__init__(site_name, base_url, session=session)
         self.api_url = f"{self.base_url}{api_endpoint}"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
 
-    def get_links(self) -> List[Dict[str, Any]]:
+    def get_links(self, modified_after: Optional[datetime] = None) -> List[Dict[str, Any]]:
         links = []
         page = 1
-        print(f"📡 Buscando propiedades en {self.site_name} (WP Residence)...")
+        self.discovery_complete = True
+        mode = f"delta desde {modified_after:%Y-%m-%d %H:%M} UTC" if modified_after else "barrido completo"
+        print(f"📡 Buscando propiedades en {self.site_name} (WP Residence, {mode})...")
         
         while True:
             try:
                 params = {"per_page": 20, "page": page, "_fields": "id,link,slug,modified_gmt"}
-                response = requests.get(self.api_url, headers=self.headers, params=params, timeout=10)
+                if modified_after:
+                    params.update(self.delta_params(modified_after))
+                response = self.session.get(self.api_url, headers=self.headers, params=params, timeout=10)
                 
+                # Delta no soportado (orderby=modified / modified_after): barrido completo
+                if response.status_code == 400 and modified_after and page == 1:
+                    print(f"⚠️ {self.site_name} no soporta descubrimiento delta. Reintentando con barrido completo...")
+                    modified_after = None
+                    continue
                 if response.status_code == 400: break # Fin de páginas
                 response.raise_for_status()
                 
                 batch = response.json()
                 if not batch: break
                 
+                reached_old = False
                 for item in batch:
+                    # Orden por modificación: el primer item sin cambios marca el fin del delta
+                    if modified_after and self.is_older_than(item, modified_after):
+                        reached_old = True
+                        break
                     links.append({
                         "wp_id": item["id"], 
                         "url": item["link"], 
@@ -44,6 +62,9 @@ class WPResidenceProvider(BaseRealEstateProvider):
                 total_pages = int(response.headers.get("X-WP-TotalPages", 1))
                 print(f"   - Pagina {page}/{total_pages} leída...")
                 
+                if reached_old:
+                    print(f"   - Delta completo: el resto no cambió desde la última corrida.")
+                    break
                 if page >= total_pages: break
                 page += 1
                 # Modo Caballero: Delay entre páginas de listado
@@ -52,6 +73,7 @@ class WPResidenceProvider(BaseRealEstateProvider):
                 time.sleep(wait_time)
             except Exception as e:
                 print(f"❌ Error obteniendo links en página {page}: {e}")
+                self.discovery_complete = False
                 break
         
         print(f"✅ Se encontraron {len(links)} propiedades.")
@@ -63,48 +85,49 @@ class WPResidenceProvider(BaseRealEstateProvider):
 
         try:
             params = {"slug": slug}
-            response = requests.get(self.api_url, headers=self.headers, params=params, timeout=15)
+            response = self.session.get(self.api_url, headers=self.headers, params=params, timeout=15)
             response.raise_for_status()
             
             data_list = response.json()
             if not isinstance(data_list, list) or not data_list: return {}
-            
-            item = data_list[0]
-            # WP Residence suele poner los metadatos en 'all_meta' o directamente en la raíz mediante plugins
-            meta = item.get("all_meta", {})
-            
-            # Imágenes de Yoast
-            images = []
-            yoast = item.get("yoast_head_json", {})
-            if yoast and "og_image" in yoast:
-                for img in yoast["og_image"]:
-                    if isinstance(img, dict) and img.get("url"):
-                        images.append(img["url"])
-
-            # Tratamiento de coordenadas
-            lat = meta.get("property_latitude")
-            lng = meta.get("property_longitude")
-            if lat == "0" or lat == 0: lat = None
-            if lng == "0" or lng == 0: lng = None
-
-            raw_result = {
-                "external_id": str(item.get("id")),
-                "title": item.get("title", {}).get("rendered") if isinstance(item.get("title"), dict) else "Sin título",
-                "url": item.get("link"),
-                "price": meta.get("property_price"),
-                "currency": meta.get("currency_selection"),
-                "area_sqm": meta.get("property_size"),
-                "bedrooms": meta.get("property_bedrooms"),
-                "bathrooms": meta.get("property_bathrooms"),
-                "lat": lat,
-                "lng": lng,
-                "address": meta.get("property_address"),
-                "images": images,
-                "raw": item
-            }
-            return self.normalize_data(raw_result)
+            return self.parse_property_item(data_list[0])
 
         except Exception as e:
             print(f"❌ Error en detalle de {slug} (Terraquea): {e}")
             return {}
 
+    def parse_property_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Ficha normalizada desde un post de la API (detalle por slug o por lote include=)."""
+        # WP Residence suele poner los metadatos en 'all_meta' o directamente en la raíz mediante plugins
+        meta = item.get("all_meta", {})
+        
+        # Imágenes de Yoast
+        images = []
+        yoast = item.get("yoast_head_json", {})
+        if yoast and "og_image" in yoast:
+            for img in yoast["og_image"]:
+                if isinstance(img, dict) and img.get("url"):
+                    images.append(img["url"])
+
+        # Tratamiento de coordenadas
+        lat = meta.get("property_latitude")
+        lng = meta.get("property_longitude")
+        if lat == "0" or lat == 0: lat = None
+        if lng == "0" or lng == 0: lng = None
+
+        raw_result = {
+            "external_id": str(item.get("id")),
+            "title": item.get("title", {}).get("rendered") if isinstance(item.get("title"), dict) else "Sin título",
+            "url": item.get("link"),
+            "price": meta.get("property_price"),
+            "currency": meta.get("currency_selection"),
+            "area_sqm": meta.get("property_size"),
+            "bedrooms": meta.get("property_bedrooms"),
+            "bathrooms": meta.get("property_bathrooms"),
+            "lat": lat,
+            "lng": lng,
+            "address": meta.get("property_address"),
+            "images": images,
+            "raw": item
+        }
+        return self.normalize_data(raw_result)
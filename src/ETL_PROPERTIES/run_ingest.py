@@ -1,8 +1,15 @@
 import os
+import sys
 import json
 import psycopg2
+from datetime import datetime, timedelta, timezone
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
+
+# Raíz del repo en el path: los providers usan src.shared (sesiones HTTP) al correr desde ETL_PROPERTIES/
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.shared.http_session import format_session_stats
 from providers.realhomes_provider import RealHomesProvider
 from providers.houzez_provider import HouzezProvider
 from providers.wp_residence_provider import WPResidenceProvider
@@ -14,6 +21,9 @@ PROVIDER_MAP = {
     "wp_residence": WPResidenceProvider
 }
 
+# Cada cuántos días el descubrimiento delta se reemplaza por un barrido completo (detecta bajas)
+FULL_SWEEP_DAYS = float(os.getenv("PROPERTIES_FULL_SWEEP_DAYS", "7"))
+
 def get_db_connection():
     load_dotenv()
     return psycopg2.connect(
@@ -32,6 +42,9 @@ def main():
     parser.add_argument("site_name", nargs="?", help="Nombre del sitio (debe coincidir con la DB)")
     parser.add_argument("--force", action="store_true", help="Forzar re-extracción total ignorando fechas")
     parser.add_argument("--limit", type=int, default=None, help="Limitar cantidad de propiedades (para pruebas)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Detalles extraídos en paralelo por sitio (default PROPERTIES_DETAIL_CONCURRENCY)")
+    parser.add_argument("--rps", type=float, default=None, help="Máximo de requests/seg por sitio (default PROPERTIES_DETAIL_RPS)")
+    parser.add_argument("--full", action="store_true", help="Barrido completo de enlaces (sin descubrimiento delta)")
     args = parser.parse_args()
 
     target_site = args.site_name
@@ -43,17 +56,34 @@ def main():
     if limit:
         print(f"🛑 Límite de prueba activado: {limit} propiedades.")
     
-    run_ingest(target_site, force_reextract, limit)
+    run_ingest(target_site, force_reextract, limit, concurrency=args.concurrency, requests_per_second=args.rps,
+               full_sweep=args.full)
+
+def needs_full_sweep(target, run_started, force_reextract, full_sweep, has_snapshot):
+    """Motivo del barrido completo, o None si alcanza con el descubrimiento delta."""
+    if force_reextract or full_sweep:
+        return "solicitado"
+    if not target['last_run_at']:
+        return "primera corrida"
+    if not has_snapshot:
+        return "sin JSON previo" # El delta solo trae cambios: sin snapshot el loader daría de baja el resto
+    if not target['last_full_sweep_at']:
+        return "sin barrido completo registrado"
+    if run_started - target['last_full_sweep_at'] >= timedelta(days=FULL_SWEEP_DAYS):
+        return f"último barrido completo hace más de {FULL_SWEEP_DAYS:g} días"
+    return None
 
-def run_ingest(target_site, force_reextract=False, limit=None):
+def run_ingest(target_site, force_reextract=False, limit=None, concurrency=None, requests_per_second=None, full_sweep=False):
     """
-    Orquesta la ingesta para un sitio específico
+    Orquesta la ingesta para un sitio específico.
+    Por defecto descubre solo lo modificado desde last_run_at (delta); cada PROPERTIES_FULL_SWEEP_DAYS
+    (o con --full / --force) hace un barrido completo que además detecta las bajas.
     """
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     query = """
-        SELECT client_id, name, provider_type, base_url, api_endpoint 
+        SELECT client_id, name, provider_type, base_url, api_endpoint, last_run_at, last_full_sweep_at
         FROM public.stage_sources_config 
         WHERE is_active = true
     """
@@ -76,6 +106,10 @@ def run_ingest(target_site, force_reextract=False, limit=None):
 
         for target in targets:
             print(f"\n🌟 INICIANDO INGESTA PARA: {target['name']}")
+
+            # Hora de la BD al inicio: lo que cambie durante la corrida entra en el próximo delta
+            cur.execute("SELECT now() AS run_started")
+            run_started = cur.fetchone()['run_started']
             
             # --- NUEVO: Obtener IDs y Fechas de actualización existentes ---
             cur.execute(
@@ -99,10 +133,18 @@ def run_ingest(target_site, force_reextract=False, limit=None):
                 api_endpoint=target['api_endpoint']
             )
             
-            # 2.1 Intentar cargar datos previos para reanudación (si no es modo force)
+            # 2.1 Cargar datos previos para reanudación: JSON + journal de una corrida interrumpida
+            #     (en modo force solo el journal: lo ya re-extraído en esta pasada no se repite)
             output_path = f"/app/src/ETL_PROPERTIES/output/{target['name'].replace(' ', '_')}.json"
-            if not force_reextract:
-                provider.load_existing_data(output_path)
+            provider.load_existing_data(output_path, include_snapshot=not force_reextract)
+
+            # 2.2 Delta (solo lo modificado desde la última corrida) o barrido completo
+            full_reason = needs_full_sweep(target, run_started, force_reextract, full_sweep, bool(provider.properties))
+            modified_after = None
+            if full_reason:
+                print(f"🧹 Barrido completo de enlaces ({full_reason}).")
+            else:
+                modified_after = target['last_run_at'].astimezone(timezone.utc).replace(tzinfo=None)
             
             # 3. Ejecutar extracción inteligente
             # En modo force, pasamos known_data vacío para forzar re-extracción
@@ -110,19 +152,55 @@ def run_ingest(target_site, force_reextract=False, limit=None):
                 limit=limit, 
                 output_path=output_path, 
                 client_id=target['client_id'],
-                known_data={} if force_reextract else known_data
+                known_data={} if force_reextract else known_data,
+                concurrency=concurrency,
+                requests_per_second=requests_per_second,
+                modified_after=modified_after
             )
+            print(f"🔌 Conexiones HTTP: {format_session_stats(target['base_url'])}")
             
-            # 4. Guardar JSON normalizado (final)
+            # 4. Guardar JSON normalizado (final): compacta el journal en el JSON
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             provider.save_to_json(output_path, client_id=target['client_id'])
             
-            # 5. Actualizar última ejecución en la DB
-            cur.execute(
-                "UPDATE public.stage_sources_config SET last_run_at = now() WHERE name = %s",
-                (target['name'],)
-            )
-            conn.commit()
+            # 5. Actualizar última ejecución en la DB. Una corrida con --limit o con el descubrimiento
+            #    cortado no cubrió el sitio: no avanza la marca (el próximo delta vuelve a pedir esos cambios)
+            if not limit and provider.discovery_complete:
+                full_done = bool(full_reason)
+                # Detalles fallidos: la marca queda en el modified_gmt más antiguo de ellos (o no avanza
+                # si alguno no trae fecha) para que el próximo delta pagine hasta esos enlaces
+                next_run_at = run_started
+                retry_from = provider.oldest_failed_modified()
+                if retry_from == datetime.min:
+                    next_run_at = target['last_run_at']
+                elif retry_from is not None:
+                    next_run_at = min(run_started, retry_from.replace(tzinfo=timezone.utc))
+                if next_run_at is None:
+                    # Primera corrida con detalles sin fecha: sin marca previa no hay a dónde retroceder.
+                    # last_run_at sigue vacío y la próxima corrida vuelve a ser un barrido completo
+                    print(f"⚠️ {len(provider.failed_extractions)} detalles fallaron (alguno sin modified_gmt) en la primera corrida: "
+                          f"last_run_at no se actualiza.")
+                    cur.execute(
+                        """
+                        UPDATE public.stage_sources_config
+                        SET last_full_sweep_at = CASE WHEN %s THEN %s ELSE last_full_sweep_at END
+                        WHERE name = %s
+                        """,
+                        (full_done, run_started, target['name'])
+                    )
+                else:
+                    if next_run_at != run_started:
+                        print(f"⚠️ {len(provider.failed_extractions)} detalles fallaron: last_run_at queda en {next_run_at}.")
+                    cur.execute(
+                        """
+                        UPDATE public.stage_sources_config
+                        SET last_run_at = %s,
+                            last_full_sweep_at = CASE WHEN %s THEN %s ELSE last_full_sweep_at END
+                        WHERE name = %s
+                        """,
+                        (next_run_at, full_done, run_started, target['name'])
+                    )
+                conn.commit()
 
     except Exception as e:
         print(f"❌ Error general en la ingesta: {e}")
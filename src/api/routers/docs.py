@@ -1,20 +1,31 @@
 
 import os
+import json
 import shutil
+import asyncio
 import logging
 from uuid import UUID, uuid4
-from typing import Optional
+from typing import Optional, List
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status
+from fastapi.responses import StreamingResponse
 import psycopg2 
 # Eliminamos BackgroundTasks, importamos Redis y RQ
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from rq import Queue
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
 
 from src.shared.file_manager import FileManager
-from src.shared.vector_store import VectorStore
+from src.shared.vector_store import VectorStore, LinkedDocumentsError
 # Importamos la tarea, no el procesador directo
-from src.ETL_DOCS.worker_task import process_document_task
+from src.ETL_DOCS.worker_task import process_document_task, link_document_task, crawl_site_task
+from src.ETL_DOCS.progress import progress_channel, FINAL_STAGES
+from src.ETL_DOCS.routing import FAST_QUEUE, HEAVY_QUEUE, QUEUE_TIMEOUTS, estimate_document_cost, select_queue
+from src.ETL_DOCS.ocr_profiles import OCR_PROFILES
+from src.ETL_DOCS.text_ingest import ingest_text_items
+from src.shared.schemas import BulkTextIngestRequest, WebCrawlRequest
 
 logger = logging.getLogger(__name__)
 
@@ -26,11 +37,49 @@ router = APIRouter(
 # --- CONFIGURACIÓN REDIS ---
 # Conectamos a localhost porque estamos en el mismo contenedor
 redis_conn = Redis(host='localhost', port=6379, db=0)
-q = Queue('etl_queue', connection=redis_conn)
+# Colas de documentos por costo estimado (ver ETL_DOCS/routing.py)
+doc_queues = {name: Queue(name, connection=redis_conn) for name in (FAST_QUEUE, HEAVY_QUEUE)}
 
 # VectorStore para deletes directos (síncronos)
 vector_store = VectorStore() 
 
+# --- UPLOAD POR LOTES ---
+BATCH_MAX_FILES = int(os.getenv("DOCS_BATCH_MAX_FILES", "500"))
+GROUP_TTL = 86400 # Igual que result_ttl de los jobs
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+# --- INGESTA DE TEXTO ---
+TEXT_MAX_ITEMS = int(os.getenv("DOCS_TEXT_MAX_ITEMS", "5000"))
+
+def _group_key(group_id: str) -> str:
+    return f"etl:docs_group:{group_id}"
+
+def _validate_ocr_profile(ocr_profile: Optional[str]):
+    if ocr_profile and ocr_profile not in OCR_PROFILES:
+        raise HTTPException(status_code=400, detail=f"ocr_profile debe ser uno de: {', '.join(OCR_PROFILES)}.")
+
+def _fetch_job(job_id: str) -> Optional[Job]:
+    """Busca un job en cualquier cola de documentos (Queue.fetch_job filtra por cola de origen)."""
+    try:
+        return Job.fetch(job_id, connection=redis_conn)
+    except NoSuchJobError:
+        return None
+
+def _job_status(job: Job, refresh: bool = False) -> str:
+    """Estado del job como string (rq>=1.x retorna el enum JobStatus)."""
+    job_status = job.get_status(refresh=refresh)
+    return getattr(job_status, "value", job_status)
+
+def _tracking_job(job: Job) -> Job:
+    """
+    Job cuyo estado representa al documento. Tras un fan-out el job original termina al
+    repartir los rangos: el documento sigue hasta que termina el job de agregación.
+    """
+    aggregate_id = (job.meta.get("progress") or {}).get("aggregate_job_id")
+    if not aggregate_id:
+        return job
+    return _fetch_job(aggregate_id) or job # Agregación expirada: vale el estado del original
+
 @router.post("/upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_document(
     file: UploadFile = File(...),
@@ -38,14 +87,22 @@ async def upload_document(
     content_id: Optional[str] = Form(None),
     visibility: str = Form("private"),
     access_level: Optional[str] = Form(None), # Alias para visibility
-    category: str = Form("knowledge_base")
+    category: str = Form("knowledge_base"),
+    on_duplicate: str = Form("link"), # 'link' (reutilizar vectores) o 'reprocess'
+    ocr_profile: Optional[str] = Form(None) # fast/default/accurate (None = según categoría)
 ):
     """
     Subida de documentos PDF v2 (Redis Queue).
     
     1. Guarda en disco.
-    2. Encola tarea en Redis ('etl_queue').
-    3. Retorna Job ID para tracking.
+    2. Encola tarea en Redis según su costo estimado: cola rápida (DOCS_FAST_QUEUE) o,
+       para OCR y PDFs enormes, cola pesada (DOCS_HEAVY_QUEUE) con timeout mayor.
+    3. Retorna Job ID y cola para tracking.
+
+    Si el cliente ya tiene un documento con los mismos bytes (SHA-256) y
+    on_duplicate='link', no se guarda ni re-procesa: se enlaza a sus vectores
+    (409 si el original tiene otra visibilidad o categoría). Con 'reprocess' se
+    responde 409: el mismo texto no puede volver a escribirse en ai_vectors.
     """
     try:
         # Resolver Visibilidad (access_level > visibility)
@@ -54,6 +111,9 @@ async def upload_document(
         # 1. Validaciones
         if file.content_type != "application/pdf":
             raise HTTPException(status_code=400, detail="Solo se permiten archivos PDF.")
+        if on_duplicate not in ("link", "reprocess"):
+            raise HTTPException(status_code=400, detail="on_duplicate debe ser 'link' o 'reprocess'.")
+        _validate_ocr_profile(ocr_profile)
         
         final_content_id = content_id or f"doc_{uuid4()}"
         
@@ -68,6 +128,18 @@ async def upload_document(
             )
 
         file_bytes = await file.read()
+        file_hash = FileManager.calculate_file_hash(file_bytes)
+
+        # 2.5. Dedup por contenido (mismos bytes bajo otro nombre)
+        try:
+            duplicate = _resolve_duplicate(client_id, file_hash, final_visibility, category, on_duplicate)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+        if duplicate:
+            return _enqueue_linked_document(
+                client_id, filename, final_content_id, final_visibility, category, file_hash, duplicate
+            )
         
         # 2. Guardado Seguro en Disco
         try:
@@ -83,7 +155,8 @@ async def upload_document(
                 storage_path=saved_path, 
                 content_id=final_content_id, 
                 access_level=final_visibility,
-                category=category
+                category=category,
+                file_hash=file_hash
             )
         except psycopg2.errors.UniqueViolation:
             # Captura explícita de error de integridad (Duplicado en DB)
@@ -103,11 +176,14 @@ async def upload_document(
             raise HTTPException(status_code=500, detail=f"Error al registrar documento en la base de datos: {e}")
 
         # 4. Encolar en Redis (Escalabilidad Real)
-        # job_timeout=600 (10 minutos para PDFs grandes/OCR)
-        job = q.enqueue(
+        # Ruteo por costo: OCR/PDFs enormes van a la cola pesada con timeout mayor
+        estimate = estimate_document_cost(file_bytes)
+        queue_name = select_queue(estimate)
+        target_q = doc_queues[queue_name]
+        job = target_q.enqueue(
             process_document_task,
-            args=(saved_path, client_id, final_content_id, file.filename, final_visibility, category),
-            job_timeout=600,
+            args=(saved_path, client_id, final_content_id, file.filename, final_visibility, category, file_hash, ocr_profile, estimate["pages"]),
+            job_timeout=QUEUE_TIMEOUTS[queue_name],
             result_ttl=86400, # Guardar resultado 24h
             job_id=f"job_{final_content_id}" # ID determinista para tracking fácil
         )
@@ -118,7 +194,10 @@ async def upload_document(
             "job_id": job.get_id(),
             "content_id": final_content_id,
             "filename": file.filename,
-            "queue_position": len(q) # Info útil para el usuario
+            "queue": queue_name,
+            "estimate": estimate,
+            "queue_position": len(target_q), # Info útil para el usuario
+            "dedup": {"action": "processed", "file_hash": file_hash}
         }
 
     except HTTPException:
@@ -130,6 +209,345 @@ async def upload_document(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _resolve_duplicate(client_id: UUID, file_hash: str, visibility: str, category: str, on_duplicate: str) -> Optional[dict]:
+    """
+    Documento del cliente con los mismos bytes al que enlazar el nuevo, o None si no hay.
+    ai_vectors.hash es único por texto: re-procesar bytes idénticos dejaría el documento nuevo sin
+    vectores, y los vectores enlazados conservan la visibilidad/categoría del original. Por eso,
+    con un original existente solo se enlaza, y solo si ambas coinciden; si no, ValueError con el motivo.
+    """
+    try:
+        duplicate = vector_store.find_document_by_file_hash(client_id, file_hash)
+    except Exception as e:
+        # El dedup es una optimización: si falla, se procesa normalmente
+        logger.warning(f"No se pudo verificar duplicados por hash: {e}")
+        return None
+    if not duplicate:
+        return None
+    original = f"'{duplicate['filename']}' ({duplicate['content_id']})"
+    if on_duplicate == "reprocess":
+        raise ValueError(
+            f"Contenido idéntico a {original}: re-procesarlo no generaría vectores nuevos (mismo texto). "
+            f"Use on_duplicate='link' o borre el original."
+        )
+    if (duplicate["access_level"], duplicate["category"]) != (visibility, category):
+        raise ValueError(
+            f"Contenido idéntico a {original} con access_level='{duplicate['access_level']}' y "
+            f"category='{duplicate['category']}': no se puede enlazar con otra visibilidad o categoría. "
+            f"Cambie la del original o bórrelo y vuelva a subir."
+        )
+    return duplicate
+
+
+def _enqueue_linked_document(client_id: UUID, filename: str, content_id: str, visibility: str, category: str, file_hash: str, duplicate: dict) -> dict:
+    """
+    Registra un documento idéntico a uno existente sin guardar el archivo de nuevo
+    y encola la tarea liviana de enlace (sin OCR ni embeddings).
+    """
+    linked_content_id = duplicate["content_id"]
+    logger.info(f"Dedup: {filename} ({content_id}) es idéntico a {linked_content_id}. Enlazando vectores.")
+
+    try:
+        vector_store.register_document_in_db(
+            client_id=client_id,
+            filename=filename,
+            storage_path=duplicate["storage_path"],
+            content_id=content_id,
+            access_level=visibility,
+            category=category,
+            file_hash=file_hash,
+            linked_content_id=linked_content_id
+        )
+    except psycopg2.errors.UniqueViolation:
+        raise HTTPException(status_code=409, detail="El documento ya está registrado en la base de datos (Duplicado).")
+
+    # Tarea liviana: siempre a la cola rápida
+    target_q = doc_queues[FAST_QUEUE]
+    job = target_q.enqueue(
+        link_document_task,
+        args=(client_id, content_id, linked_content_id, file_hash),
+        job_timeout=60,
+        result_ttl=86400,
+        job_id=f"job_{content_id}"
+    )
+
+    return {
+        "status": "QUEUED",
+        "message": f"Documento idéntico a '{duplicate['filename']}'. Se reutilizarán sus vectores.",
+        "job_id": job.get_id(),
+        "content_id": content_id,
+        "filename": filename,
+        "queue": FAST_QUEUE,
+        "queue_position": len(target_q),
+        "dedup": {"action": "linked", "file_hash": file_hash, "linked_content_id": linked_content_id}
+    }
+
+
+@router.post("/upload/batch", status_code=status.HTTP_202_ACCEPTED)
+async def upload_documents_batch(
+    files: List[UploadFile] = File(...),
+    client_id: UUID = Form(...),
+    visibility: str = Form("private"),
+    access_level: Optional[str] = Form(None), # Alias para visibility
+    category: str = Form("knowledge_base"),
+    on_duplicate: str = Form("link"),
+    ocr_profile: Optional[str] = Form(None)
+):
+    """
+    Subida por lotes: varios PDFs y/o ZIPs con PDFs en un solo request.
+
+    1. Valida, deduplica (nombre y SHA-256) y guarda en disco.
+    2. Registra todos los documentos en UNA transacción.
+    3. Encola todos los jobs en un solo round trip (Redis pipeline).
+    4. Retorna un group_id para consultar el progreso agregado.
+
+    Los archivos inválidos o con nombre ya existente se reportan en 'rejected'
+    sin abortar el resto del lote.
+    """
+    final_visibility = access_level if access_level else visibility
+    if on_duplicate not in ("link", "reprocess"):
+        raise HTTPException(status_code=400, detail="on_duplicate debe ser 'link' o 'reprocess'.")
+    _validate_ocr_profile(ocr_profile)
+
+    # 1. Expandir archivos (PDF directo o PDFs dentro de ZIP)
+    incoming, rejected = [], []
+    for upload in files:
+        name = os.path.basename(upload.filename or "")
+        data = await upload.read()
+        if upload.content_type in ZIP_CONTENT_TYPES or name.lower().endswith(".zip"):
+            try:
+                incoming.extend(FileManager.extract_pdfs_from_zip(data, BATCH_MAX_FILES))
+            except ValueError as e:
+                rejected.append({"filename": name, "reason": str(e)})
+        elif upload.content_type == "application/pdf":
+            incoming.append((name, data))
+        else:
+            rejected.append({"filename": name, "reason": "Solo se permiten archivos PDF o ZIP."})
+
+    if len(incoming) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"El lote excede el máximo de {BATCH_MAX_FILES} archivos.")
+
+    # 2. Validación por archivo + dedup por contenido (contra DB y dentro del lote)
+    group_id = f"grp_{uuid4()}"
+    records, seen_names, batch_hashes, saved_paths = [], set(), {}, []
+    try:
+        for filename, file_bytes in incoming:
+            if filename in seen_names or FileManager.check_file_exists(client_id, filename):
+                rejected.append({"filename": filename, "reason": "El archivo ya existe. Renómbrelo o borre el anterior."})
+                continue
+            seen_names.add(filename)
+
+            content_id = f"doc_{uuid4()}"
+            file_hash = FileManager.calculate_file_hash(file_bytes)
+            record = {
+                "filename": filename,
+                "content_id": content_id,
+                "access_level": final_visibility,
+                "category": category,
+                "file_hash": file_hash,
+                "linked_content_id": None
+            }
+
+            # Dentro del lote todos comparten visibilidad y categoría: se enlaza al primero
+            duplicate = batch_hashes.get(file_hash) if on_duplicate == "link" else None
+            try:
+                if on_duplicate == "reprocess" and file_hash in batch_hashes:
+                    raise ValueError("Contenido idéntico a otro archivo del lote: re-procesarlo no generaría vectores nuevos.")
+                duplicate = duplicate or _resolve_duplicate(client_id, file_hash, final_visibility, category, on_duplicate)
+            except ValueError as e:
+                rejected.append({"filename": filename, "reason": str(e)})
+                continue
+
+            if duplicate:
+                record["linked_content_id"] = duplicate["content_id"]
+                record["storage_path"] = duplicate["storage_path"]
+                record["queue"] = FAST_QUEUE
+            else:
+                estimate = estimate_document_cost(file_bytes)
+                record["queue"] = select_queue(estimate)
+                record["pages"] = estimate["pages"] # El worker planifica el fan-out sin releer el PDF
+                record["storage_path"] = FileManager.save_upload(file_bytes, filename, client_id)
+                saved_paths.append(record["storage_path"])
+                batch_hashes[file_hash] = {"content_id": content_id, "storage_path": record["storage_path"]}
+
+            records.append(record)
+
+        if not records:
+            raise HTTPException(status_code=400, detail={"message": "Ningún archivo válido en el lote.", "rejected": rejected})
+
+        # 3. Registro Maestro en una sola transacción
+        vector_store.register_documents_batch(client_id, records)
+
+    except Exception as e:
+        # Rollback físico de todo lo guardado en este lote
+        for path in saved_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if isinstance(e, HTTPException):
+            raise
+        if isinstance(e, psycopg2.errors.UniqueViolation):
+            raise HTTPException(status_code=409, detail="Algún documento del lote ya está registrado en la base de datos (Duplicado).")
+        logger.error(f"Error registrando lote {group_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error registrando el lote: {e}")
+
+    # 4. Encolar todo en un solo round trip (pipeline), agrupado por cola
+    job_datas = {name: [] for name in doc_queues}
+    for r in records:
+        if r["linked_content_id"]:
+            func, args, timeout = link_document_task, (client_id, r["content_id"], r["linked_content_id"], r["file_hash"]), 60
+        else:
+            func, args, timeout = process_document_task, (r["storage_path"], client_id, r["content_id"], r["filename"], final_visibility, category, r["file_hash"], ocr_profile, r["pages"]), QUEUE_TIMEOUTS[r["queue"]]
+        job_datas[r["queue"]].append(Queue.prepare_data(
+            func,
+            args=args,
+            timeout=timeout,
+            result_ttl=86400,
+            job_id=f"job_{r['content_id']}",
+            meta={"group_id": group_id}
+        ))
+
+    job_ids = [f"job_{r['content_id']}" for r in records]
+    with redis_conn.pipeline() as pipe:
+        for queue_name, datas in job_datas.items():
+            if datas:
+                doc_queues[queue_name].enqueue_many(datas, pipeline=pipe)
+        pipe.rpush(_group_key(group_id), *job_ids)
+        pipe.expire(_group_key(group_id), GROUP_TTL)
+        pipe.execute()
+
+    logger.info(f"Lote {group_id}: {len(records)} documentos encolados, {len(rejected)} rechazados.")
+
+    return {
+        "status": "QUEUED",
+        "group_id": group_id,
+        "queued": len(records),
+        "rejected": rejected,
+        "documents": [
+            {
+                "job_id": f"job_{r['content_id']}",
+                "content_id": r["content_id"],
+                "filename": r["filename"],
+                "queue": r["queue"],
+                "dedup": {
+                    "action": "linked" if r["linked_content_id"] else "processed",
+                    "file_hash": r["file_hash"],
+                    "linked_content_id": r["linked_content_id"]
+                }
+            }
+            for r in records
+        ]
+    }
+
+
+@router.get("/groups/{group_id}")
+def get_group_status(group_id: str):
+    """Progreso agregado de un lote (una sola consulta en lugar de polling por job)"""
+    job_ids = [j.decode() for j in redis_conn.lrange(_group_key(group_id), 0, -1)]
+    if not job_ids:
+        raise HTTPException(status_code=404, detail="Grupo no encontrado o expirado")
+
+    try:
+        jobs = Job.fetch_many(job_ids, connection=redis_conn)
+        # PDFs con fan-out: el job original termina al repartir, el documento cuando termina la agregación
+        aggregate_ids = {
+            job.id: (job.meta.get("progress") or {}).get("aggregate_job_id")
+            for job in jobs if job
+        }
+        pending = [a for a in aggregate_ids.values() if a]
+        aggregates = dict(zip(pending, Job.fetch_many(pending, connection=redis_conn))) if pending else {}
+
+        counts, items = {}, []
+        for job_id, job in zip(job_ids, jobs):
+            item = {"job_id": job_id}
+            aggregate_id = aggregate_ids.get(job_id) if job else None
+            if aggregate_id:
+                item["aggregate_job_id"] = aggregate_id
+            tracked = aggregates.get(aggregate_id) or job # Agregación expirada: vale el original
+            job_status = _job_status(tracked) if tracked else "expired"
+            counts[job_status] = counts.get(job_status, 0) + 1
+            item["status"] = job_status
+            items.append(item)
+
+        done = counts.get("finished", 0) + counts.get("failed", 0) + counts.get("expired", 0)
+        return {
+            "group_id": group_id,
+            "total": len(job_ids),
+            "counts": counts,
+            "progress": round(done / len(job_ids), 4),
+            "completed": done == len(job_ids),
+            "jobs": items
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/text/bulk")
+def ingest_text_bulk(request: BulkTextIngestRequest):
+    """
+    Ingesta masiva de textos cortos (FAQ, snippets del CRM) como SourceType.TEXT_INPUT.
+    Síncrona: los items sin cambios (mismo hash) se saltan en una consulta y el resto
+    se embebe y escribe por lotes. Retorna el estado por item.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="items no puede estar vacío.")
+    if len(request.items) > TEXT_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"El request excede el máximo de {TEXT_MAX_ITEMS} items.")
+
+    # Conexión propia: el endpoint corre en el threadpool y usa transacciones por lote
+    text_store = None
+    try:
+        text_store = VectorStore()
+        results = ingest_text_items(text_store, request.client_id, request.items)
+    except Exception as e:
+        logger.error(f"Error en ingesta de texto: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if text_store and text_store.conn:
+            text_store.conn.close()
+
+    counts = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    return {
+        "status": "success",
+        "client_id": request.client_id,
+        "count": len(results),
+        "counts": counts,
+        "items": results
+    }
+
+
+@router.post("/crawl", status_code=status.HTTP_202_ACCEPTED)
+def crawl_website(request: WebCrawlRequest):
+    """
+    Encola el crawl WEB_SCRAPE de un sitio (FAQ, blog). Re-ejecutarlo re-crawlea con GET
+    condicional: solo las páginas cambiadas se vuelven a vectorizar.
+    """
+    for url in request.urls:
+        if not url.startswith(("http://", "https://")):
+            raise HTTPException(status_code=400, detail=f"URL inválida: {url}")
+
+    # Crawl largo y de red: cola pesada, no bloquea la cola rápida de PDFs
+    target_q = doc_queues[HEAVY_QUEUE]
+    job = target_q.enqueue(
+        crawl_site_task,
+        args=(request.client_id, request.urls, request.max_pages, request.max_depth,
+              request.access_level.value, request.category),
+        job_timeout=QUEUE_TIMEOUTS[HEAVY_QUEUE],
+        result_ttl=86400,
+        job_id=f"job_crawl_{uuid4()}"
+    )
+    return {
+        "status": "QUEUED",
+        "job_id": job.get_id(),
+        "client_id": request.client_id,
+        "urls": request.urls,
+        "queue": HEAVY_QUEUE
+    }
+
+
 @router.get("/list/{client_id}")
 def get_client_documents(client_id: UUID):
     """Listar documentos registrados para un cliente (Grid UI)"""
@@ -149,20 +567,89 @@ def get_client_documents(client_id: UUID):
 def get_job_status(job_id: str):
     """Consultar estado del procesamiento"""
     try:
-        job = q.fetch_job(job_id)
+        job = _fetch_job(job_id)
         if not job:
             raise HTTPException(status_code=404, detail="Job no encontrado")
         
         return {
             "job_id": job.get_id(),
             "status": job.get_status(), # queued, started, finished, failed
+            "progress": job.meta.get("progress"), # etapa, páginas extraídas, fragmentos embebidos
             "result": job.result,
             "enqueued_at": job.enqueued_at,
             "error": job.exc_info # Si falló, aquí sale el traceback
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+SSE_KEEPALIVE_SECONDS = 15
+JOB_END_STATUSES = ("finished", "failed", "stopped", "canceled")
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job_progress(job_id: str):
+    """
+    Stream en vivo (Server-Sent Events) del avance de un job.
+    Reemplaza el polling de /jobs/{job_id}: una conexión por visor.
+    Eventos: 'progress' (snapshot y actualizaciones) y 'end' (estado final).
+    PDFs con fan-out: después de 'fanout' siguen los avances por rango ('ranges_done') y
+    el 'end' llega cuando termina el job de agregación.
+    """
+    job = _fetch_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+
+    async def event_stream():
+        aredis = AsyncRedis(host='localhost', port=6379, db=0)
+        pubsub = aredis.pubsub()
+        try:
+            # Suscribir ANTES del snapshot para no perder eventos intermedios
+            await pubsub.subscribe(progress_channel(job_id))
+
+            job.refresh()
+            job_status = _job_status(_tracking_job(job))
+            yield _sse("progress", {"status": job_status, **(job.meta.get("progress") or {})})
+            if job_status in JOB_END_STATUSES:
+                yield _sse("end", {"status": job_status})
+                return
+
+            idle = 0.0
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message:
+                    idle = 0.0
+                    data = json.loads(message["data"])
+                    yield _sse("progress", data)
+                    if data.get("stage") in FINAL_STAGES:
+                        yield _sse("end", {"status": data["stage"]})
+                        return
+                    continue
+
+                idle += 1.0
+                if idle >= SSE_KEEPALIVE_SECONDS:
+                    idle = 0.0
+                    yield ": keepalive\n\n"
+                    # El job pudo terminar sin publicar (ej. enlace dedup o crash del worker)
+                    job.refresh()
+                    job_status = _job_status(_tracking_job(job), refresh=True)
+                    if job_status in JOB_END_STATUSES:
+                        yield _sse("end", {"status": job_status})
+                        return
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+            await aredis.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.delete("/{client_id}/{content_id}")
 def delete_document(client_id: UUID, content_id: str):
     """Borrado síncrono (Granular, incluyendo archivo físico)"""
@@ -176,6 +663,12 @@ def delete_document(client_id: UUID, content_id: str):
             return {"status": "DELETED", "content_id": content_id, "file_purged": True}
         
         return {"status": "DELETED_DB_ONLY", "content_id": content_id, "file_purged": False}
+    except LinkedDocumentsError as e:
+        # Primero se borran los enlazados (sus registros), después el original
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "El documento tiene documentos enlazados a sus vectores.", "linked_content_ids": e.linked}
+        )
     except Exception as e:
         logger.error(f"Error delete doc: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,184 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, Any, List
+
+from dotenv import load_dotenv
+
+# Configurar entorno antes de importar módulos que leen os.getenv
+load_dotenv("/app/src/.env")
+sys.path.append("/app/src")
+
+from src.shared.file_manager import (
+    FileManager, HOT_DOCUMENTS_ROOT, ARCHIVE_DOCUMENTS_ROOT, STAGING_ROOT, TEMP_WORK_ROOT
+)
+from src.shared.vector_store import VectorStore
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - TIERING - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- POLÍTICA ---
+HOT_MIN_AGE_HOURS = float(os.getenv("TIERING_HOT_MIN_AGE_HOURS", "24"))   # Recientes se quedan en NVMe
+HOT_HIGH_WATERMARK = float(os.getenv("TIERING_HOT_HIGH_WATERMARK", "0.80")) # Uso de NVMe que fuerza archivado
+HOT_LOW_WATERMARK = float(os.getenv("TIERING_HOT_LOW_WATERMARK", "0.60"))   # Objetivo al archivar forzado
+BATCH_SIZE = int(os.getenv("TIERING_BATCH_SIZE", "50"))                    # Escrituras HDD + 1 transacción por lote
+STAGING_TMP_MAX_AGE_HOURS = float(os.getenv("TIERING_STAGING_TMP_MAX_AGE_HOURS", "6"))
+INTERVAL_SECONDS = int(os.getenv("TIERING_INTERVAL_SECONDS", "900"))
+
+# Temporales de staging que ningún proceso reclama pasado un tiempo
+STAGING_TMP_DIRS = [
+    STAGING_ROOT / "ETL_IMAGES" / "tmp", # Descargas de imágenes no procesadas (process_and_store falló)
+    TEMP_WORK_ROOT,                      # Copias descomprimidas (FileManager.ensure_local), zips, etc.
+]
+
+
+class StorageTieringService:
+    """
+    Mueve originales entre tiers según docs/project_context:
+    - HOT (NVMe, /app/data/staging): uploads recientes y documentos en proceso.
+    - COLD (HDD, /app/data/storage/documents_arch): originales SYNCED comprimidos.
+
+    Por lote: comprime y escribe todos los archivos en HDD, actualiza los punteros
+    storage_path en UNA transacción y recién entonces borra los originales hot.
+    Si la transacción falla, se borran las copias archivadas y nada cambia.
+    """
+
+    def __init__(self, dry_run: bool = False):
+        self.dry_run = dry_run
+        self.vector_store = VectorStore()
+
+    def _hot_usage(self) -> float:
+        HOT_DOCUMENTS_ROOT.mkdir(parents=True, exist_ok=True)
+        usage = shutil.disk_usage(HOT_DOCUMENTS_ROOT)
+        return usage.used / usage.total
+
+    def archive_documents(self) -> Dict[str, Any]:
+        stats = {"archived": 0, "failed": 0, "bytes_hot_freed": 0, "bytes_cold_written": 0, "batches": 0}
+        forced = self._hot_usage() > HOT_HIGH_WATERMARK
+        if forced:
+            logger.warning(f"NVMe sobre {HOT_HIGH_WATERMARK:.0%}: archivando sin esperar antigüedad mínima.")
+
+        while True:
+            min_age = 0 if forced else HOT_MIN_AGE_HOURS
+            candidates = self.vector_store.list_archivable_documents(str(ARCHIVE_DOCUMENTS_ROOT), min_age, BATCH_SIZE)
+            if not candidates:
+                break
+
+            moved = self._archive_batch(candidates, stats)
+            stats["batches"] += 1
+            if self.dry_run or not moved:
+                break
+            if forced and self._hot_usage() < HOT_LOW_WATERMARK:
+                forced = False
+
+        return stats
+
+    def _archive_batch(self, candidates: List[Dict[str, Any]], stats: Dict[str, Any]) -> int:
+        # 1. Escribir todas las copias comprimidas del lote (HDD)
+        moves = []
+        for doc in candidates:
+            source = doc["storage_path"]
+            if not os.path.exists(source):
+                logger.error(f"Original inexistente para {doc['content_id']}: {source}")
+                stats["failed"] += 1
+                continue
+            if self.dry_run:
+                logger.info(f"[DRY-RUN] Archivaría {source}")
+                continue
+            try:
+                target = FileManager.archive_document(source)
+                moves.append((source, target))
+            except Exception as e:
+                logger.error(f"Error archivando {source}: {e}")
+                stats["failed"] += 1
+
+        if not moves:
+            return 0
+
+        # 2. Actualizar punteros en DB (una transacción por lote)
+        try:
+            self.vector_store.update_storage_paths(moves)
+        except Exception as e:
+            logger.error(f"Error actualizando punteros del lote, revirtiendo copias: {e}")
+            for _, target in moves:
+                try:
+                    os.remove(target)
+                except OSError:
+                    pass
+            stats["failed"] += len(moves)
+            return 0
+
+        # 3. Liberar NVMe (el puntero ya apunta al archivo COLD)
+        for source, target in moves:
+            size = os.path.getsize(source)
+            try:
+                os.remove(source)
+            except OSError as e:
+                logger.warning(f"No se pudo borrar original hot {source}: {e}")
+                continue
+            stats["archived"] += 1
+            stats["bytes_hot_freed"] += size
+            stats["bytes_cold_written"] += os.path.getsize(target)
+        logger.info(f"Lote archivado: {len(moves)} documentos.")
+        return len(moves)
+
+    def sweep_staging_tmp(self) -> Dict[str, Any]:
+        """Borra temporales de staging abandonados (más viejos que STAGING_TMP_MAX_AGE_HOURS)."""
+        cutoff = time.time() - STAGING_TMP_MAX_AGE_HOURS * 3600
+        stats = {"removed": 0, "bytes_freed": 0}
+        for tmp_dir in STAGING_TMP_DIRS:
+            if not tmp_dir.exists():
+                continue
+            for path in tmp_dir.rglob("*"):
+                try:
+                    if path.is_file() and path.stat().st_mtime < cutoff:
+                        size = path.stat().st_size
+                        if not self.dry_run:
+                            path.unlink()
+                        stats["removed"] += 1
+                        stats["bytes_freed"] += size
+                except OSError as e:
+                    logger.warning(f"No se pudo limpiar {path}: {e}")
+        return stats
+
+    def run_once(self) -> Dict[str, Any]:
+        docs = self.archive_documents()
+        tmp = self.sweep_staging_tmp()
+        logger.info(
+            f"Tiering: {docs['archived']} documentos archivados ({docs['bytes_hot_freed'] / 1e6:.1f} MB NVMe liberados, "
+            f"{docs['bytes_cold_written'] / 1e6:.1f} MB escritos en HDD, {docs['failed']} fallidos); "
+            f"{tmp['removed']} temporales de staging borrados ({tmp['bytes_freed'] / 1e6:.1f} MB)."
+        )
+        return {"documents": docs, "staging_tmp": tmp}
+
+    def run_forever(self, interval: int = INTERVAL_SECONDS):
+        logger.info(f"Servicio de tiering iniciado (cada {interval}s).")
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error en ciclo de tiering: {e}")
+                # Conexión caída: recrear en el próximo ciclo
+                if not self.vector_store.is_alive():
+                    try:
+                        self.vector_store = VectorStore()
+                    except Exception:
+                        pass
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiering HOT (NVMe) -> COLD (HDD) de documentos y limpieza de staging")
+    parser.add_argument("--loop", action="store_true", help="Ejecutar como servicio (cada TIERING_INTERVAL_SECONDS)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo reportar, sin mover ni borrar")
+    args = parser.parse_args()
+
+    service = StorageTieringService(dry_run=args.dry_run)
+    if args.loop:
+        service.run_forever()
+    else:
+        service.run_once()
@@ -2,12 +2,15 @@
 # Matar procesos existentes
 pkill -f "uvicorn src.api.main:app"
 pkill -f "python3 -m src.worker_service"
+pkill -f "python3 -m src.orchestrator.storage_tiering"
 
 sleep 2
 
 # Definir rutas de logs (absolutas para evitar líos)
 API_LOG="/app/src/api_status.log"
 WORKER_LOG="/app/src/worker_status.log"
+WORKER_HEAVY_LOG="/app/src/worker_heavy_status.log"
+TIERING_LOG="/app/src/storage_tiering_status.log"
 
 export PYTHONPATH=$PYTHONPATH:/app
 
@@ -15,7 +18,14 @@ echo "Reiniciando API desde /app..."
 cd /app
 nohup /usr/bin/python3 -m uvicorn src.api.main:app --host 0.0.0.0 --port 8000 > $API_LOG 2>&1 &
 
-echo "Reiniciando Worker desde /app..."
-nohup /usr/bin/python3 -m src.worker_service > $WORKER_LOG 2>&1 &
+echo "Reiniciando Workers desde /app..."
+# Worker rápido (warm: sin fork por job, clientes reutilizados): nunca toma documentos pesados
+nohup /usr/bin/python3 -m src.worker_service --warm etl_docs_fast etl_queue > $WORKER_LOG 2>&1 &
+# Worker pesado: prioriza la cola pesada y ayuda con el resto cuando está libre
+nohup /usr/bin/python3 -m src.worker_service etl_docs_heavy etl_docs_fast etl_queue > $WORKER_HEAVY_LOG 2>&1 &
 
-echo "Servicios reiniciados. Logs en $API_LOG y $WORKER_LOG"
+echo "Reiniciando Storage Tiering desde /app..."
+# Archiva originales SYNCED a HDD y limpia temporales de staging cada TIERING_INTERVAL_SECONDS
+nohup /usr/bin/python3 -m src.orchestrator.storage_tiering --loop > $TIERING_LOG 2>&1 &
+
+echo "Servicios reiniciados. Logs en $API_LOG, $WORKER_LOG, $WORKER_HEAVY_LOG y $TIERING_LOG"
@@ -0,0 +1,11 @@
+-- 1. Hash SHA-256 de los bytes originales del archivo subido (dedup por contenido)
+ALTER TABLE ai_knowledge_documents 
+ADD COLUMN IF NOT EXISTS file_hash VARCHAR(64);
+
+-- 2. content_id del documento cuyos vectores se reutilizan (NULL = procesado propio)
+ALTER TABLE ai_knowledge_documents 
+ADD COLUMN IF NOT EXISTS linked_content_id VARCHAR(255);
+
+-- 3. Índice para la búsqueda de duplicados por cliente en tiempo de upload
+CREATE INDEX IF NOT EXISTS idx_ai_knowledge_documents_client_file_hash 
+ON ai_knowledge_documents (client_id, file_hash);
@@ -0,0 +1,3 @@
+-- Último barrido completo de enlaces por sitio (el resto de las corridas usan descubrimiento delta)
+ALTER TABLE public.stage_sources_config 
+ADD COLUMN IF NOT EXISTS last_full_sweep_at TIMESTAMPTZ;
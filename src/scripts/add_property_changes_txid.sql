@@ -0,0 +1,14 @@
+-- 1. Transacción que escribió cada cambio: los ids (BIGSERIAL) se asignan al insertar pero se
+--    ven al commit, así que entre cargas paralelas aparecen desordenados. Los consumidores
+--    avanzan por (txid, id) y solo leen transacciones ya terminadas (pg_snapshot_xmin).
+ALTER TABLE public.lead_property_changes 
+ADD COLUMN IF NOT EXISTS txid xid8 NOT NULL DEFAULT pg_current_xact_id();
+
+-- 2. Cursor de consumidores (opcionalmente por cliente)
+CREATE INDEX IF NOT EXISTS idx_lead_property_changes_txid 
+ON public.lead_property_changes (txid, id);
+
+CREATE INDEX IF NOT EXISTS idx_lead_property_changes_client_txid 
+ON public.lead_property_changes (client_id, txid, id);
+
+DROP INDEX IF EXISTS public.idx_lead_property_changes_client_id;
@@ -0,0 +1,9 @@
+-- 1. Métrica de la guarda de extracción parcial del loader (ver PROPERTIES_SOFT_DELETE_MIN_SHARE)
+ALTER TABLE public.stage_batches 
+ADD COLUMN IF NOT EXISTS active_rows INTEGER;
+
+ALTER TABLE public.stage_batches 
+ADD COLUMN IF NOT EXISTS soft_delete_skipped BOOLEAN NOT NULL DEFAULT false;
+
+-- 2. Consulta de alertas: corridas con soft delete omitido
+-- SELECT * FROM public.stage_batches WHERE soft_delete_skipped ORDER BY created_at DESC;
@@ -0,0 +1,3 @@
+-- Propiedades del lote que el filtro de hash del loader no envió al stage (sin cambios)
+ALTER TABLE public.stage_batches 
+ADD COLUMN IF NOT EXISTS unchanged_rows INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,33 @@
+-- Cola durable de fragmentos pendientes de embedding (etapa de embedding desacoplada).
+-- La extracción (OCR/pypdf) inserta filas PENDING; los embedding workers las reclaman
+-- en lotes con FOR UPDATE SKIP LOCKED, escriben en ai_vectors y borran la fila.
+CREATE TABLE IF NOT EXISTS ai_pending_embeddings (
+    id BIGSERIAL PRIMARY KEY,
+    client_id UUID NOT NULL,
+    document_content_id VARCHAR(255) NOT NULL,  -- content_id del documento (ai_knowledge_documents.content_hash)
+    content_id VARCHAR(255) NOT NULL,           -- content_id del fragmento ({doc}_part_{n})
+    source VARCHAR(50) NOT NULL,
+    title TEXT NOT NULL,
+    body_content TEXT NOT NULL,
+    metadata JSONB NOT NULL DEFAULT '{}'::jsonb,
+    hash VARCHAR(64) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'PENDING', -- PENDING | CLAIMED | FAILED
+    attempts INT NOT NULL DEFAULT 0,
+    available_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- backoff tras errores de la API
+    claimed_at TIMESTAMPTZ,
+    claimed_by VARCHAR(100),
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Reclamo de lotes: solo filas PENDING disponibles, en orden de llegada
+CREATE INDEX IF NOT EXISTS idx_ai_pending_embeddings_claim
+ON ai_pending_embeddings (available_at, id) WHERE status = 'PENDING';
+
+-- Recuperación de reclamos vencidos (worker caído)
+CREATE INDEX IF NOT EXISTS idx_ai_pending_embeddings_claimed
+ON ai_pending_embeddings (claimed_at) WHERE status = 'CLAIMED';
+
+-- Cierre por documento y limpieza al re-procesar/borrar
+CREATE INDEX IF NOT EXISTS idx_ai_pending_embeddings_document
+ON ai_pending_embeddings (client_id, document_content_id);
@@ -0,0 +1,18 @@
+-- 1. Feed de cambios de lead_properties (lo escribe loader_v2 en la misma transacción del merge)
+CREATE TABLE IF NOT EXISTS public.lead_property_changes (
+    id BIGSERIAL PRIMARY KEY,
+    client_id UUID NOT NULL,
+    property_id UUID NOT NULL,
+    external_prop_id TEXT NOT NULL,
+    change_type TEXT NOT NULL CHECK (change_type IN ('inserted', 'updated', 'deleted')),
+    batch_id UUID,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- 2. Consumidores: "cambios desde el último id procesado" (opcionalmente por cliente)
+CREATE INDEX IF NOT EXISTS idx_lead_property_changes_client_id 
+ON public.lead_property_changes (client_id, id);
+
+-- 3. Retención por antigüedad (PROPERTIES_CHANGE_RETENTION_DAYS)
+CREATE INDEX IF NOT EXISTS idx_lead_property_changes_changed_at 
+ON public.lead_property_changes (changed_at);
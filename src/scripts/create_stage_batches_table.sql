@@ -0,0 +1,21 @@
+-- 1. Registro de corridas del loader (una fila por archivo procesado)
+CREATE TABLE IF NOT EXISTS public.stage_batches (
+    batch_id UUID PRIMARY KEY,
+    client_id UUID NOT NULL,
+    source_file TEXT,
+    staged_rows INTEGER NOT NULL DEFAULT 0,
+    merged_rows INTEGER NOT NULL DEFAULT 0,
+    deleted_rows INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- 2. Retención: últimas N corridas por cliente
+CREATE INDEX IF NOT EXISTS idx_stage_batches_client_created 
+ON public.stage_batches (client_id, created_at DESC);
+
+-- 3. Borrado por lote en stage_properties
+CREATE INDEX IF NOT EXISTS idx_stage_properties_batch_id 
+ON public.stage_properties (batch_id);
+
+-- 4. (Una vez) liberar el espacio de los lotes históricos antes de la primera retención:
+-- TRUNCATE public.stage_properties;
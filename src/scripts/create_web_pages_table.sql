@@ -0,0 +1,17 @@
+-- Estado del crawler WEB_SCRAPE por página (ETL_DOCS/web_crawler.py).
+-- Guarda validadores HTTP (ETag / Last-Modified) para re-crawls con GET condicional
+-- y los enlaces de la página, para seguir recorriendo el sitio cuando el servidor responde 304.
+CREATE TABLE IF NOT EXISTS ai_web_pages (
+    client_id UUID NOT NULL,
+    url TEXT NOT NULL,
+    content_id VARCHAR(255) NOT NULL,          -- Base de los vectores ({content_id}_part_{n})
+    etag TEXT,
+    last_modified TEXT,
+    content_hash VARCHAR(64),                  -- SHA-256 del texto principal extraído
+    chunks INT NOT NULL DEFAULT 0,             -- Fragmentos escritos en ai_vectors
+    links JSONB NOT NULL DEFAULT '[]'::jsonb,
+    status_code INT,
+    last_crawled_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_changed_at TIMESTAMPTZ,
+    PRIMARY KEY (client_id, url)
+);
@@ -0,0 +1,296 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from redis import Redis
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN ---
+# 'off': cada llamada va directo a la API. 'local': micro-batcher en el proceso (hilos de la API,
+# crawler). 'redis': servicio compartido por todos los workers de la máquina.
+COALESCE_MODE = os.getenv("DOCS_EMBED_COALESCE", "off")
+WINDOW_MS = float(os.getenv("DOCS_EMBED_COALESCE_WINDOW_MS", "50"))  # Espera máxima para juntar textos
+MAX_TEXTS = int(os.getenv("DOCS_EMBED_COALESCE_MAX_TEXTS", "100"))   # Máximo por llamada batch de Gemini
+REPLY_TIMEOUT = int(os.getenv("DOCS_EMBED_COALESCE_TIMEOUT", "30"))  # Sin respuesta del servicio: llamada directa
+
+REQUEST_KEY = "etl:embed:requests"
+REPLY_KEY_PREFIX = "etl:embed:reply:"
+REPLY_TTL = 60
+# Dueño de cada petición (SET NX): el servicio antes de embeber, el cliente antes del fallback.
+# Solo uno de los dos gasta cuota por la misma petición.
+CLAIM_KEY_PREFIX = "etl:embed:claim:"
+# Latido del servicio: sin esta clave los clientes llaman directo sin esperar REPLY_TIMEOUT
+HEARTBEAT_KEY = "etl:embed:heartbeat"
+HEARTBEAT_TTL = 15
+MAX_PENDING_REQUESTS = int(os.getenv("DOCS_EMBED_COALESCE_MAX_PENDING", "1000")) # Tope de la lista de peticiones
+
+EmbedBatchFn = Callable[[List[str]], List[List[float]]]
+
+
+def _chunks(texts: List[str], size: int):
+    for i in range(0, len(texts), size):
+        yield texts[i:i + size]
+
+
+class EmbeddingCoalescer:
+    """
+    Micro-batcher en proceso: junta los textos de llamadas concurrentes durante WINDOW_MS
+    (o hasta MAX_TEXTS) y hace UNA llamada batch; cada llamador recibe solo sus vectores.
+    """
+
+    def __init__(self, embed_batch: EmbedBatchFn, window_ms: float = WINDOW_MS, max_texts: int = MAX_TEXTS):
+        self.embed_batch = embed_batch
+        self.window = window_ms / 1000
+        self.max_texts = max_texts
+        self._requests: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-coalescer", daemon=True)
+        self._thread.start()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        futures = []
+        for chunk in _chunks(texts, self.max_texts):
+            future = Future()
+            self._requests.put((chunk, future))
+            futures.append(future)
+        vectors = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            count = len(batch[0][0])
+            deadline = time.monotonic() + self.window
+            while count < self.max_texts:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if count + len(item[0]) > self.max_texts:
+                    self._flush(batch)
+                    batch, count = [], 0
+                batch.append(item)
+                count += len(item[0])
+            self._flush(batch)
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        texts = [t for chunk, _ in batch for t in chunk]
+        try:
+            vectors = self.embed_batch(texts)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        offset = 0
+        for chunk, future in batch:
+            future.set_result(vectors[offset:offset + len(chunk)])
+            offset += len(chunk)
+        logger.debug(f"Coalescer: {len(texts)} textos de {len(batch)} llamadas en 1 batch")
+
+
+class RedisEmbeddingClient:
+    """
+    Cliente del servicio coalescer (modo 'redis'): encola la petición en una lista Redis y
+    espera su respuesta en una clave propia. Sin latido del servicio, o si no responde a tiempo,
+    llama directo a la API (el ETL nunca depende de que el servicio esté arriba).
+    """
+
+    def __init__(self, embed_batch: EmbedBatchFn, connection: Optional[Redis] = None):
+        self.embed_batch = embed_batch
+        self.conn = connection or Redis(host='localhost', port=6379, db=0)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        request_id = uuid.uuid4().hex
+        reply_key = f"{REPLY_KEY_PREFIX}{request_id}"
+        try:
+            if not self.conn.exists(HEARTBEAT_KEY):
+                return self.embed_batch(texts) # Servicio caído: no tiene sentido encolar
+            pipe = self.conn.pipeline()
+            pipe.rpush(REQUEST_KEY, json.dumps({
+                "id": request_id, "texts": texts, "deadline": time.time() + REPLY_TIMEOUT
+            }))
+            # Lista acotada (lo más viejo se descarta: esos clientes hacen fallback) y con vencimiento
+            # por si el servicio muere con peticiones adentro
+            pipe.ltrim(REQUEST_KEY, -MAX_PENDING_REQUESTS, -1)
+            pipe.expire(REQUEST_KEY, REPLY_TIMEOUT * 2)
+            pipe.execute()
+            reply = self.conn.blpop(reply_key, timeout=REPLY_TIMEOUT)
+            if reply is None:
+                # Reclamar la petición antes del fallback: si el servicio ya la tomó, está en vuelo
+                # y se espera su respuesta en vez de embeber dos veces
+                if self.conn.set(f"{CLAIM_KEY_PREFIX}{request_id}", "client", nx=True, ex=REPLY_TTL):
+                    logger.warning(f"Servicio coalescer sin respuesta en {REPLY_TIMEOUT}s, embedding directo")
+                    return self.embed_batch(texts)
+                reply = self.conn.blpop(reply_key, timeout=REPLY_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Servicio coalescer inaccesible, embedding directo: {e}")
+            return self.embed_batch(texts)
+
+        if reply is None:
+            # El servicio tomó la petición y no contestó (caído a mitad de la tanda)
+            logger.warning(f"Servicio coalescer no completó la petición en {REPLY_TIMEOUT * 2}s, embedding directo")
+            return self.embed_batch(texts)
+        payload = json.loads(reply[1])
+        if "error" in payload:
+            raise RuntimeError(f"Error de embeddings (coalescer): {payload['error']}")
+        return payload["vectors"]
+
+
+class EmbeddingCoalescerService:
+    """
+    Servicio local para modo 'redis': toma peticiones de todos los workers durante WINDOW_MS
+    (o hasta MAX_TEXTS textos), hace una llamada batch por tanda y reparte los vectores.
+    Las peticiones vencidas o reclamadas por el cliente (fallback) se descartan sin gastar cuota.
+    Publica un latido (HEARTBEAT_KEY) mientras corre.
+    """
+
+    def __init__(self, embed_batch: EmbedBatchFn, connection: Optional[Redis] = None,
+                 window_ms: float = WINDOW_MS, max_texts: int = MAX_TEXTS):
+        self.embed_batch = embed_batch
+        self.conn = connection or Redis(host='localhost', port=6379, db=0)
+        self.window = window_ms / 1000
+        self.max_texts = max_texts
+        self.stats = {"calls": 0, "texts": 0, "requests": 0, "expired": 0}
+
+    def _collect(self) -> List[dict]:
+        first = self.conn.blpop(REQUEST_KEY, timeout=5)
+        if first is None:
+            return []
+        requests = [json.loads(first[1])]
+        count = len(requests[0]["texts"])
+        deadline = time.monotonic() + self.window
+        while count < self.max_texts and time.monotonic() < deadline:
+            raw = self.conn.lpop(REQUEST_KEY)
+            if raw is None:
+                time.sleep(0.002)
+                continue
+            request = json.loads(raw)
+            requests.append(request)
+            count += len(request["texts"])
+        return requests
+
+    def _reply(self, request: dict, payload: dict):
+        key = f"{REPLY_KEY_PREFIX}{request['id']}"
+        pipe = self.conn.pipeline()
+        pipe.rpush(key, json.dumps(payload))
+        pipe.expire(key, REPLY_TTL)
+        pipe.execute()
+
+    def heartbeat(self):
+        self.conn.set(HEARTBEAT_KEY, int(time.time()), ex=HEARTBEAT_TTL)
+
+    def _claim(self, requests: List[dict]) -> List[dict]:
+        """Se queda con las peticiones que el cliente no reclamó para su fallback (SET NX)."""
+        pipe = self.conn.pipeline()
+        for request in requests:
+            pipe.set(f"{CLAIM_KEY_PREFIX}{request['id']}", "service", nx=True, ex=REPLY_TTL)
+        claimed = [request for request, ok in zip(requests, pipe.execute()) if ok]
+        self.stats["expired"] += len(requests) - len(claimed)
+        return claimed
+
+    def process_once(self) -> int:
+        now = time.time()
+        requests = []
+        for request in self._collect():
+            if request.get("deadline", now) < now:
+                self.stats["expired"] += 1
+            else:
+                requests.append(request)
+        if requests:
+            requests = self._claim(requests)
+        if not requests:
+            return 0
+
+        # Tandas de hasta max_texts textos; una petición no se parte entre tandas salvo que exceda el máximo
+        batches, current, count = [], [], 0
+        for request in requests:
+            if current and count + len(request["texts"]) > self.max_texts:
+                batches.append(current)
+                current, count = [], 0
+            current.append(request)
+            count += len(request["texts"])
+        batches.append(current)
+
+        for batch in batches:
+            texts = [t for r in batch for t in r["texts"]]
+            try:
+                vectors = []
+                for chunk in _chunks(texts, self.max_texts):
+                    vectors.extend(self.embed_batch(chunk))
+                    self.stats["calls"] += 1
+            except Exception as e:
+                logger.error(f"Error en batch coalescido ({len(texts)} textos): {e}")
+                for request in batch:
+                    self._reply(request, {"error": str(e)[:500]})
+                continue
+            offset = 0
+            for request in batch:
+                n = len(request["texts"])
+                self._reply(request, {"vectors": vectors[offset:offset + n]})
+                offset += n
+            self.stats["texts"] += len(texts)
+            self.stats["requests"] += len(batch)
+        return len(requests)
+
+    def run_forever(self, report_every: int = 60):
+        logger.info(f"Coalescer de embeddings iniciado (ventana {self.window * 1000:.0f} ms, máx {self.max_texts} textos).")
+        last_report = time.monotonic()
+        while True:
+            try:
+                self.heartbeat() # _collect bloquea como máximo 5s: cada vuelta renueva el latido
+                self.process_once()
+            except Exception as e:
+                logger.error(f"Error en ciclo del coalescer: {e}")
+                time.sleep(1)
+            if time.monotonic() - last_report >= report_every:
+                calls = self.stats["calls"] or 1
+                logger.info(
+                    f"Coalescer: {self.stats['requests']} peticiones, {self.stats['texts']} textos en "
+                    f"{self.stats['calls']} llamadas ({self.stats['texts'] / calls:.1f} textos/llamada), "
+                    f"{self.stats['expired']} vencidas."
+                )
+                last_report = time.monotonic()
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer(embed_batch: EmbedBatchFn):
+    """Instancia del coalescer según DOCS_EMBED_COALESCE (None en modo 'off'). Una por proceso."""
+    global _coalescer
+    if COALESCE_MODE not in ("local", "redis"):
+        return None
+    with _coalescer_lock:
+        if _coalescer is None:
+            if COALESCE_MODE == "local":
+                _coalescer = EmbeddingCoalescer(embed_batch)
+            else:
+                _coalescer = RedisEmbeddingClient(embed_batch)
+        return _coalescer
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv("/app/src/.env")
+    sys.path.append("/app/src")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - COALESCER - %(levelname)s - %(message)s')
+
+    from src.shared.vector_store import embed_batch
+
+    EmbeddingCoalescerService(embed_batch).run_forever()
@@ -1,7 +1,12 @@
 
 import os
+import io
+import gzip
 import shutil
+import hashlib
 import logging
+import zipfile
+import tempfile
 from pathlib import Path
 from uuid import UUID
 
@@ -11,23 +16,73 @@ logger = logging.getLogger(__name__)
 # Definir la raíz del almacenamiento. 
 # En producción Docker, /app/data/storage está montado al disco grande.
 STORAGE_ROOT = Path(os.getenv("PATH_STORAGE", "/app/data/storage"))
+# Staging en NVMe (HOT): uploads nuevos y documentos en proceso
+STAGING_ROOT = Path(os.getenv("PATH_STAGING", "/app/data/staging"))
+
+HOT_DOCUMENTS_ROOT = STAGING_ROOT / "documents_in"
+LEGACY_DOCUMENTS_ROOT = STORAGE_ROOT / "documents"      # Uploads previos al tiering (HDD, sin comprimir)
+ARCHIVE_DOCUMENTS_ROOT = STORAGE_ROOT / "documents_arch" # COLD: originales sincronizados, gzip
+ARCHIVE_SUFFIX = ".gz"
+TEMP_WORK_ROOT = STAGING_ROOT / "temp_work"
 
 class FileManager:
     """
     Gestor centralizado de archivos físicos en disco.
-    Asegura que todos los archivos se guarden bajo la estructura:
-    /app/data/storage/documents/{client_id}/{filename}
+    Los uploads se guardan en el tier HOT (NVMe):
+    /app/data/staging/documents_in/{client_id}/{filename}
+    y el tiering (src/orchestrator/storage_tiering.py) los comprime y mueve al tier COLD:
+    /app/data/storage/documents_arch/{client_id}/{filename}.gz
     """
 
     @staticmethod
     def _get_client_dir(client_id: UUID) -> Path:
-        return STORAGE_ROOT / "documents" / str(client_id)
+        return HOT_DOCUMENTS_ROOT / str(client_id)
+
+    @staticmethod
+    def _get_client_dirs(client_id: UUID) -> list[Path]:
+        """Directorios del cliente en todos los tiers (hot, legacy, archivo)."""
+        return [
+            HOT_DOCUMENTS_ROOT / str(client_id),
+            LEGACY_DOCUMENTS_ROOT / str(client_id),
+            ARCHIVE_DOCUMENTS_ROOT / str(client_id),
+        ]
+
+    @classmethod
+    def _get_client_file_paths(cls, client_id: UUID, filename: str) -> list[Path]:
+        hot_dir, legacy_dir, archive_dir = cls._get_client_dirs(client_id)
+        return [hot_dir / filename, legacy_dir / filename, archive_dir / f"{filename}{ARCHIVE_SUFFIX}"]
 
     @classmethod
     def check_file_exists(cls, client_id: UUID, filename: str) -> bool:
-        """Verifica si un archivo ya existe en el directorio del cliente."""
-        file_path = cls._get_client_dir(client_id) / filename
-        return file_path.exists()
+        """Verifica si un archivo ya existe para el cliente (en cualquier tier)."""
+        return any(path.exists() for path in cls._get_client_file_paths(client_id, filename))
+
+    @staticmethod
+    def calculate_file_hash(file_bytes: bytes) -> str:
+        """Calcula SHA-256 de los bytes del archivo (dedup por contenido)."""
+        return hashlib.sha256(file_bytes).hexdigest()
+
+    @staticmethod
+    def extract_pdfs_from_zip(zip_bytes: bytes, max_files: int) -> list[tuple[str, bytes]]:
+        """
+        Extrae en memoria los PDFs de un ZIP (upload por lotes).
+        Retorna [(filename, bytes)] con nombres sin directorios (evita path traversal).
+        """
+        pdfs = []
+        try:
+            with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or not info.filename.lower().endswith(".pdf"):
+                        continue
+                    name = os.path.basename(info.filename)
+                    if not name or name.startswith("."):
+                        continue
+                    if len(pdfs) >= max_files:
+                        raise ValueError(f"El ZIP excede el máximo de {max_files} archivos PDF.")
+                    pdfs.append((name, zf.read(info)))
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"ZIP inválido: {e}")
+        return pdfs
 
     @classmethod
     def save_upload(cls, file_bytes: bytes, filename: str, client_id: UUID) -> str:
@@ -60,42 +115,94 @@ class FileManager:
     @classmethod
     def delete_document(cls, client_id: UUID, filename: str) -> bool:
         """
-        Borra un archivo específico de un cliente.
+        Borra un archivo específico de un cliente (en cualquier tier).
         """
-        file_path = cls._get_client_dir(client_id) / filename
-        if file_path.exists():
-            try:
-                os.remove(file_path)
-                logger.info(f"Archivo eliminado: {file_path}")
-                return True
-            except OSError as e:
-                logger.error(f"Error borrando archivo {file_path}: {e}")
-                return False
-        else:
-            logger.warning(f"Intento de borrar archivo inexistente: {file_path}")
-            return False
+        deleted = False
+        for file_path in cls._get_client_file_paths(client_id, filename):
+            if file_path.exists():
+                try:
+                    os.remove(file_path)
+                    logger.info(f"Archivo eliminado: {file_path}")
+                    deleted = True
+                except OSError as e:
+                    logger.error(f"Error borrando archivo {file_path}: {e}")
+                    return False
+        if not deleted:
+            logger.warning(f"Intento de borrar archivo inexistente: {filename} (cliente {client_id})")
+        return deleted
 
     @classmethod
     def delete_client_folder(cls, client_id: UUID) -> bool:
         """
-        Elimina recursivamente todo el directorio de un cliente.
+        Elimina recursivamente todos los directorios de un cliente (todos los tiers).
         Usar con precaución (Baja de Cliente).
         """
-        client_dir = cls._get_client_dir(client_id)
-        if client_dir.exists():
-            try:
-                shutil.rmtree(client_dir)
-                logger.info(f"Directorio de cliente eliminado completamente: {client_dir}")
-                return True
-            except OSError as e:
-                logger.error(f"Error borrando directorio cliente {client_dir}: {e}")
-                return False
-        return True # Si no existe, "ya estaba borrado"
+        ok = True
+        for client_dir in cls._get_client_dirs(client_id):
+            if client_dir.exists():
+                try:
+                    shutil.rmtree(client_dir)
+                    logger.info(f"Directorio de cliente eliminado completamente: {client_dir}")
+                except OSError as e:
+                    logger.error(f"Error borrando directorio cliente {client_dir}: {e}")
+                    ok = False
+        return ok # Si no existe, "ya estaba borrado"
 
     @classmethod
     def list_files(cls, client_id: UUID) -> list[str]:
-        """Listar archivos de un cliente"""
-        client_dir = cls._get_client_dir(client_id)
-        if not client_dir.exists():
-            return []
-        return [f.name for f in client_dir.iterdir() if f.is_file()]
+        """Listar archivos de un cliente (todos los tiers, nombres originales)"""
+        names = set()
+        for client_dir in cls._get_client_dirs(client_id):
+            if client_dir.exists():
+                for f in client_dir.iterdir():
+                    if f.is_file():
+                        names.add(f.name[:-len(ARCHIVE_SUFFIX)] if client_dir.parent == ARCHIVE_DOCUMENTS_ROOT else f.name)
+        return sorted(names)
+
+    # --- TIERING HOT (NVMe) / COLD (HDD) ---
+
+    @staticmethod
+    def archive_document(storage_path: str) -> str:
+        """
+        Comprime (gzip) un original al tier COLD y retorna la nueva ruta.
+        NO borra el origen: el llamador lo borra después de actualizar el puntero en DB.
+        """
+        source = Path(storage_path)
+        client_id = source.parent.name
+        target = ARCHIVE_DOCUMENTS_ROOT / client_id / f"{source.name}{ARCHIVE_SUFFIX}"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_target = target.with_name(f".{target.name}.tmp")
+        try:
+            with open(source, "rb") as src, gzip.open(tmp_target, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, length=1024 * 1024)
+            with open(tmp_target, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_target, target)
+            return str(target)
+        except Exception:
+            if tmp_target.exists():
+                tmp_target.unlink()
+            raise
+
+    @staticmethod
+    def ensure_local(storage_path: str) -> str:
+        """
+        Retorna una ruta legible del PDF original. Si está archivado (gzip en COLD),
+        lo descomprime a temp_work (NVMe); el llamador debe borrar esa copia.
+        Cada llamada usa su propio archivo (mkstemp): los sub-jobs de fan-out de un mismo
+        original no se pisan ni se borran la copia entre sí.
+        """
+        if not storage_path.endswith(ARCHIVE_SUFFIX):
+            return storage_path
+        TEMP_WORK_ROOT.mkdir(parents=True, exist_ok=True)
+        name = Path(storage_path).name[:-len(ARCHIVE_SUFFIX)]
+        fd, local_path = tempfile.mkstemp(
+            prefix=f"{hashlib.sha256(storage_path.encode()).hexdigest()[:12]}_", suffix=f"_{name}", dir=TEMP_WORK_ROOT
+        )
+        try:
+            with gzip.open(storage_path, "rb") as src, os.fdopen(fd, "wb") as dst:
+                shutil.copyfileobj(src, dst, length=1024 * 1024)
+        except Exception:
+            os.remove(local_path)
+            raise
+        return local_path
@@ -0,0 +1,105 @@
+import os
+import logging
+import threading
+from urllib.parse import urlparse
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN ---
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "8"))            # Conexiones keep-alive por host
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "1.0")) # 1s, 2s, 4s... (respeta Retry-After)
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# urllib3 solo decodifica brotli si el paquete está instalado; si no, no lo anunciamos
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _host_of(url_or_host: str) -> str:
+    parsed = urlparse(url_or_host if "://" in url_or_host else f"//{url_or_host}")
+    return (parsed.netloc or url_or_host).lower()
+
+
+def build_session(pool_size: int = HTTP_POOL_SIZE, retries: int = HTTP_RETRIES,
+                  backoff_factor: float = HTTP_BACKOFF_FACTOR) -> requests.Session:
+    """Session con pool keep-alive, compresión y reintentos con backoff (solo GET/HEAD)."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False, # El llamador decide con raise_for_status()
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": DEFAULT_USER_AGENT, "Accept-Encoding": ACCEPT_ENCODING})
+    return session
+
+
+def get_session(url_or_host: str) -> requests.Session:
+    """
+    Session compartida del host (una por host y proceso). Todos los providers e hilos que
+    golpean el mismo sitio reutilizan sus conexiones (sin TCP/TLS handshake por request).
+    """
+    host = _host_of(url_or_host)
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = build_session()
+            _sessions[host] = session
+        return session
+
+
+def session_stats(host: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Requests y conexiones nuevas por host (contadores de los pools de urllib3).
+    reuse_rate = fracción de requests que viajaron por una conexión ya abierta.
+    """
+    with _sessions_lock:
+        sessions = dict(_sessions) if host is None else {h: s for h, s in _sessions.items() if h == _host_of(host)}
+
+    stats = {}
+    for name, session in sessions.items():
+        requests_count, connections = 0, 0
+        adapters = {id(a): a for a in session.adapters.values()}.values()
+        for adapter in adapters:
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_count += pool.num_requests
+                connections += pool.num_connections
+        reuse = 1 - connections / requests_count if requests_count else 0.0
+        stats[name] = {"requests": requests_count, "connections": connections, "reuse_rate": round(max(reuse, 0.0), 3)}
+    return stats
+
+
+def format_session_stats(host: Optional[str] = None) -> str:
+    """Resumen de una línea para los logs de corrida."""
+    parts = [
+        f"{name}: {s['requests']} req / {s['connections']} conexiones ({s['reuse_rate']:.0%} reutilizadas)"
+        for name, s in session_stats(host).items()
+    ]
+    return "; ".join(parts) if parts else "sin requests"
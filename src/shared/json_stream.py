@@ -0,0 +1,149 @@
+import json
+from typing import Any, Dict, Iterator
+
+# Bytes leídos por vez: la memoria queda acotada por el item más grande, no por el archivo
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",:]}"
+
+
+class JsonArrayStream:
+    """
+    Lector en streaming de snapshots {"metadata": {...}, "<array_key>": [ {...}, ... ]}
+    (formato de save_to_json de ETL_PROPERTIES). Solo la stdlib: `json.JSONDecoder.raw_decode`
+    sobre un buffer que se rellena por bloques.
+
+    - `header`: claves del objeto raíz que aparecen ANTES del array (ej. metadata), disponibles
+      al entrar al contexto.
+    - Iterar el stream entrega los items del array de a uno; `trailer` junta las claves que
+      vengan después del array (se completa al terminar la iteración).
+
+        with JsonArrayStream(path) as stream:
+            client_id = stream.header.get("metadata", {}).get("client_id")
+            for prop in stream:
+                ...
+    """
+
+    def __init__(self, filepath: str, array_key: str = "properties", chunk_size: int = CHUNK_SIZE):
+        self.filepath = filepath
+        self.array_key = array_key
+        self.chunk_size = chunk_size
+        self.header: Dict[str, Any] = {}
+        self.trailer: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+        self._file = None
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._in_array = False
+        self._consumed = False
+
+    def __enter__(self):
+        self._file = open(self.filepath, "r", encoding="utf-8")
+        self._expect("{")
+        self._read_members(self.header, stop_at_array=True)
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # --- Buffer ---
+
+    def _fill(self) -> bool:
+        """Agrega un bloque al buffer (descartando lo ya consumido). False si no hay más."""
+        if self._eof:
+            return False
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Siguiente carácter no blanco (sin consumirlo); '' al final del archivo."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"JSON inválido en {self.filepath}: se esperaba '{char}' y llegó '{found or 'EOF'}'")
+        self._pos += 1
+
+    def _decode(self) -> Any:
+        """Decodifica el siguiente valor completo; si el buffer lo corta, lee más y reintenta."""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # Un número cortado por el bloque ("12" de "12.5e3") decodifica igual: solo vale
+                # si lo que sigue es un delimitador
+                if self._eof or (end < len(self._buf) and self._buf[end] in _DELIMITERS):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            if not self._fill():
+                if self._eof and self._pos < len(self._buf):
+                    continue # Último intento con el buffer completo
+                raise ValueError(f"JSON truncado en {self.filepath}")
+
+    # --- Estructura ---
+
+    def _read_members(self, target: Dict[str, Any], stop_at_array: bool):
+        """Lee pares clave: valor del objeto raíz; se detiene al abrir el array (stop_at_array)."""
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._decode()
+            self._expect(":")
+            if stop_at_array and key == self.array_key and self._peek() == "[":
+                self._pos += 1
+                self._in_array = True
+                return
+            target[key] = self._decode()
+            sep = self._peek()
+            self._pos += 1
+            if sep == "}":
+                return
+            if sep != ",":
+                raise ValueError(f"JSON inválido en {self.filepath}: separador '{sep or 'EOF'}'")
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._consumed:
+            return
+        self._consumed = True
+        if not self._in_array:
+            return # El archivo no trae el array
+        if self._peek() == "]":
+            self._pos += 1
+        else:
+            while True:
+                yield self._decode()
+                sep = self._peek()
+                self._pos += 1
+                if sep == "]":
+                    break
+                if sep != ",":
+                    raise ValueError(f"JSON inválido en {self.filepath}: separador '{sep or 'EOF'}'")
+        self._in_array = False
+        # Claves posteriores al array (ej. metadata escrita al final por otra herramienta)
+        sep = self._peek()
+        self._pos += 1
+        if sep == ",":
+            self._read_members(self.trailer, stop_at_array=False)
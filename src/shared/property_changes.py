@@ -0,0 +1,77 @@
+import os
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from redis import Redis
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN ---
+# Feed de cambios de lead_properties que publica loader_v2 (inserted | updated | deleted).
+# La tabla lead_property_changes es la fuente durable; el stream Redis es el aviso en vivo.
+STREAM_KEY = os.getenv("PROPERTIES_CHANGE_STREAM", "etl:property_changes")
+STREAM_MAXLEN = int(os.getenv("PROPERTIES_CHANGE_STREAM_MAXLEN", "100000")) # Recorte aproximado (XADD MAXLEN ~)
+PUBLISH_CHUNK = 1000
+
+CHANGE_TYPES = ("inserted", "updated", "deleted")
+CHANGES_TABLE = "public.lead_property_changes"
+START_CURSOR = (0, 0) # (txid, change_id) antes del primer cambio
+
+
+def publish_property_changes(changes: Sequence[Dict[str, Any]], connection: Optional[Redis] = None) -> int:
+    """
+    Publica cambios ya confirmados en la BD en el stream Redis (un XADD por cambio, en pipeline).
+    Cada mensaje lleva change_id y txid (cursor de lead_property_changes) para que un consumidor
+    atrasado retome desde la tabla. Si Redis no está, solo se loguea: la tabla ya tiene los cambios.
+    Retorna la cantidad publicada.
+    """
+    if not changes:
+        return 0
+    try:
+        conn = connection or Redis(host='localhost', port=6379, db=0)
+        for start in range(0, len(changes), PUBLISH_CHUNK):
+            pipe = conn.pipeline(transaction=False)
+            for change in changes[start:start + PUBLISH_CHUNK]:
+                pipe.xadd(STREAM_KEY, {k: str(v) for k, v in change.items() if v is not None},
+                          maxlen=STREAM_MAXLEN, approximate=True)
+            pipe.execute()
+        return len(changes)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo publicar el feed de cambios en Redis ({len(changes)} cambios quedan en la tabla): {e}")
+        return 0
+
+
+def fetch_changes_since(cur, cursor: Tuple[int, int] = START_CURSOR, client_id: Optional[str] = None,
+                        change_types: Sequence[str] = CHANGE_TYPES, limit: int = 1000,
+                        table: str = CHANGES_TABLE) -> List[Dict[str, Any]]:
+    """
+    Lectura durable del feed para consumidores (ImageLoader, tagger, matcher de POIs): cambios
+    posteriores a `cursor` = (txid, change_id), en orden de transacción.
+    Los ids se asignan al insertar pero se ven al commit (cargas paralelas): solo se leen
+    transacciones ya terminadas (txid < pg_snapshot_xmin), que no pueden sumar filas. El consumidor
+    guarda next_cursor(rows, cursor) y repite; lo que sigue en vuelo aparece en una lectura posterior.
+    """
+    query = f"""
+        SELECT id AS change_id, txid::text::bigint AS txid, client_id, property_id, external_prop_id,
+               change_type, batch_id, changed_at
+        FROM {table}
+        WHERE (txid, id) > (%s::text::xid8, %s)
+          AND txid < pg_snapshot_xmin(pg_current_snapshot())
+          AND change_type = ANY(%s)
+    """
+    params: List[Any] = [str(cursor[0]), cursor[1], list(change_types)]
+    if client_id:
+        query += " AND client_id = %s"
+        params.append(client_id)
+    query += " ORDER BY txid, id LIMIT %s"
+    params.append(limit)
+    cur.execute(query, params)
+    columns = [d[0] for d in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+def next_cursor(rows: Sequence[Dict[str, Any]], cursor: Tuple[int, int] = START_CURSOR) -> Tuple[int, int]:
+    """Cursor a guardar después de procesar `rows` (el mismo si no hubo filas)."""
+    if not rows:
+        return cursor
+    return rows[-1]["txid"], rows[-1]["change_id"]
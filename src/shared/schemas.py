@@ -9,6 +9,7 @@ from enum import Enum
 class IngestStatus(str, Enum):
     PENDING = "PENDING"
     PROCESSING = "PROCESSING"
+    EMBEDDING = "EMBEDDING"  # Texto extraído; fragmentos en ai_pending_embeddings
     SYNCED = "SYNCED"
     FAILED = "FAILED"
 
@@ -29,6 +30,25 @@ class DocumentUploadMetadata(BaseModel):
     category: Optional[str] = "knowledge_base"
     # source: opcional, inferido si es upload
 
+class TextIngestItem(BaseModel):
+    """Texto corto (FAQ, snippet del CRM) con forma de CanonicalDocument. El hash lo calcula el ETL."""
+    content_id: str
+    title: str
+    body_content: str = Field(..., min_length=1)
+    metadata: Dict[str, Any] = Field(default_factory=dict) # category, access_level, url, ... (client_id lo fija el request)
+
+class BulkTextIngestRequest(BaseModel):
+    client_id: UUID
+    items: List[TextIngestItem]
+
+class WebCrawlRequest(BaseModel):
+    client_id: UUID
+    urls: List[str] = Field(..., min_length=1) # URLs de inicio; el crawl no sale de sus hosts
+    max_pages: Optional[int] = None
+    max_depth: Optional[int] = None
+    access_level: AccessLevel = AccessLevel.SHARED
+    category: Optional[str] = "web"
+
 # --- INTERNAL MODELS (Lo que procesamos) ---
 
 class CanonicalMetadata(BaseModel):
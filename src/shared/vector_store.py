@@ -16,6 +16,7 @@ from google.genai import types
 from dotenv import load_dotenv
 
 from src.shared.schemas import CanonicalDocument
+from src.shared.embedding_coalescer import get_coalescer
 
 # Cargar configuración
 load_dotenv()
@@ -32,6 +33,34 @@ DB_NAME = os.getenv("DB_NAME", "agentic") # Usamos la variable de entorno, defau
 DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 
+# Etapa de embedding: 'inline' (embedding dentro del job de extracción) o 'decoupled'
+# (fragmentos a ai_pending_embeddings, ver scripts/create_pending_embeddings_table.sql
+# y ETL_DOCS/embedding_worker.py)
+EMBED_MODE = os.getenv("DOCS_EMBED_MODE", "inline")
+PENDING_EMBEDDINGS_ENABLED = EMBED_MODE == "decoupled"
+
+
+def embed_batch(texts: List[str]) -> List[List[float]]:
+    """Llamada directa a la API de embeddings (una request para todos los textos)."""
+    result = client.models.embed_content(
+        model=EMBEDDING_MODEL,
+        contents=texts,
+        config=types.EmbedContentConfig(
+            task_type="RETRIEVAL_DOCUMENT"
+        )
+    )
+    return [e.values for e in result.embeddings]
+
+
+class LinkedDocumentsError(Exception):
+    """El documento tiene otros registros enlazados a sus vectores (dedup): no se puede borrar."""
+
+    def __init__(self, content_id: str, linked: List[str]):
+        self.content_id = content_id
+        self.linked = linked
+        super().__init__(f"{content_id} tiene {len(linked)} documentos enlazados a sus vectores: {linked}")
+
+
 class VectorStore:
     def __init__(self):
         self.conn = None
@@ -52,37 +81,146 @@ class VectorStore:
             logger.error(f"Error conectando a DB Semantic: {e}")
             raise
 
+    def is_alive(self) -> bool:
+        """Verifica que la conexión siga usable (workers de larga vida reutilizan la instancia)."""
+        if not self.conn or self.conn.closed:
+            return False
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
     def get_embedding(self, text: str) -> List[float]:
         """Genera embedding usando Google Gemini (SDK moderno)"""
+        return self.get_embeddings([text])[0]
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Genera embeddings para varios textos en una sola llamada (batch de la API).
+        Con DOCS_EMBED_COALESCE activo, se juntan con las llamadas de otros jobs (ver embedding_coalescer.py).
+        """
         try:
-            result = client.models.embed_content(
-                model=EMBEDDING_MODEL,
-                contents=text,
-                config=types.EmbedContentConfig(
-                    task_type="RETRIEVAL_DOCUMENT"
-                )
-            )
-            return result.embeddings[0].values
+            coalescer = get_coalescer(embed_batch)
+            if coalescer:
+                return coalescer.embed(texts)
+            return embed_batch(texts)
         except Exception as e:
-            logger.error(f"Error generando embedding con Google AI: {e}")
+            logger.error(f"Error generando embeddings batch con Google AI: {e}")
             raise
 
     def calculate_hash(self, content: str) -> str:
         """Calcula SHA-256 del contenido de texto"""
         return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
-    def register_document_in_db(self, client_id: UUID, filename: str, storage_path: str, content_id: str, access_level: str = 'shared', category: str = 'General'):
+    def register_document_in_db(self, client_id: UUID, filename: str, storage_path: str, content_id: str, access_level: str = 'shared', category: str = 'General', file_hash: str = None, linked_content_id: str = None):
         """Crea el registro inicial en ai_knowledge_documents como PENDING."""
         if not self.conn or self.conn.closed: self._connect()
         with self.conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO ai_knowledge_documents 
-                (client_id, filename, storage_path, sync_status, content_hash, access_level, category, created_at)
-                VALUES (%s, %s, %s, 'PENDING', %s, %s, %s, NOW())
-            """, (str(client_id), filename, storage_path, content_id, access_level, category))
+                (client_id, filename, storage_path, sync_status, content_hash, access_level, category, file_hash, linked_content_id, created_at)
+                VALUES (%s, %s, %s, 'PENDING', %s, %s, %s, %s, %s, NOW())
+            """, (str(client_id), filename, storage_path, content_id, access_level, category, file_hash, linked_content_id))
+
+    def register_documents_batch(self, client_id: UUID, documents: List[Dict[str, Any]]):
+        """
+        Registra varios documentos como PENDING en una sola transacción (upload por lotes).
+        Cada item: filename, storage_path, content_id, access_level, category, file_hash, linked_content_id.
+        Si falla cualquier fila no se registra ninguna.
+        """
+        if not self.conn or self.conn.closed: self._connect()
+        from psycopg2.extras import execute_values
+        rows = [
+            (str(client_id), d["filename"], d["storage_path"], d["content_id"], d["access_level"],
+             d["category"], d.get("file_hash"), d.get("linked_content_id"))
+            for d in documents
+        ]
+        self.conn.autocommit = False
+        try:
+            with self.conn.cursor() as cur:
+                execute_values(cur, """
+                    INSERT INTO ai_knowledge_documents 
+                    (client_id, filename, storage_path, content_hash, access_level, category, file_hash, linked_content_id, sync_status, created_at)
+                    VALUES %s
+                """, rows, template="(%s, %s, %s, %s, %s, %s, %s, %s, 'PENDING', NOW())")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.autocommit = True
+
+    def list_archivable_documents(self, archive_prefix: str, min_age_hours: float, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Documentos SYNCED con original fuera del archivo COLD, sincronizados hace más de
+        `min_age_hours` (los más antiguos primero). Los enlazados (dedup) comparten archivo y se omiten.
+        """
+        if not self.conn or self.conn.closed: self._connect()
+        from psycopg2.extras import RealDictCursor
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT client_id, content_hash as content_id, storage_path, last_synced_at
+                FROM ai_knowledge_documents 
+                WHERE sync_status = 'SYNCED'
+                  AND linked_content_id IS NULL
+                  AND storage_path NOT LIKE %s
+                  AND last_synced_at < NOW() - make_interval(secs => %s)
+                ORDER BY last_synced_at ASC
+                LIMIT %s
+            """, (f"{archive_prefix}%", min_age_hours * 3600, limit))
+            return cur.fetchall()
+
+    def update_storage_paths(self, moves: List[tuple]):
+        """
+        Actualiza punteros storage_path (old -> new) en una sola transacción.
+        Incluye los documentos enlazados que comparten el mismo original.
+        """
+        if not moves: return
+        if not self.conn or self.conn.closed: self._connect()
+        from psycopg2.extras import execute_values
+        self.conn.autocommit = False
+        try:
+            with self.conn.cursor() as cur:
+                execute_values(cur, """
+                    UPDATE ai_knowledge_documents AS d
+                    SET storage_path = m.new_path
+                    FROM (VALUES %s) AS m(old_path, new_path)
+                    WHERE d.storage_path = m.old_path
+                """, moves)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.autocommit = True
+
+    def find_document_by_file_hash(self, client_id: UUID, file_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca un documento del cliente con los mismos bytes (file_hash) que tenga vectores propios.
+        Ignora documentos FAILED y documentos que a su vez son enlaces. Incluye access_level y
+        category: sus vectores los conservan en la metadata (ver docs._resolve_duplicate).
+        """
+        if not self.conn or self.conn.closed: self._connect()
+        from psycopg2.extras import RealDictCursor
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT content_hash as content_id, filename, storage_path, sync_status, access_level, category
+                FROM ai_knowledge_documents 
+                WHERE client_id = %s AND file_hash = %s
+                  AND linked_content_id IS NULL
+                  AND sync_status <> 'FAILED'
+                ORDER BY created_at ASC
+                LIMIT 1
+            """, (str(client_id), file_hash))
+            return cur.fetchone()
 
     def update_sync_status(self, client_id: UUID, content_id: str, status: str, error_message: str = None):
-        """Actualiza el estado de sincronización y el hash final."""
+        """
+        Actualiza el estado de sincronización y el hash final.
+        Los documentos enlazados (dedup) reflejan el estado del documento cuyos vectores reutilizan.
+        """
         if not self.conn or self.conn.closed: self._connect()
         with self.conn.cursor() as cur:
             cur.execute("""
@@ -90,8 +228,19 @@ class VectorStore:
                 SET sync_status = %s, 
                     error_message = %s,
                     last_synced_at = NOW()
+                WHERE client_id = %s AND (content_hash = %s OR linked_content_id = %s)
+            """, (status, error_message, str(client_id), content_id, content_id))
+
+    def get_sync_status(self, client_id: UUID, content_id: str) -> Optional[str]:
+        """Retorna el sync_status actual de un documento (None si no existe)."""
+        if not self.conn or self.conn.closed: self._connect()
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT sync_status FROM ai_knowledge_documents 
                 WHERE client_id = %s AND content_hash = %s
-            """, (status, error_message, str(client_id), content_id))
+            """, (str(client_id), content_id))
+            row = cur.fetchone()
+            return row[0] if row else None
 
     def list_documents(self, client_id: UUID) -> List[Dict[str, Any]]:
         """Lista todos los documentos registrados para un cliente."""
@@ -99,20 +248,22 @@ class VectorStore:
         from psycopg2.extras import RealDictCursor
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                SELECT id, filename, sync_status, last_synced_at, created_at, content_hash as content_id, error_message, access_level, category
+                SELECT id, filename, sync_status, last_synced_at, created_at, content_hash as content_id, error_message, access_level, category, file_hash, linked_content_id
                 FROM ai_knowledge_documents 
                 WHERE client_id = %s
                 ORDER BY created_at DESC
             """, (str(client_id),))
             return cur.fetchall()
 
-    def upsert_document(self, doc: CanonicalDocument) -> bool:
+    def upsert_document(self, doc: CanonicalDocument, embedding: Optional[List[float]] = None) -> bool:
         """
         Inserta o actualiza un documento en la tabla semantic_items.
         Lógica:
         1. Verifica hash existente para este content_id y client_id.
         2. Si el hash es igual -> SKIP (Idempotencia).
         3. Si cambió o es nuevo -> Generar Embedding -> UPSERT.
+        `embedding` permite pasar un vector ya calculado (embedding workers por lotes).
+        Retorna False si no se escribió nada porque el mismo contenido (hash) ya existe bajo otro content_id.
         """
         if not self.conn or self.conn.closed:
             self._connect()
@@ -139,7 +290,7 @@ class VectorStore:
                 logger.info(f"Procesando Upsert para {doc.content_id}...")
                 
                 # 2. Generar Embedding (Solo si es nuevo o cambió)
-                embedding_vector = self.get_embedding(doc.body_content)
+                embedding_vector = embedding if embedding is not None else self.get_embedding(doc.body_content)
 
                 # Asegurar que metadata sea JSON válido
                 # Convertir modelo Pydantic a dict compatible con JSON (UUIDs a string)
@@ -198,9 +349,10 @@ class VectorStore:
                         logger.warning(f"Hash duplicado detectado en DB para {doc.content_id}. El contenido ya existe bajo otro ID. {e}")
                         # En este modelo de negocio, decidimos: ¿Permitimos duplicados de contenido con diferente ID?
                         # Si la tabla tiene UNIQUE(hash), NO se permite.
-                        # Retornamos True asumiendo que "ya está preservado el conocimiento".
+                        # El conocimiento ya está preservado, pero este content_id no quedó escrito:
+                        # False para que quien llama no lo reporte como creado.
                         self.conn.rollback() # Resetear transacción fallida
-                        return True
+                        return False
 
                 return True
 
@@ -209,8 +361,227 @@ class VectorStore:
             self.conn.rollback() # Rollback manual si falla algo en un bloque no-autocommit implícito
             raise
 
+    def get_vector_hashes(self, client_id: UUID, content_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Hash e id actuales en ai_vectors para varios content_id (una sola consulta). {content_id: {id, hash}}"""
+        if not content_ids: return {}
+        if not self.conn or self.conn.closed: self._connect()
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT content_id, id, hash FROM ai_vectors
+                WHERE client_id = %s AND content_id = ANY(%s)
+            """, (str(client_id), list(content_ids)))
+            return {row[0]: {"id": row[1], "hash": row[2]} for row in cur.fetchall()}
+
+    def upsert_documents_batch(self, docs: List[CanonicalDocument], embeddings: List[List[float]],
+                               existing_ids: Dict[str, Any]):
+        """
+        Escribe varios documentos ya embebidos en UNA transacción: UPDATE masivo de los existentes
+        (`existing_ids`: {content_id: id} de get_vector_hashes) e INSERT masivo de los nuevos.
+        Si falla (ej. UNIQUE(hash) contra otro content_id) no se escribe ninguno; el llamador decide
+        si reintentar uno por uno con upsert_document.
+        """
+        if not docs: return
+        if not self.conn or self.conn.closed: self._connect()
+        from psycopg2.extras import execute_values, execute_batch
+        updates, inserts = [], []
+        for doc, embedding in zip(docs, embeddings):
+            meta_json = Json(doc.metadata.model_dump(mode='json'))
+            source = doc.source.value if hasattr(doc.source, "value") else doc.source
+            if doc.content_id in existing_ids:
+                updates.append((existing_ids[doc.content_id], doc.body_content, doc.title, meta_json, doc.hash, embedding))
+            else:
+                inserts.append((str(uuid.uuid4()), doc.content_id, str(doc.metadata.client_id), source,
+                                doc.title, doc.body_content, meta_json, doc.hash, embedding))
+
+        self.conn.autocommit = False
+        try:
+            with self.conn.cursor() as cur:
+                if updates:
+                    # execute_batch: mismas sentencias que upsert_document, agrupadas por round trip
+                    execute_batch(cur, """
+                        UPDATE ai_vectors 
+                        SET body_content = %s, title = %s, metadata = %s, hash = %s, embedding = %s, updated_at = NOW()
+                        WHERE id = %s
+                    """, [u[1:] + (u[0],) for u in updates])
+                if inserts:
+                    execute_values(cur, """
+                        INSERT INTO ai_vectors 
+                        (id, content_id, client_id, source, title, body_content, metadata, hash, embedding, updated_at, created_at)
+                        VALUES %s
+                    """, inserts, template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.autocommit = True
+
+    def delete_vectors(self, client_id: UUID, content_ids: List[str]):
+        """Borra vectores puntuales (ej. fragmentos sobrantes de una página web que se acortó)."""
+        if not content_ids: return
+        if not self.conn or self.conn.closed: self._connect()
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                DELETE FROM ai_vectors WHERE client_id = %s AND content_id = ANY(%s)
+            """, (str(client_id), list(content_ids)))
+
+    # --- ESTADO DEL CRAWLER WEB (ai_web_pages) ---
+
+    def get_web_pages(self, client_id: UUID) -> Dict[str, Dict[str, Any]]:
+        """Estado de todas las páginas crawleadas de un cliente (una consulta). {url: fila}"""
+        if not self.conn or self.conn.closed: self._connect()
+        from psycopg2.extras import RealDictCursor
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT url, content_id, etag, last_modified, content_hash, chunks, links, status_code
+                FROM ai_web_pages WHERE client_id = %s
+            """, (str(client_id),))
+            return {row["url"]: dict(row) for row in cur.fetchall()}
+
+    def save_web_pages(self, client_id: UUID, pages: List[Dict[str, Any]]):
+        """Upsert del estado de varias páginas en un solo statement."""
+        if not pages: return
+        if not self.conn or self.conn.closed: self._connect()
+        from psycopg2.extras import execute_values
+        rows = [
+            (str(client_id), p["url"], p["content_id"], p.get("etag"), p.get("last_modified"),
+             p.get("content_hash"), p.get("chunks", 0), Json(p.get("links", [])), p.get("status_code"),
+             p.get("changed", False))
+            for p in pages
+        ]
+        with self.conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO ai_web_pages AS w
+                (client_id, url, content_id, etag, last_modified, content_hash, chunks, links, status_code, last_changed_at)
+                VALUES %s
+                ON CONFLICT (client_id, url) DO UPDATE SET
+                    etag = EXCLUDED.etag,
+                    last_modified = EXCLUDED.last_modified,
+                    content_hash = EXCLUDED.content_hash,
+                    chunks = EXCLUDED.chunks,
+                    links = EXCLUDED.links,
+                    status_code = EXCLUDED.status_code,
+                    last_crawled_at = NOW(),
+                    last_changed_at = COALESCE(EXCLUDED.last_changed_at, w.last_changed_at)
+            """, rows, template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, CASE WHEN %s THEN NOW() END)")
+
+    def delete_document_chunks(self, client_id: UUID, content_id: str):
+        """Borra los vectores de un documento (base y fragmentos _part_N) antes de re-procesarlo."""
+        if not self.conn or self.conn.closed:
+            self._connect()
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                DELETE FROM ai_vectors 
+                WHERE client_id = %s AND (content_id = %s OR content_id LIKE %s)
+            """, (str(client_id), content_id, f"{content_id}_part_%"))
+            if PENDING_EMBEDDINGS_ENABLED:
+                cur.execute("""
+                    DELETE FROM ai_pending_embeddings 
+                    WHERE client_id = %s AND document_content_id = %s
+                """, (str(client_id), content_id))
+
+    # --- ETAPA DE EMBEDDING DESACOPLADA (ai_pending_embeddings) ---
+
+    def enqueue_pending_chunks(self, client_id: UUID, document_content_id: str, docs: List[CanonicalDocument]):
+        """Inserta los fragmentos extraídos como PENDING para los embedding workers (un solo INSERT)."""
+        if not docs: return
+        if not self.conn or self.conn.closed: self._connect()
+        from psycopg2.extras import execute_values
+        rows = [
+            (str(client_id), document_content_id, d.content_id, d.source.value if hasattr(d.source, "value") else d.source,
+             d.title, d.body_content, Json(d.metadata.model_dump(mode='json')), d.hash)
+            for d in docs
+        ]
+        with self.conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO ai_pending_embeddings 
+                (client_id, document_content_id, content_id, source, title, body_content, metadata, hash)
+                VALUES %s
+            """, rows)
+
+    def claim_pending_chunks(self, worker_id: str, limit: int, claim_timeout_seconds: int) -> List[Dict[str, Any]]:
+        """
+        Reclama un lote de fragmentos (FOR UPDATE SKIP LOCKED: varios workers sin bloquearse).
+        También recupera reclamos vencidos de workers caídos.
+        """
+        if not self.conn or self.conn.closed: self._connect()
+        from psycopg2.extras import RealDictCursor
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                UPDATE ai_pending_embeddings p
+                SET status = 'CLAIMED', claimed_at = NOW(), claimed_by = %s, attempts = p.attempts + 1
+                WHERE p.id IN (
+                    SELECT id FROM ai_pending_embeddings
+                    WHERE (status = 'PENDING' AND available_at <= NOW())
+                       OR (status = 'CLAIMED' AND claimed_at < NOW() - make_interval(secs => %s))
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING p.id, p.client_id, p.document_content_id, p.content_id, p.source, p.title,
+                          p.body_content, p.metadata, p.hash, p.attempts
+            """, (worker_id, claim_timeout_seconds, limit))
+            return cur.fetchall()
+
+    def complete_pending_chunks(self, ids: List[int]):
+        """Borra los fragmentos ya escritos en ai_vectors."""
+        if not ids: return
+        if not self.conn or self.conn.closed: self._connect()
+        with self.conn.cursor() as cur:
+            cur.execute("DELETE FROM ai_pending_embeddings WHERE id = ANY(%s)", (ids,))
+
+    def release_pending_chunks(self, ids: List[int], error: str, backoff_seconds: float, max_attempts: int):
+        """Devuelve fragmentos a PENDING con backoff, o los marca FAILED al agotar intentos."""
+        if not ids: return
+        if not self.conn or self.conn.closed: self._connect()
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE ai_pending_embeddings
+                SET status = CASE WHEN attempts >= %s THEN 'FAILED' ELSE 'PENDING' END,
+                    available_at = NOW() + make_interval(secs => %s),
+                    claimed_at = NULL, claimed_by = NULL, last_error = %s
+                WHERE id = ANY(%s)
+            """, (max_attempts, backoff_seconds, error, ids))
+
+    def finalize_embedded_documents(self, documents: List[tuple]) -> List[Dict[str, Any]]:
+        """
+        Cierra documentos EMBEDDING sin fragmentos pendientes: SYNCED, o FAILED si algún
+        fragmento agotó sus intentos. `documents`: [(client_id, document_content_id)].
+        """
+        if not documents: return []
+        if not self.conn or self.conn.closed: self._connect()
+        from psycopg2.extras import RealDictCursor
+        finalized = []
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            for client_id, document_content_id in set((str(c), d) for c, d in documents):
+                cur.execute("""
+                    SELECT
+                        COUNT(*) FILTER (WHERE status IN ('PENDING', 'CLAIMED')) AS in_flight,
+                        COUNT(*) FILTER (WHERE status = 'FAILED') AS failed,
+                        MAX(last_error) FILTER (WHERE status = 'FAILED') AS last_error
+                    FROM ai_pending_embeddings
+                    WHERE client_id = %s AND document_content_id = %s
+                """, (client_id, document_content_id))
+                row = cur.fetchone()
+                if row["in_flight"]:
+                    continue
+                cur.execute("""
+                    SELECT 1 FROM ai_knowledge_documents 
+                    WHERE client_id = %s AND content_hash = %s AND sync_status = 'EMBEDDING'
+                """, (client_id, document_content_id))
+                if not cur.fetchone():
+                    continue # Extracción aún en curso (ej. rangos de fan-out) o ya cerrado
+                status = "FAILED" if row["failed"] else "SYNCED"
+                error = f"{row['failed']} fragmentos sin embedding: {row['last_error']}" if row["failed"] else None
+                self.update_sync_status(client_id, document_content_id, status, error)
+                finalized.append({"client_id": client_id, "content_id": document_content_id, "status": status})
+        return finalized
+
     def delete_document(self, client_id: UUID, content_id: str) -> Optional[str]:
-        """Borra un documento de ambas tablas y retorna el nombre del archivo para limpieza física."""
+        """
+        Borra un documento de ambas tablas y retorna el nombre del archivo para limpieza física.
+        Lanza LinkedDocumentsError si otros registros (re-subidas idénticas) usan sus vectores.
+        """
         if not self.conn or self.conn.closed:
             self._connect()
         
@@ -218,18 +589,40 @@ class VectorStore:
         with self.conn.cursor() as cur:
             # 0. Obtener el nombre del archivo antes de borrar el registro
             cur.execute("""
-                SELECT filename FROM ai_knowledge_documents 
+                SELECT filename, linked_content_id FROM ai_knowledge_documents 
                 WHERE client_id = %s AND content_hash = %s
             """, (str(client_id), content_id))
             row = cur.fetchone()
             if row:
                 filename = row[0]
+                # Un documento enlazado no tiene vectores ni archivo propio: solo se borra su registro
+                if row[1]:
+                    cur.execute("""
+                        DELETE FROM ai_knowledge_documents 
+                        WHERE client_id = %s AND content_hash = %s
+                    """, (str(client_id), content_id))
+                    return None
+
+            # 0.5. Los documentos enlazados a este dependen de sus vectores (otras subidas, quizás
+            #      de otros usuarios): no se borra el original mientras existan
+            cur.execute("""
+                SELECT content_hash FROM ai_knowledge_documents 
+                WHERE client_id = %s AND linked_content_id = %s
+            """, (str(client_id), content_id))
+            linked = [r[0] for r in cur.fetchall()]
+            if linked:
+                raise LinkedDocumentsError(content_id, linked)
 
             # 1. Borrar vectores (el documento base y sus fragmentos)
             cur.execute("""
                 DELETE FROM ai_vectors 
                 WHERE client_id = %s AND (content_id = %s OR content_id LIKE %s)
             """, (str(client_id), content_id, f"{content_id}_part_%"))
+            if PENDING_EMBEDDINGS_ENABLED:
+                cur.execute("""
+                    DELETE FROM ai_pending_embeddings 
+                    WHERE client_id = %s AND document_content_id = %s
+                """, (str(client_id), content_id))
             
             # 2. Borrar registro maestro
             cur.execute("""
@@ -245,5 +638,7 @@ class VectorStore:
             self._connect()
         with self.conn.cursor() as cur:
             cur.execute("DELETE FROM ai_vectors WHERE client_id = %s", (str(client_id),))
+            if PENDING_EMBEDDINGS_ENABLED:
+                cur.execute("DELETE FROM ai_pending_embeddings WHERE client_id = %s", (str(client_id),))
             cur.execute("DELETE FROM ai_knowledge_documents WHERE client_id = %s", (str(client_id),))
 
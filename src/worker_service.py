@@ -1,7 +1,11 @@
 
 import os
 import sys
+import time
+import signal
 import logging
+import importlib
+import multiprocessing
 from dotenv import load_dotenv
 
 # 1. Configurar Entorno ANTES de importar nada más
@@ -12,7 +16,7 @@ load_dotenv("/app/src/.env")
 sys.path.append("/app/src")
 
 from redis import Redis
-from rq import Worker, Queue
+from rq import Worker, SimpleWorker, Queue
 
 # Configurar Logging básico para el worker
 logging.basicConfig(
@@ -20,13 +24,97 @@ logging.basicConfig(
     format='%(asctime)s - WORKER - %(levelname)s - %(message)s'
 )
 
-listen = ['etl_queue']
+from src.ETL_DOCS.routing import FAST_QUEUE, HEAVY_QUEUE
+
+# Colas en orden de prioridad: RQ siempre toma primero de la primera cola con trabajo.
+# Configurable por worker: `python3 -m src.worker_service etl_docs_heavy etl_docs_fast`
+# o vía WORKER_QUEUES="etl_docs_heavy,etl_docs_fast" (los argumentos tienen prioridad).
+DEFAULT_QUEUES = [FAST_QUEUE, 'etl_queue', HEAVY_QUEUE]
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+listen = args or [name.strip() for name in os.getenv("WORKER_QUEUES", ",".join(DEFAULT_QUEUES)).split(",") if name.strip()]
 conn = Redis(host='localhost', port=6379, db=0)
 
+# --- MODO WARM ---
+# El Worker clásico hace fork por job: cada job re-importa pypdf/genai/etc. y abre
+# conexión DB + cliente Gemini nuevos. En modo warm los módulos se importan una vez
+# y un SimpleWorker (sin fork) ejecuta los jobs reutilizando clientes (ver
+# ETL_DOCS/worker_task.get_processor). El aislamiento de fallos lo da un proceso
+# supervisor: si el hijo muere (segfault de Tesseract, OOM) se relanza, y RQ mueve
+# el job huérfano a FailedJobRegistry al expirar su heartbeat.
+WARM_MODE = "--warm" in sys.argv[1:] or os.getenv("WORKER_MODE", "fork") == "warm"
+WARM_MAX_JOBS = int(os.getenv("WORKER_WARM_MAX_JOBS", "500")) # Reciclar el hijo cada N jobs (fugas de memoria)
+WARM_RESTART_BACKOFF = 5 # Segundos antes de relanzar un hijo caído
+
+# --- COALESCER DE EMBEDDINGS ---
+# 'local' junta llamadas de hilos concurrentes de UN proceso. Un worker ejecuta un job a la vez
+# (fork: un hijo por job; warm: SimpleWorker secuencial), así que no tendría nada que juntar:
+# en los workers se usa el servicio compartido. Sin servicio vivo (sin latido) se llama directo.
+# Antes de importar src.shared.embedding_coalescer, que lee la variable al importarse.
+if os.getenv("DOCS_EMBED_COALESCE") == "local":
+    logging.warning("DOCS_EMBED_COALESCE=local no junta llamadas entre jobs de un worker: se usa 'redis'.")
+    os.environ["DOCS_EMBED_COALESCE"] = "redis"
+
+PRELOAD_MODULES = [
+    "pypdf",
+    "pdf2image",
+    "pytesseract",
+    "google.genai",
+    "psycopg2",
+    "src.ETL_DOCS.worker_task",
+    "src.ETL_IMAGES.worker_tasks",
+]
+
+def preload_modules():
+    """Importa una sola vez los módulos pesados (heredados por los hijos vía fork)."""
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logging.warning(f"No se pudo precargar {name}: {e}")
+
+def _run_warm_child(queue_names):
+    """Proceso hijo: SimpleWorker sin fork por job, hasta WARM_MAX_JOBS."""
+    child_conn = Redis(host='localhost', port=6379, db=0)
+    queues = [Queue(name, connection=child_conn) for name in queue_names]
+    worker = SimpleWorker(queues, connection=child_conn)
+    worker.work(max_jobs=WARM_MAX_JOBS)
+
+def run_warm_supervisor(queue_names):
+    """Supervisa al hijo warm: lo recicla al llegar a max_jobs y lo relanza si se cae."""
+    preload_modules()
+    ctx = multiprocessing.get_context("fork")
+    stopping = False
+    child = None
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        if child and child.is_alive():
+            os.kill(child.pid, signal.SIGTERM) # Warm shutdown: termina el job en curso
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    while not stopping:
+        child = ctx.Process(target=_run_warm_child, args=(queue_names,), name="rq-warm-worker")
+        child.start()
+        child.join()
+        if stopping:
+            break
+        if child.exitcode == 0:
+            logging.info(f"Worker warm reciclado tras {WARM_MAX_JOBS} jobs. Relanzando.")
+        else:
+            logging.error(f"Worker warm terminó con código {child.exitcode}. Relanzando en {WARM_RESTART_BACKOFF}s.")
+            time.sleep(WARM_RESTART_BACKOFF)
+
 if __name__ == '__main__':
-    print("👷 Iniciando Worker de RQ. Escuchando colas: etl_queue")
-    
-    # Crear instancias de Queue con conexión explícita
-    queues = [Queue(name, connection=conn) for name in listen]
-    worker = Worker(queues, connection=conn)
-    worker.work()
+    mode = "warm (sin fork por job)" if WARM_MODE else "fork por job"
+    print(f"👷 Iniciando Worker de RQ [{mode}]. Escuchando colas (prioridad): {', '.join(listen)}")
+
+    if WARM_MODE:
+        run_warm_supervisor(listen)
+    else:
+        # Crear instancias de Queue con conexión explícita
+        queues = [Queue(name, connection=conn) for name in listen]
+        worker = Worker(queues, connection=conn)
+        worker.work()